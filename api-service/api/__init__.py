@@ -1,20 +1,75 @@
+import os
+
 from flask import Flask
 
-from api.extensions import cache
+from api.extensions import admission, cache, event_broker, view_refresher, warm_cache
 from api.routes.cashier_routes import cashier_bp
 from api.routes.dashboard_routes import dashboard_bp
-from database.database_config import init_app as init_db
+from api.routes.metrics_routes import metrics_bp
+from database.database_config import GUNICORN_THREADS, build_engine_options, db, init_app as init_db
 from icash_common import setup_logging
+from icash_common.tracing import init_tracing, instrument_engine
 
 def create_app() -> Flask:
     setup_logging()
     app = Flask(__name__)
+    # Admission budgets default to this worker's database connections; writes
+    # may use all of them, analytics a third, so a burst of cache misses can
+    # never starve the tills.
+    engine_options = build_engine_options()
+    connections = engine_options["pool_size"] + engine_options["max_overflow"]
     app.config.update(
         CACHE_TYPE="SimpleCache",        # per-process memory
         CACHE_DEFAULT_TIMEOUT=60,        # seconds
+        # Cache lifetime (seconds) of each /cashier/catalog part; supermarkets
+        # have no cheap version, so theirs also bounds how late a new branch shows.
+        CATALOG_TTLS={
+            "products": int(os.getenv("CATALOG_PRODUCTS_TTL", 3600)),
+            "supermarkets": int(os.getenv("CATALOG_SUPERMARKETS_TTL", 600)),
+            "users": int(os.getenv("CATALOG_USERS_TTL", 60)),
+        },
+        # "live" aggregates the purchase tables per request, "views" reads the
+        # summary views kept fresh by the background refresher.
+        ANALYTICS_SOURCE=os.getenv("ANALYTICS_SOURCE", "live"),
+        ANALYTICS_REFRESH_INTERVAL=float(os.getenv("ANALYTICS_REFRESH_INTERVAL", 30)),   # seconds
+        ANALYTICS_REFRESH_AFTER_WRITES=int(os.getenv("ANALYTICS_REFRESH_AFTER_WRITES", 100)),
+        # Loyal buyers embedded in /dashboard/analytics; the rest via /dashboard/loyal_buyers.
+        LOYAL_BUYERS_PAGE_SIZE=int(os.getenv("LOYAL_BUYERS_PAGE_SIZE", 50)),
+        # /dashboard/stream: idle heartbeat (seconds) and per-subscriber backlog.
+        SSE_HEARTBEAT_SECONDS=float(os.getenv("SSE_HEARTBEAT_SECONDS", 15)),
+        SSE_MAX_QUEUE=int(os.getenv("SSE_MAX_QUEUE", 100)),
+        # Payload snapshot shared by the workers; empty disables it.
+        WARM_CACHE_PATH=os.getenv("WARM_CACHE_PATH", ""),  # empty disables the snapshot
+        WARM_CACHE_MAX_STALE_SECONDS=float(os.getenv("WARM_CACHE_MAX_STALE_SECONDS", 600)),
+        WARM_CACHE_FLUSH_INTERVAL=float(os.getenv("WARM_CACHE_FLUSH_INTERVAL", 2)),   # seconds
+        ADMISSION_ENABLED=os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes"),
+        ADMISSION_CAPACITY=int(os.getenv("ADMISSION_CAPACITY", connections)),
+        ADMISSION_RETRY_AFTER=int(os.getenv("ADMISSION_RETRY_AFTER", 1)),   # seconds
+        ADMISSION_BUDGETS={
+            "write": {
+                "limit": int(os.getenv("ADMISSION_WRITE_LIMIT", connections)),
+                "max_queue": int(os.getenv("ADMISSION_WRITE_QUEUE", GUNICORN_THREADS)),
+                "max_wait": float(os.getenv("ADMISSION_WRITE_TIMEOUT", 5)),
+                "priority": 0,
+            },
+            "analytics": {
+                "limit": int(os.getenv("ADMISSION_ANALYTICS_LIMIT", max(connections // 3, 1))),
+                "max_queue": int(os.getenv("ADMISSION_ANALYTICS_QUEUE", max(GUNICORN_THREADS // 4, 1))),
+                "max_wait": float(os.getenv("ADMISSION_ANALYTICS_TIMEOUT", 1)),
+                "priority": 1,
+            },
+        },
     )
     cache.init_app(app)
+    warm_cache.init_app(app)
     init_db(app)
+    init_tracing(app, "api")
+    with app.app_context():
+        instrument_engine(db.engine)
+    view_refresher.init_app(app)
+    event_broker.init_app(app)
+    admission.init_app(app)
     app.register_blueprint(cashier_bp, url_prefix=f"/{cashier_bp.name}")
     app.register_blueprint(dashboard_bp, url_prefix=f"/{dashboard_bp.name}")
+    app.register_blueprint(metrics_bp, url_prefix=f"/{metrics_bp.name}")
     return app
@@ -0,0 +1,172 @@
+"""Single-process API startup: wait for the database, prepare it, then serve.
+
+Replaces the shell loop of one-off interpreters in entrypoint.sh. Readiness,
+schema and seed checks run once in this process with an in-process backoff,
+then the Flask app is built here and handed to gunicorn, so every worker is
+forked from an already-imported app (shared copy-on-write) instead of
+importing Flask, SQLAlchemy and the models on its own.
+
+    python -m api.boot               # prepare + serve (gunicorn.conf.py applies)
+    python -m api.boot --check-only  # prepare, print the timing breakdown, exit
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from gunicorn.app.base import Application
+from sqlalchemy import Engine, create_engine, inspect, select, text
+from sqlalchemy.exc import OperationalError
+
+from api import create_app
+from database.database_config import Base, SQLAlchemy_DATABASE
+from database.models import Purchase
+from icash_common import setup_logging
+
+logger = logging.getLogger(__name__)
+
+_PROCESS_STARTED = time.perf_counter()
+
+
+class StartupTimer:
+    """Collects (phase, seconds) pairs for the startup report."""
+
+    def __init__(self):
+        self.phases: list[dict] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append({"phase": name, "seconds": round(time.perf_counter() - started, 4)})
+
+    def report(self) -> dict:
+        return {
+            "phases": self.phases,
+            "total_seconds": round(time.perf_counter() - _PROCESS_STARTED, 4),
+            "pid": os.getpid(),
+        }
+
+
+def wait_for_database(engine: Engine, timeout: float, initial_delay: float = 0.1, max_delay: float = 2.0) -> int:
+    """Poll `SELECT 1` with exponential backoff; returns the number of attempts."""
+    deadline = time.monotonic() + timeout
+    delay, attempts = initial_delay, 0
+    while True:
+        attempts += 1
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return attempts
+        except OperationalError:
+            if time.monotonic() + delay > deadline:
+                raise
+            logger.info("Database not ready (attempt %d), retrying in %.1fs", attempts, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+def prepare_database(engine: Engine, timer: StartupTimer) -> None:
+    """Create missing tables and seed only when needed."""
+    # Imported lazily: database.seed configures logging at import time.
+    from database.rollups import create_views
+    from database.seed import seed_db
+
+    with timer.phase("schema_check"):
+        missing = set(Base.metadata.tables) - set(inspect(engine).get_table_names())
+        if not missing:
+            _add_missing_columns(engine)
+            _create_missing_indexes(engine)
+
+    with timer.phase("seed_check"):
+        seeded = False
+        if not missing:
+            with engine.connect() as conn:
+                seeded = conn.execute(select(Purchase.id).limit(1)).first() is not None
+
+    if seeded:
+        logger.info("Schema present and data seeded; skipping seed")
+        with timer.phase("views"):
+            create_views(engine)
+    else:
+        with timer.phase("seed"):
+            seed_db(engine)
+
+
+def _add_missing_columns(engine: Engine) -> None:
+    """Add nullable columns declared on the models after their tables were created."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                logger.info("Added column %s.%s", table.name, column.name)
+
+
+def _create_missing_indexes(engine: Engine) -> None:
+    """Add indexes declared on the models after their tables were created."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def boot(timer: StartupTimer):
+    """Run the startup phases and return the ready Flask app."""
+    engine = create_engine(SQLAlchemy_DATABASE)
+    try:
+        with timer.phase("wait_for_db"):
+            attempts = wait_for_database(engine, timeout=float(os.getenv("DB_WAIT_TIMEOUT", 60)))
+        logger.info("Database ready after %d attempt(s)", attempts)
+        prepare_database(engine, timer)
+    finally:
+        engine.dispose()
+
+    with timer.phase("create_app"):
+        app = create_app()
+    app.config["STARTUP_REPORT"] = timer.report()
+    for entry in app.config["STARTUP_REPORT"]["phases"]:
+        logger.info("Startup phase %-13s %.4fs", entry["phase"], entry["seconds"])
+    logger.info("Startup total %.4fs", app.config["STARTUP_REPORT"]["total_seconds"])
+    return app
+
+
+class PreloadedApplication(Application):
+    """Gunicorn application serving an app object that is already built."""
+
+    def __init__(self, app):
+        self.application = app
+        super().__init__()
+
+    def init(self, parser, opts, args):
+        return None
+
+    def load(self):
+        return self.application
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Prepare the database and serve the API.")
+    parser.add_argument("--check-only", action="store_true", help="run the startup phases and exit")
+    args, gunicorn_args = parser.parse_known_args(argv)
+
+    setup_logging()
+    app = boot(StartupTimer())
+    if args.check_only:
+        print(json.dumps(app.config["STARTUP_REPORT"], indent=2))
+        return
+
+    sys.argv = [sys.argv[0], *gunicorn_args]
+    PreloadedApplication(app).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Analytics deltas published on every purchase and streamed over SSE.
+
+On PostgreSQL events travel through LISTEN/NOTIFY, so a purchase handled by
+one worker reaches stream subscribers in every worker. Each worker runs one
+listener thread on its own connection. Other backends fan out in-process only.
+
+Writes stage their events with `AnalyticsEventBroker.pending`: the NOTIFY runs
+inside the insert transaction (delivered on commit, dropped on rollback) and
+nothing is built at all while no stream is listening.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.database_config import db
+from icash_common.events import EventFanout
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "analytics_events"
+# How long a "somebody is LISTENing" answer from pg_stat_activity is reused.
+LISTENER_CHECK_INTERVAL = 1.0
+
+
+class AnalyticsEventBroker:
+    def __init__(self):
+        self._app = None
+        self.fanout = EventFanout()
+        self._lock = threading.Lock()
+        self._listener = None
+        self._pid = None
+        self._listeners_seen = False
+        self._listeners_checked_at = float("-inf")
+
+    def init_app(self, app) -> None:
+        self._app = app
+        self.fanout.max_queue = int(app.config["SSE_MAX_QUEUE"])
+
+    @property
+    def _uses_notify(self) -> bool:
+        return db.engine.dialect.name == "postgresql"
+
+    def has_listeners(self) -> bool:
+        """Whether an event published now could reach any stream subscriber."""
+        if self.fanout.subscriber_count:
+            return True
+        if not self._uses_notify:
+            return False
+        now = time.monotonic()
+        if now - self._listeners_checked_at >= LISTENER_CHECK_INTERVAL:
+            # Listener threads only ever run LISTEN on their connection, so
+            # it stays their last statement while they wait for notifies.
+            with db.engine.connect() as conn:
+                self._listeners_seen = bool(conn.scalar(
+                    text("SELECT EXISTS (SELECT 1 FROM pg_stat_activity WHERE query = :listen)"),
+                    {"listen": f"LISTEN {CHANNEL}"},
+                ))
+            self._listeners_checked_at = now
+        return self._listeners_seen
+
+    def pending(
+        self, session: Session, event: str, build: Callable[[Session, list], Iterable[dict]]
+    ) -> "PendingEvents":
+        """Events for one write; pass it as the write's `before_commit` and call `.publish()` after commit."""
+        return PendingEvents(self, session, event, build)
+
+    def subscribe(self):
+        if self._uses_notify:
+            self._ensure_listener()
+        return self.fanout.subscribe()
+
+    def _ensure_listener(self) -> None:
+        if self._listener is not None and self._listener.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            conninfo = db.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+            self._listener = threading.Thread(
+                target=self._listen, args=(conninfo,), name="analytics-event-listener", daemon=True
+            )
+            self._listener.start()
+
+    def _listen(self, conninfo: str) -> None:
+        import psycopg
+
+        delay = 0.5
+        while True:
+            try:
+                with psycopg.connect(conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    delay = 0.5
+                    for notify in conn.notifies():
+                        event, _, data = notify.payload.partition("\n")
+                        self.fanout.publish(event, data)
+            except Exception:
+                logger.exception("Analytics event listener failed; reconnecting in %.1fs", delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 10.0)
+
+
+class PendingEvents:
+    """One write's events: built inside its transaction, delivered once it commits.
+
+    On PostgreSQL the NOTIFY is sent on the write's own connection inside a
+    savepoint, so PostgreSQL delivers it at commit; elsewhere the payloads are
+    kept and fanned out by `publish`. A failure here is logged and never fails
+    the write: a missed live update only delays the dashboard.
+    """
+
+    def __init__(self, broker: AnalyticsEventBroker, session: Session, event: str, build):
+        self._broker = broker
+        self._session = session
+        self._event = event
+        self._build = build
+        self._local: list[str] = []
+
+    def __call__(self, objects: list) -> None:
+        self._local = []
+        if not objects:
+            return
+        try:
+            if not self._broker.has_listeners():
+                return
+            payloads = [json.dumps(payload, separators=(",", ":")) for payload in self._build(self._session, objects)]
+            if not self._broker._uses_notify:
+                self._local = payloads
+                return
+            # NOTIFY payloads are limited to 8000 bytes; deltas stay far below that.
+            with self._session.begin_nested():
+                self._session.execute(
+                    text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+                    {"channel": CHANNEL, "payloads": [f"{self._event}\n{data}" for data in payloads]},
+                )
+        except Exception:
+            logger.exception("Failed to stage %s events for %d rows", self._event, len(objects))
+
+    def publish(self) -> None:
+        local, self._local = self._local, []
+        for data in local:
+            self._broker.fanout.publish(self._event, data)
+
+
+__all__ = ["AnalyticsEventBroker", "CHANNEL", "PendingEvents"]
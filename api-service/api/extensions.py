@@ -1,5 +1,22 @@
 # api/extensions.py
 from flask_caching import Cache
 
+from api.events import AnalyticsEventBroker
+from api.refresher import AnalyticsViewRefresher
+from api.warm_cache import WarmCacheSnapshot
+from icash_common.admission import AdmissionController
+
 # This is the global cache object used everywhere
 cache = Cache()
+
+# Keeps the analytics summary views fresh when ANALYTICS_SOURCE=views
+view_refresher = AnalyticsViewRefresher()
+
+# Publishes per-purchase analytics deltas to /dashboard/stream subscribers
+event_broker = AnalyticsEventBroker()
+
+# Per-worker concurrency budgets for the write and analytics routes
+admission = AdmissionController()
+
+# Built payloads persisted to disk so restarted workers start warm
+warm_cache = WarmCacheSnapshot()
@@ -0,0 +1,116 @@
+"""Pre-serialized, pre-compressed JSON bodies for the hot read endpoints.
+
+A payload is encoded once per data version into bytes plus gzip (and brotli,
+when the `brotli` package is installed) variants and cached as such, so a
+cache hit only picks the right variant for the client's Accept-Encoding.
+Built payloads are also kept in the warm cache snapshot (api.warm_cache) so
+a restarted worker does not start cold.
+"""
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from flask import Response, request
+
+from api.extensions import cache, warm_cache
+from icash_common.snapshot import SnapshotEntry
+from icash_common.tracing import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+# Below this size compression costs more than it saves on the wire.
+MIN_COMPRESS_BYTES = 512
+
+
+@dataclass(frozen=True)
+class SerializedPayload:
+    body: bytes
+    etag: str
+    encodings: dict[str, bytes] = field(default_factory=dict)
+
+
+def dumps(data: Any) -> bytes:
+    """Encode to compact JSON bytes; orjson handles UUID/datetime natively."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), default=str).encode()
+
+
+def serialize(data: Any) -> SerializedPayload:
+    body = dumps(data)
+    encodings = {}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        encodings["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+        if brotli is not None:
+            encodings["br"] = brotli.compress(body, quality=5)
+    etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+    return SerializedPayload(body=body, etag=etag, encodings=encodings)
+
+
+def cached_payload(key: str, version: str, build: Callable[[], Any], timeout: int | None = None) -> SerializedPayload:
+    """Return the serialized payload for (`key`, `version`), building it on a miss."""
+    cache_key = f"payload:{key}:{version}"
+    with span("cache"):
+        payload = cache.get(cache_key)
+    if payload is not None:
+        return payload
+
+    with span("snapshot"):
+        entry, fresh = warm_cache.lookup(key, version)
+    if entry is None:
+        return _build_payload(key, version, build, timeout)
+    payload = _from_snapshot(entry)
+    if fresh:
+        with span("cache"):
+            cache.set(cache_key, payload, timeout=timeout)
+    else:
+        # Answer with the previous version now; the current one is built off the request path.
+        warm_cache.refresh_in_background(key, lambda: _build_payload(key, version, build, timeout))
+    return payload
+
+
+def _build_payload(key: str, version: str, build: Callable[[], Any], timeout: int | None) -> SerializedPayload:
+    with span("build"):
+        data = build()
+    with span("serialize"):
+        payload = serialize(data)
+    with span("cache"):
+        cache.set(f"payload:{key}:{version}", payload, timeout=timeout)
+    warm_cache.store(key, SnapshotEntry(version, {"identity": payload.body, **payload.encodings}, {"etag": payload.etag}))
+    return payload
+
+
+def _from_snapshot(entry: SnapshotEntry) -> SerializedPayload:
+    encodings = dict(entry.blobs)
+    return SerializedPayload(body=encodings.pop("identity"), etag=entry.meta["etag"], encodings=encodings)
+
+
+def payload_response(payload: SerializedPayload, status: int = 200) -> Response:
+    """Serve `payload` with ETag revalidation and Accept-Encoding negotiation."""
+    if request.if_none_match.contains(payload.etag):
+        response = Response(status=304)
+    else:
+        body, encoding = payload.body, None
+        for candidate in ("br", "gzip"):
+            if candidate in payload.encodings and request.accept_encodings[candidate]:
+                body, encoding = payload.encodings[candidate], candidate
+                break
+        response = Response(body, status=status, mimetype="application/json")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(payload.etag)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+__all__ = ["SerializedPayload", "dumps", "serialize", "cached_payload", "payload_response"]
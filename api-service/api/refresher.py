@@ -0,0 +1,83 @@
+"""Background refresh of the analytics summary views."""
+import logging
+import os
+import threading
+import time
+
+from database.database_config import db
+from database.rollups import refresh_views
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsViewRefresher:
+    """Refreshes the summary views every `interval` seconds or after N writes.
+
+    One daemon thread per worker process. The thread is (re)started lazily so
+    it also exists in gunicorn workers forked from a preloaded master, where
+    threads started before the fork do not survive.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._interval = 30.0
+        self._write_threshold = 100
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.last_refresh_seconds = None
+
+    def init_app(self, app) -> None:
+        self._app = app
+        self._interval = float(app.config["ANALYTICS_REFRESH_INTERVAL"])
+        self._write_threshold = int(app.config["ANALYTICS_REFRESH_AFTER_WRITES"])
+        app.before_request(self.ensure_running)
+
+    @property
+    def enabled(self) -> bool:
+        return self._app is not None and self._app.config["ANALYTICS_SOURCE"] == "views"
+
+    def ensure_running(self) -> None:
+        if not self.enabled:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="analytics-view-refresher", daemon=True)
+            self._thread.start()
+
+    def note_write(self) -> None:
+        """Record a committed purchase; wakes the refresher once the threshold is hit."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._writes += 1
+            if self._writes < self._write_threshold:
+                return
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self._interval)
+            self._wakeup.clear()
+            with self._lock:
+                self._writes = 0
+            started = time.perf_counter()
+            try:
+                with self._app.app_context():
+                    refreshed = refresh_views(db.engine)
+            except Exception:
+                logger.exception("Analytics view refresh failed")
+                continue
+            if refreshed:
+                self.last_refresh_seconds = time.perf_counter() - started
+                logger.info("Analytics views refreshed in %.3fs", self.last_refresh_seconds)
+
+
+__all__ = ["AnalyticsViewRefresher"]
@@ -1,26 +1,88 @@
 import logging
 from datetime import datetime, timezone
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 
-from api import cache
-from api.services.cashier_service import get_all_supermarkets, get_all_users, get_all_products, create_purchase
+from api import admission, event_broker, view_refresher
+from api.payloads import cached_payload, payload_response
+from api.services.cashier_service import (
+    ValidationError,
+    create_purchase,
+    create_purchases,
+    get_all_supermarkets,
+    get_all_users,
+    get_product_rows,
+    get_user_purchases,
+)
+from api.services.dashboard_service import get_purchase_deltas
+from api.services.version_service import get_catalog_versions
 from database import db
 
 cashier_bp = Blueprint("cashier", __name__)
 logger = logging.getLogger(__name__)
 
+MAX_HISTORY_PAGE = 100
+MAX_PURCHASE_BATCH = 500
+
+# Catalog parts, each cached under its own version and TTL (CATALOG_TTLS).
+CATALOG_PARTS = {
+    "products": get_product_rows,
+    "supermarkets": get_all_supermarkets,
+    "users": get_all_users,
+}
+
+
 @cashier_bp.route("/catalog")
-@cache.cached()
 def catalog():
-    return jsonify({
-        "supermarkets": get_all_supermarkets(db.session),
-        "users": get_all_users(db.session),
-        "products": get_all_products(db.session)
-    })
+    """All catalog parts in one body; cached until any part's version moves."""
+    versions = _catalog_versions()
+    payload = cached_payload(
+        "catalog",
+        ":".join(versions[part] for part in CATALOG_PARTS),
+        lambda: {part: load(db.session) for part, load in CATALOG_PARTS.items()},
+        timeout=min(current_app.config["CATALOG_TTLS"].values()),
+    )
+    return payload_response(payload)
+
+
+@cashier_bp.route("/catalog/versions")
+def catalog_versions():
+    """Current version of each catalog part, so clients refetch only the parts that moved."""
+    return jsonify(_catalog_versions())
+
+
+@cashier_bp.route("/catalog/<part>")
+def catalog_part(part):
+    if part not in CATALOG_PARTS:
+        return jsonify({"error": f"Unknown catalog part, expected one of: {', '.join(CATALOG_PARTS)}"}), 404
+    version = _catalog_versions()[part]
+    payload = cached_payload(
+        f"catalog:{part}",
+        version,
+        lambda: CATALOG_PARTS[part](db.session),
+        timeout=current_app.config["CATALOG_TTLS"][part],
+    )
+    response = payload_response(payload)
+    response.headers["X-Catalog-Version"] = version
+    return response
+
+
+def _catalog_versions() -> dict[str, str]:
+    return get_catalog_versions(db.session, current_app.config["CATALOG_TTLS"]["supermarkets"])
+
+
+@cashier_bp.route("/users/<user_id>/purchases")
+def user_purchases(user_id):
+    limit = min(max(request.args.get("limit", 20, type=int), 1), MAX_HISTORY_PAGE)
+    try:
+        page = get_user_purchases(db.session, user_id, limit, request.args.get("cursor"))
+    except ValidationError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(page)
 
 
 @cashier_bp.route("/create_purchase", methods=["POST"])
+@admission.limit("write")
 def create_purchase_route():
     data = request.get_json()
     logger.info("Received create_purchase request", extra={
@@ -28,9 +90,40 @@ def create_purchase_route():
         "user_id": data.get("user_id"),
         "items_count": len(data.get("items_list") or []),
     })
+    events = event_broker.pending(db.session, "purchase", get_purchase_deltas)
     create_purchase(
         db.session,
         **data,
-        created_at=datetime.now(timezone.utc)
+        created_at=datetime.now(timezone.utc),
+        before_commit=events,
     )
+    view_refresher.note_write()
+    events.publish()
     return "success", 201
+
+
+@cashier_bp.route("/create_purchases", methods=["POST"])
+@admission.limit("write")
+def create_purchases_route():
+    """Batch insert used by the cashier outbox forwarder.
+
+    Body: {"purchases": [{supermarket_id, user_id, items_list, total_amount, created_at?, idempotency_key?}]}.
+    Returns per-item results so the caller can retry or drop each one; items
+    whose idempotency_key was already stored are listed under "duplicates".
+    """
+    purchases = (request.get_json(silent=True) or {}).get("purchases")
+    if not isinstance(purchases, list) or not 0 < len(purchases) <= MAX_PURCHASE_BATCH:
+        return jsonify({"error": f"purchases must be a list of 1-{MAX_PURCHASE_BATCH} items"}), 400
+
+    events = event_broker.pending(db.session, "purchase", get_purchase_deltas)
+    created, rejected, duplicates = create_purchases(
+        db.session, purchases, received_at=datetime.now(timezone.utc), before_commit=events
+    )
+    for _ in created:
+        view_refresher.note_write()
+    events.publish()
+    return jsonify({
+        "created": len(created),
+        "duplicates": duplicates,
+        "rejected": [{"index": index, "error": error} for index, error in sorted(rejected.items())],
+    }), 201
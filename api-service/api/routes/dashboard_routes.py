@@ -1,30 +1,152 @@
 from datetime import datetime, timezone
 import logging
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 
-from api import cache
-from api.services.dashboard_service import get_unique_buyers_count, get_loyal_buyers, get_top_products
+from api.extensions import admission, event_broker
+from api.payloads import cached_payload, dumps, payload_response
+from api.services.dashboard_service import (
+    InvalidCursorError,
+    count_loyal_buyers,
+    decode_cursor,
+    get_analytics_summary,
+    get_loyal_buyers_page,
+    get_segment_customers_page,
+    get_segment_summary,
+    get_segments_scored_at,
+    get_top_products_from_views,
+    get_unique_buyers_count_from_views,
+    get_views_refreshed_at,
+    iter_loyal_buyers,
+)
+from api.services.version_service import get_data_version
 from database.database_config import db
+from database.segments import SEGMENTS
+from icash_common.events import sse_stream
 
 logger = logging.getLogger(__name__)
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
+MAX_LOYAL_BUYERS_PAGE = 1000
+MAX_SEGMENT_PAGE = 1000
+
 @dashboard_bp.route("/analytics", methods=["GET"])
-@cache.cached()
 def analytics():
     min_purchases = request.args.get("min_purchases", type=int)
+    by_supermarket = request.args.get("group_by") == "supermarket"
+    # The summary views are network-wide; branch breakdowns always run live.
+    use_views = current_app.config["ANALYTICS_SOURCE"] == "views" and not by_supermarket
+    if use_views:
+        # View-backed figures only change when the views are refreshed.
+        refreshed_at = get_views_refreshed_at(db.session)
+        version = refreshed_at.isoformat() if refreshed_at else "never"
+    else:
+        version = get_data_version(db.session)
+    payload = cached_payload(
+        f"analytics:{'views' if use_views else 'live'}:{min_purchases}:{by_supermarket}",
+        version,
+        # Only a miss queries the database, so only a miss needs a slot.
+        admission.limit("analytics")(lambda: _build_analytics(min_purchases, use_views, by_supermarket)),
+    )
+    return payload_response(payload)
+
+
+@dashboard_bp.route("/loyal_buyers", methods=["GET"])
+def loyal_buyers():
+    """Loyal buyers in (purchase_count desc, user_id) order, paged by `cursor`.
+
+    `format=ndjson` streams every remaining buyer, one JSON object per line.
+    """
+    min_purchases = request.args.get("min_purchases", 3, type=int)
+    limit = min(max(request.args.get("limit", 100, type=int), 1), MAX_LOYAL_BUYERS_PAGE)
+    cursor = request.args.get("cursor")
+    use_views = current_app.config["ANALYTICS_SOURCE"] == "views"
+    try:
+        decode_cursor(cursor)
+    except InvalidCursorError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    if request.args.get("format") == "ndjson":
+        # Taken before the response starts, so a rejection can still be a 503;
+        # held until the last row is sent.
+        admission.acquire("analytics")
+
+        def generate():
+            for buyer in iter_loyal_buyers(db.session, min_purchases, cursor, use_views):
+                yield dumps(buyer) + b"\n"
+        response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+        response.call_on_close(lambda: admission.release("analytics"))
+        return response
+
+    with admission.slot("analytics"):
+        page = get_loyal_buyers_page(db.session, min_purchases, limit, cursor, use_views)
+    return jsonify({"min_purchases": min_purchases, **page})
+
+
+@dashboard_bp.route("/segments", methods=["GET"])
+def segments():
+    """RFM segments precomputed by `database/segments.py`.
+
+    Without `segment`, the customer count per segment; with it, that segment's
+    customers by spend, paged by `cursor`.
+    """
+    segment = request.args.get("segment")
+    if segment is None:
+        scored_at = get_segments_scored_at(db.session)
+        payload = cached_payload(
+            "segments:summary",
+            scored_at.isoformat() if scored_at else "never",
+            lambda: get_segment_summary(db.session),
+        )
+        return payload_response(payload)
+
+    if segment not in SEGMENTS:
+        return jsonify({"error": f"Unknown segment, expected one of: {', '.join(SEGMENTS)}"}), 400
+    limit = min(max(request.args.get("limit", 100, type=int), 1), MAX_SEGMENT_PAGE)
+    try:
+        page = get_segment_customers_page(db.session, segment, limit, request.args.get("cursor"))
+    except InvalidCursorError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(page)
+
+
+@dashboard_bp.route("/stream", methods=["GET"])
+def stream():
+    """Server-sent `purchase` deltas; meant for the dashboard relay, not browsers.
+
+    Each open stream holds a worker thread, so the dashboard service keeps a
+    single upstream connection per worker and fans out to its viewers.
+    """
+    subscriber = event_broker.subscribe()
+    return Response(
+        sse_stream(event_broker.fanout, subscriber, current_app.config["SSE_HEARTBEAT_SECONDS"]),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _build_analytics(min_purchases: int, use_views: bool, by_supermarket: bool) -> dict:
     logger.info("Dashboard analytics requested - Cache missed")
-    unique_buyers = get_unique_buyers_count(db.session)
-    loyal_buyers = get_loyal_buyers(db.session, min_purchases)
-    top_products = get_top_products(db.session, 3)
-
-    return jsonify(
-        {
-            "unique_buyers": unique_buyers,
-            "loyal_buyers": loyal_buyers,
-            "top_products": top_products,
-            "generated_at": datetime.now(timezone.utc).isoformat(),
+    generated_at = datetime.now(timezone.utc)
+
+    page_size = current_app.config["LOYAL_BUYERS_PAGE_SIZE"]
+    if use_views:
+        loyal = get_loyal_buyers_page(db.session, min_purchases, page_size, use_views=True)
+        payload = {
+            "unique_buyers": get_unique_buyers_count_from_views(db.session),
+            "loyal_buyers": loyal["loyal_buyers"],
+            "loyal_buyers_count": count_loyal_buyers(db.session, min_purchases, use_views=True),
+            "loyal_buyers_next": loyal["next_cursor"],
+            "top_products": get_top_products_from_views(db.session, 3),
         }
-    )
+        refreshed_at = get_views_refreshed_at(db.session)
+        payload["views_refreshed_at"] = refreshed_at.isoformat() if refreshed_at else None
+        payload["staleness_seconds"] = (
+            round((generated_at - refreshed_at).total_seconds(), 3) if refreshed_at else None
+        )
+    else:
+        payload = get_analytics_summary(db.session, min_purchases, 3, by_supermarket, page_size)
+
+    payload["generated_at"] = generated_at.isoformat()
+    return payload
@@ -0,0 +1,49 @@
+from flask import Blueprint, current_app, jsonify
+
+from api.extensions import admission, event_broker, warm_cache
+from database.database_config import db
+from database.pool import pool_stats
+from icash_common import logging_stats
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/pool", methods=["GET"])
+def pool():
+    """Live connection pool stats for the worker that serves the request."""
+    return jsonify(pool_stats(db.engine))
+
+
+@metrics_bp.route("/startup", methods=["GET"])
+def startup():
+    """Startup phase timings recorded by api.boot (inherited by forked workers)."""
+    return jsonify(current_app.config.get("STARTUP_REPORT", {}))
+
+
+@metrics_bp.route("/logging", methods=["GET"])
+def logging_pipeline():
+    """Queue depth, drops and sampling counters of this worker's log pipeline."""
+    return jsonify(logging_stats())
+
+
+@metrics_bp.route("/events", methods=["GET"])
+def events():
+    """Live-update fan-out counters for the worker that serves the request."""
+    fanout = event_broker.fanout
+    return jsonify({
+        "subscribers": fanout.subscriber_count,
+        "published": fanout.published,
+        "dropped": fanout.dropped,
+    })
+
+
+@metrics_bp.route("/admission", methods=["GET"])
+def admission_control():
+    """Active, queued and rejected requests per admission budget in this worker."""
+    return jsonify(admission.stats())
+
+
+@metrics_bp.route("/warm_cache", methods=["GET"])
+def warm_cache_snapshot():
+    """Snapshot hits, stale answers and background refreshes of this worker."""
+    return jsonify(warm_cache.stats())
@@ -1,11 +1,16 @@
 # api/services/cashier_service.py
+import base64
 import logging
+from datetime import datetime, timezone
+from typing import Callable
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import select, union
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, noload
 
-from database.models import Product, Purchase
+from database.history import user_purchases_page
+from database.models import Product, Purchase, purchase_archive_summary
 
 logger = logging.getLogger(__name__)
 
@@ -14,15 +19,76 @@ class ValidationError(ValueError):
 
 
 def get_all_supermarkets(session: Session) -> list[str]:
-    return list(session.scalars(select(Purchase.supermarket_id).distinct()).all())
+    """Branches with purchases, including those left only in archived months."""
+    branches = union(
+        select(Purchase.supermarket_id), select(purchase_archive_summary.c.supermarket_id)
+    ).subquery()
+    return list(session.scalars(select(branches.c.supermarket_id).order_by(branches.c.supermarket_id)).all())
 
 def get_all_users(session: Session) -> list[UUID]:
-    return list(session.scalars(select(Purchase.user_id).distinct()).all())
+    """Customers with purchases, including those left only in archived months."""
+    users = union(select(Purchase.user_id), select(purchase_archive_summary.c.user_id)).subquery()
+    return list(session.scalars(select(users.c.user_id).order_by(users.c.user_id)).all())
 
 def get_all_products(session: Session) -> list[Product]:
     return list(session.scalars(select(Product).options(noload(Product.purchases))).all())
 
-def create_purchase(session: Session, created_at, supermarket_id: str, user_id, items_list: list[str], total_amount):
+def get_product_rows(session: Session) -> list[dict]:
+    """Products as plain dicts, skipping ORM identity-map and dataclass conversion."""
+    rows = session.execute(select(Product.id, Product.name, Product.unit_price).order_by(Product.id))
+    return [row._asdict() for row in rows]
+
+def get_user_purchases(session: Session, user_id, limit: int, cursor: str | None = None) -> dict:
+    """One page of a customer's purchases (newest first) with their baskets."""
+    try:
+        user_uuid = UUID(str(user_id))
+    except (ValueError, TypeError) as exc:
+        raise ValidationError("user_id must be a valid UUID") from exc
+
+    purchases = user_purchases_page(session, user_uuid, limit + 1, _decode_history_cursor(cursor))
+    page = purchases[:limit]
+    return {
+        "user_id": str(user_uuid),
+        "purchases": [
+            {
+                "id": purchase.id,
+                "created_at": purchase.created_at.isoformat(),
+                "supermarket_id": purchase.supermarket_id,
+                "total_amount": purchase.total_amount,
+                "items": [
+                    {"id": product.id, "name": product.name, "unit_price": product.unit_price}
+                    for product in purchase.products
+                ],
+            }
+            for purchase in page
+        ],
+        "next_cursor": _encode_history_cursor(page[-1]) if len(purchases) > limit else None,
+    }
+
+def _encode_history_cursor(purchase: Purchase) -> str:
+    raw = f"{purchase.created_at.isoformat()}|{purchase.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_history_cursor(cursor: str | None) -> tuple[datetime, int] | None:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, purchase_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), int(purchase_id)
+    except ValueError as exc:
+        raise ValidationError("Invalid cursor") from exc
+
+def create_purchase(
+    session: Session,
+    created_at,
+    supermarket_id: str,
+    user_id,
+    items_list: list[str],
+    total_amount,
+    before_commit: Callable[[list[Purchase]], None] | None = None,
+) -> Purchase:
+    """Create one purchase; `before_commit` sees it flushed, inside the insert transaction."""
     try:
         user_uuid = UUID(str(user_id))
     except (ValueError, TypeError) as exc:
@@ -50,6 +116,9 @@ def create_purchase(session: Session, created_at, supermarket_id: str, user_id,
     )
     session.add(purchase)
     try:
+        session.flush()
+        if before_commit is not None:
+            before_commit([purchase])
         session.commit()
         logger.info(
             "Purchase created successfully: purchase_id=%s supermarket_id=%s user_id=%s products_count=%d total_amount=%s",
@@ -68,4 +137,116 @@ def create_purchase(session: Session, created_at, supermarket_id: str, user_id,
         )
         session.rollback()
         raise
+    return purchase
+
+
+def create_purchases(
+    session: Session,
+    purchases: list[dict],
+    received_at: datetime,
+    before_commit: Callable[[list[Purchase]], None] | None = None,
+) -> tuple[list[Purchase], dict[int, str], list[int]]:
+    """Create a batch of purchases in one transaction.
 
+    Each item has the create_purchase fields plus an optional ISO `created_at`
+    (when the sale happened; defaults to `received_at`) and an optional
+    `idempotency_key`. Invalid items are skipped and reported as {index: error}
+    so one bad sale cannot block the rest of the batch. Items whose key is
+    already stored (a re-sent batch) are skipped and reported by index.
+    `before_commit` is called with the flushed purchases inside the insert
+    transaction, once per attempt.
+    """
+    valid, rejected = [], {}
+    for index, item in enumerate(purchases):
+        try:
+            valid.append((index, _validate_purchase_item(item, received_at)))
+        except ValidationError as exc:
+            rejected[index] = str(exc)
+
+    product_ids = {pid for _, item in valid for pid in item["product_ids"]}
+    products = {
+        product.id: product
+        for product in session.scalars(select(Product).where(Product.id.in_(product_ids)))
+    }
+    # Two tries: a concurrent delivery of the same batch can commit between our
+    # check and our insert; the unique index stops it and the retry skips its rows.
+    for attempt in range(2):
+        fresh, duplicates = _skip_stored_keys(session, valid)
+        created = [
+            Purchase(
+                supermarket_id=item["supermarket_id"],
+                created_at=item["created_at"],
+                user_id=item["user_id"],
+                products=[products[pid] for pid in dict.fromkeys(item["product_ids"]) if pid in products],
+                total_amount=item["total_amount"],
+                idempotency_key=item["idempotency_key"],
+            )
+            for _, item in fresh
+        ]
+        session.add_all(created)
+        try:
+            session.flush()
+            if before_commit is not None:
+                before_commit(created)
+            session.commit()
+            break
+        except IntegrityError:
+            session.rollback()
+            if attempt:
+                raise
+        except Exception:
+            logger.exception("Failed to commit purchase batch of %d", len(created))
+            session.rollback()
+            raise
+    logger.info(
+        "Purchase batch created: created=%d rejected=%d duplicates=%d", len(created), len(rejected), len(duplicates)
+    )
+    return created, rejected, duplicates
+
+
+def _skip_stored_keys(session: Session, valid: list[tuple[int, dict]]) -> tuple[list[tuple[int, dict]], list[int]]:
+    """Split items into those to insert and the indexes of those already stored (or repeated in the batch)."""
+    keys = [item["idempotency_key"] for _, item in valid if item["idempotency_key"] is not None]
+    if not keys:
+        return valid, []
+    seen = set(session.scalars(select(Purchase.idempotency_key).where(Purchase.idempotency_key.in_(keys))))
+    fresh, duplicates = [], []
+    for index, item in valid:
+        key = item["idempotency_key"]
+        if key is not None and key in seen:
+            duplicates.append(index)
+            continue
+        if key is not None:
+            seen.add(key)
+        fresh.append((index, item))
+    return fresh, duplicates
+
+
+def _validate_purchase_item(item: dict, received_at: datetime) -> dict:
+    try:
+        user_uuid = UUID(str(item.get("user_id")))
+    except (ValueError, TypeError) as exc:
+        raise ValidationError("user_id must be a valid UUID") from exc
+    try:
+        product_ids = [int(pid) for pid in item.get("items_list") or []]
+        total_amount = float(item.get("total_amount"))
+        created_at = datetime.fromisoformat(item["created_at"]) if item.get("created_at") else received_at
+    except (ValueError, TypeError) as exc:
+        raise ValidationError(f"invalid purchase: {exc}") from exc
+    if not item.get("supermarket_id"):
+        raise ValidationError("supermarket_id is required")
+    if total_amount <= 0:
+        raise ValidationError("total_amount must be positive")
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    idempotency_key = item.get("idempotency_key")
+    if idempotency_key is not None and not (isinstance(idempotency_key, str) and 0 < len(idempotency_key) <= 64):
+        raise ValidationError("idempotency_key must be a string of 1-64 characters")
+    return {
+        "supermarket_id": item["supermarket_id"],
+        "user_id": user_uuid,
+        "product_ids": product_ids,
+        "total_amount": total_amount,
+        "created_at": created_at,
+        "idempotency_key": idempotency_key,
+    }
@@ -1,45 +1,262 @@
-from sqlalchemy import func, select
+import base64
+import uuid
+from typing import Iterator
+
+from sqlalchemy import FromClause, func, select, union_all
 from sqlalchemy.orm import Session
 
-from database.models import Product, Purchase, purchase_product
+from database.models import Purchase, purchase_archive_summary
+from database.rollups import (
+    analytics_summary_statement,
+    fold_analytics_summary,
+    loyal_buyers_page_statement,
+    product_sales_query,
+    product_sales_view,
+    user_purchase_counts_query,
+    user_purchase_counts_view,
+    views_refreshed_at,
+)
+from database.segments import last_segment_run, segment_customers_page, segment_summary
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(buyer: dict) -> str:
+    """Opaque cursor pointing just after `buyer` in loyal-buyers order."""
+    raw = f"{buyer['purchase_count']}:{buyer['user_id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> tuple[int, str] | None:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        count, user_id = raw.split(":", 1)
+        return int(count), str(uuid.UUID(user_id))
+    except ValueError as exc:
+        raise InvalidCursorError("Invalid cursor") from exc
 
 
 def get_unique_buyers_count(session: Session) -> int:
-    """Count distinct buyers across all purchases."""
-    count = session.scalar(select(func.count(func.distinct(Purchase.user_id))))
+    """Count distinct buyers across all purchases, archived months included."""
+    counts = user_purchase_counts_query().subquery()
+    count = session.scalar(select(func.count()).select_from(counts))
     return int(count or 0)
 
 
 def get_loyal_buyers(session: Session, min_purchases: int) -> list[dict]:
     """Return buyers who purchased at least `min_purchases` times."""
-    stmt = (
-        select(Purchase.user_id, func.count(Purchase.id).label("purchase_count"))
-        .select_from(Purchase)
-        .group_by(Purchase.user_id)
-        .having(func.count(Purchase.id) >= min_purchases)
-        .order_by(func.count(Purchase.id).desc(), Purchase.user_id)
+    return _loyal_buyers(session, user_purchase_counts_query().subquery(), min_purchases)
+
+
+def get_top_products(session: Session, limit: int) -> list:
+    """Return the top-selling products, including ties beyond the limit."""
+    return _top_products(session, product_sales_query().subquery(), limit)
+
+
+def get_analytics_summary(
+    session: Session,
+    min_purchases: int,
+    top_limit: int,
+    by_supermarket: bool = False,
+    loyal_page_size: int | None = None,
+) -> dict:
+    """Unique buyers, loyal buyers and top products in a single round trip.
+
+    With `by_supermarket` the result also carries the same figures per branch
+    under "by_supermarket". With `loyal_page_size` only the first page of
+    loyal buyers is returned, plus "loyal_buyers_next" when there are more.
+    """
+    stmt = analytics_summary_statement(
+        session.get_bind().dialect.name, min_purchases, top_limit, by_supermarket, loyal_page_size
     )
-    rows = session.execute(stmt).all()
-    return [
-        {"user_id": str(row.user_id), "purchase_count": int(row.purchase_count)}
+    summary = fold_analytics_summary(session.execute(stmt))
+    summary["loyal_buyers_next"] = _next_cursor(summary["loyal_buyers"], summary["loyal_buyers_count"])
+    if not by_supermarket:
+        del summary["by_supermarket"]
+    return summary
+
+
+def get_loyal_buyers_page(
+    session: Session, min_purchases: int, limit: int, cursor: str | None = None, use_views: bool = False
+) -> dict:
+    """One keyset page of loyal buyers and the cursor for the next one (None at the end)."""
+    counts = _user_counts(use_views)
+    stmt = loyal_buyers_page_statement(counts, min_purchases, limit + 1, decode_cursor(cursor))
+    buyers = [_buyer(row) for row in session.execute(stmt)]
+    page = buyers[:limit]
+    return {"loyal_buyers": page, "next_cursor": encode_cursor(page[-1]) if len(buyers) > limit else None}
+
+
+def count_loyal_buyers(session: Session, min_purchases: int, use_views: bool = False) -> int:
+    counts = _user_counts(use_views)
+    count = session.scalar(
+        select(func.count()).select_from(counts).where(counts.c.purchase_count >= min_purchases)
+    )
+    return int(count or 0)
+
+
+def iter_loyal_buyers(
+    session: Session,
+    min_purchases: int,
+    cursor: str | None = None,
+    use_views: bool = False,
+    batch_size: int = 1000,
+) -> Iterator[dict]:
+    """Yield every loyal buyer after `cursor` without holding the result set in memory.
+
+    Rows come through a server-side cursor in batches of `batch_size`.
+    """
+    stmt = loyal_buyers_page_statement(_user_counts(use_views), min_purchases, after=decode_cursor(cursor))
+    result = session.execute(stmt, execution_options={"stream_results": True, "yield_per": batch_size})
+    for row in result:
+        yield _buyer(row)
+
+
+def get_purchase_deltas(session: Session, purchases: list[Purchase]) -> list[dict]:
+    """What each new purchase changes on the dashboard, from one grouped count query.
+
+    Call after the purchases are flushed, before commit: ids, baskets and
+    users come from the objects just written. Threshold-free: a client knows
+    its own `min_purchases` and bumps its loyal count when
+    `user_purchase_count` reaches it.
+    """
+    users = {purchase.user_id for purchase in purchases}
+    counts = union_all(
+        select(Purchase.user_id, func.count(Purchase.id).label("n"))
+        .where(Purchase.user_id.in_(users))
+        .group_by(Purchase.user_id),
+        select(purchase_archive_summary.c.user_id, purchase_archive_summary.c.purchase_count)
+        .where(purchase_archive_summary.c.user_id.in_(users)),
+    ).subquery()
+    totals = {
+        str(user_id): int(total)
+        for user_id, total in session.execute(
+            select(counts.c.user_id, func.sum(counts.c.n)).group_by(counts.c.user_id)
+        )
+    }
+    # The totals include the whole batch; walk it backwards so each delta
+    # carries the customer's count as of that purchase.
+    deltas = []
+    for purchase in reversed(purchases):
+        user_id = str(purchase.user_id)
+        count = totals[user_id]
+        totals[user_id] -= 1
+        deltas.append({
+            "purchase_id": purchase.id,
+            "supermarket_id": purchase.supermarket_id,
+            "user_id": user_id,
+            "user_purchase_count": count,
+            "new_buyer": count == 1,
+            "products": [product.name for product in purchase.products],
+            "created_at": purchase.created_at.isoformat(),
+        })
+    return deltas[::-1]
+
+
+def get_unique_buyers_count_from_views(session: Session) -> int:
+    """Count distinct buyers from the user purchase-count summary view."""
+    count = session.scalar(select(func.count()).select_from(user_purchase_counts_view))
+    return int(count or 0)
+
+
+def get_loyal_buyers_from_views(session: Session, min_purchases: int) -> list[dict]:
+    """Same result as `get_loyal_buyers`, read from the summary view."""
+    return _loyal_buyers(session, user_purchase_counts_view, min_purchases)
+
+
+def get_top_products_from_views(session: Session, limit: int) -> list:
+    """Same result as `get_top_products`, read from the summary view."""
+    return _top_products(session, product_sales_view, limit)
+
+
+def get_views_refreshed_at(session: Session):
+    """When the summary views were last refreshed (None if never)."""
+    return views_refreshed_at(session)
+
+
+def get_segments_scored_at(session: Session):
+    """When the last segmentation run finished (None if it never ran)."""
+    run = last_segment_run(session)
+    return run.finished_at if run else None
+
+
+def get_segment_summary(session: Session) -> dict:
+    """Customers per RFM segment, as of the last segmentation run."""
+    run = last_segment_run(session)
+    return {
+        "segments": segment_summary(session),
+        "scored_at": run.finished_at.isoformat() if run else None,
+        "run_mode": run.mode if run else None,
+    }
+
+
+def get_segment_customers_page(session: Session, segment: str, limit: int, cursor: str | None = None) -> dict:
+    """One keyset page of a segment's customers, biggest spenders first."""
+    rows = segment_customers_page(session, segment, limit + 1, _decode_segment_cursor(cursor))
+    customers = [
+        {
+            "user_id": str(row.user_id),
+            "last_purchase_at": row.last_purchase_at.isoformat(),
+            "frequency": row.frequency,
+            "monetary": row.monetary,
+            "scores": [row.recency_score, row.frequency_score, row.monetary_score],
+        }
         for row in rows
     ]
+    page = customers[:limit]
+    next_cursor = None
+    if len(customers) > limit:
+        raw = f"{page[-1]['monetary']!r}:{page[-1]['user_id']}".encode()
+        next_cursor = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+    return {"segment": segment, "customers": page, "next_cursor": next_cursor}
 
 
-def get_top_products(session: Session, limit: int) -> list:
-    """Return the top-selling products, including ties beyond the limit."""
+def _decode_segment_cursor(cursor: str | None) -> tuple[float, uuid.UUID] | None:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        monetary, user_id = raw.split(":", 1)
+        return float(monetary), uuid.UUID(user_id)
+    except ValueError as exc:
+        raise InvalidCursorError("Invalid cursor") from exc
+
+
+def _user_counts(use_views: bool) -> FromClause:
+    return user_purchase_counts_view if use_views else user_purchase_counts_query().subquery()
+
+
+def _buyer(row) -> dict:
+    return {"user_id": str(row.user_id), "purchase_count": int(row.purchase_count)}
+
+
+def _next_cursor(page: list[dict], total: int) -> str | None:
+    return encode_cursor(page[-1]) if page and total > len(page) else None
+
+
+def _loyal_buyers(session: Session, counts: FromClause, min_purchases: int) -> list[dict]:
+    stmt = loyal_buyers_page_statement(counts, min_purchases)
+    return [_buyer(row) for row in session.execute(stmt)]
+
+
+def _top_products(session: Session, sales: FromClause, limit: int) -> list:
     if limit <= 0:
         return []
 
-    times_sold = func.count(purchase_product.c.purchase_id)
-
+    # rank() keeps ties like FETCH ... WITH TIES, which SQLite lacks.
+    ranked = select(
+        sales.c.name,
+        sales.c.times_sold,
+        func.rank().over(order_by=sales.c.times_sold.desc()).label("sales_rank"),
+    ).subquery()
     stmt = (
-        select(Product.name, times_sold.label("times_sold"))
-        .join(purchase_product, Product.id == purchase_product.c.product_id)
-        .group_by(Product.id, Product.name)
-        .order_by(times_sold.desc())
-        .fetch(limit, with_ties=True)  # <-- DB does the “ties” logic
+        select(ranked.c.name, ranked.c.times_sold)
+        .where(ranked.c.sales_rank <= limit)
+        .order_by(ranked.c.times_sold.desc(), ranked.c.name)
     )
     rows = session.execute(stmt)
-    return [dict(row._mapping) for row in rows]
-
+    return [{"name": row.name, "times_sold": int(row.times_sold)} for row in rows]
@@ -0,0 +1,53 @@
+import hashlib
+import time
+
+from sqlalchemy import func, select, true
+from sqlalchemy.orm import Session
+
+from database.models import Product, Purchase
+
+
+def get_data_version(session: Session) -> str:
+    """Cheap fingerprint of the catalog/purchase data, used as a cache key part.
+
+    Purchases are append-only (archival keeps totals), so the highest id moves
+    on every write; a digest of the products covers added, removed, renamed
+    and repriced ones.
+    """
+    max_purchase_id, products = _purchase_and_product_versions(session)
+    return f"{max_purchase_id}-{products}"
+
+
+def get_catalog_versions(session: Session, supermarkets_ttl: float) -> dict[str, str]:
+    """Version of each catalog part, from one cheap query.
+
+    Products change with the product table's content. Users change with
+    purchases (a new customer only shows up in a purchase). Supermarkets have
+    no cheap fingerprint, since they are only listed as distinct purchase
+    values, so their version moves every `supermarkets_ttl` seconds instead.
+    """
+    max_purchase_id, products = _purchase_and_product_versions(session)
+    return {
+        "products": products,
+        "supermarkets": f"t{int(time.time() // supermarkets_ttl)}",
+        "users": str(max_purchase_id),
+    }
+
+
+def _purchase_and_product_versions(session: Session) -> tuple[int, str]:
+    """Highest purchase id and a digest of every product's id, name and price, in one query.
+
+    The catalog is a few dozen rows, so hashing all of it costs less than a
+    timestamp column and trigger would.
+    """
+    max_purchase = select(func.max(Purchase.id).label("id")).subquery()
+    rows = session.execute(
+        select(max_purchase.c.id, Product.id, Product.name, Product.unit_price)
+        .select_from(max_purchase.outerjoin(Product, true()))
+        .order_by(Product.id)
+    ).all()
+    digest = hashlib.blake2b(digest_size=8)
+    for _, product_id, name, unit_price in rows:
+        if product_id is not None:
+            digest.update(f"{product_id}\x1f{name}\x1f{unit_price!r}\x1e".encode())
+    return rows[0][0] or 0, digest.hexdigest()
@@ -0,0 +1,145 @@
+"""Serialized payloads persisted across worker restarts and deploys.
+
+Every payload a worker builds is also written, tagged with its data version,
+to a snapshot file shared by all workers (`icash_common.snapshot`). The
+master maps the file at boot, so forked workers start with it. A worker that
+has not built a key yet answers from the snapshot: directly when the version
+still matches, or, when the data has moved on, with the previous version
+while the new one is built in the background. From then on the worker builds
+that key on its own misses as before.
+"""
+import logging
+import os
+import threading
+import time
+
+from icash_common.snapshot import SnapshotEntry, SnapshotFile
+
+logger = logging.getLogger(__name__)
+
+
+class WarmCacheSnapshot:
+    def __init__(self):
+        self._app = None
+        self.snapshot = None
+        self.max_stale = 600.0
+        self.flush_interval = 2.0
+        self._warm: set[str] = set()        # keys this worker has built
+        self._warm_pid = None
+        self._pending: dict[str, SnapshotEntry] = {}
+        self._refreshing: set[str] = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.snapshot_hits = 0
+        self.stale_served = 0
+        self.background_refreshes = 0
+        self.refresh_failures = 0
+        self.entries_written = 0
+
+    def init_app(self, app) -> None:
+        path = app.config["WARM_CACHE_PATH"]
+        if not path:
+            return
+        self._app = app
+        self.max_stale = float(app.config["WARM_CACHE_MAX_STALE_SECONDS"])
+        self.flush_interval = float(app.config["WARM_CACHE_FLUSH_INTERVAL"])
+        self.snapshot = SnapshotFile(path)
+        logger.info("Warm cache snapshot %s: %d payloads", path, self.snapshot.reload())
+
+    @property
+    def enabled(self) -> bool:
+        return self.snapshot is not None
+
+    def _warm_keys(self) -> set[str]:
+        # A forked worker has built nothing yet, whatever its parent did.
+        if self._warm_pid != os.getpid():
+            self._warm, self._warm_pid = set(), os.getpid()
+        return self._warm
+
+    def lookup(self, key: str, version: str) -> tuple[SnapshotEntry | None, bool]:
+        """(entry, fresh) to answer a miss on `key` from, or (None, False) to build it now."""
+        if not self.enabled or key in self._warm_keys():
+            return None, False
+        entry = self.snapshot.get(key)
+        if entry is None:
+            return None, False
+        if entry.version == version:
+            self.snapshot_hits += 1
+            return entry, True
+        if time.time() - entry.written_at <= self.max_stale:
+            self.stale_served += 1
+            return entry, False
+        return None, False
+
+    def store(self, key: str, entry: SnapshotEntry) -> None:
+        """Queue a freshly built payload for the snapshot; written by a background thread."""
+        if not self.enabled:
+            return
+        self._warm_keys().add(key)
+        with self._lock:
+            self._pending[key] = entry
+        self._ensure_writer()
+        self._wakeup.set()
+
+    def refresh_in_background(self, key: str, job) -> None:
+        """Run `job` (which builds and stores `key`) off the request path, once at a time."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, job), name=f"warm-cache-{key}", daemon=True).start()
+
+    def _refresh(self, key: str, job) -> None:
+        try:
+            with self._app.app_context():
+                job()
+            self.background_refreshes += 1
+        except Exception:
+            self.refresh_failures += 1
+            logger.exception("Background refresh of %s failed", key)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _ensure_writer(self) -> None:
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="warm-cache-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            # Let a burst of misses (one per key after a data change) land in one write.
+            time.sleep(self.flush_interval)
+            self._wakeup.clear()
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            try:
+                self.snapshot.update(pending)
+                self.entries_written += len(pending)
+            except Exception:
+                logger.exception("Writing the warm cache snapshot failed")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.snapshot.path if self.enabled else None,
+            "warm_keys": sorted(self._warm_keys()),
+            "snapshot_hits": self.snapshot_hits,
+            "stale_served": self.stale_served,
+            "background_refreshes": self.background_refreshes,
+            "refresh_failures": self.refresh_failures,
+            "entries_written": self.entries_written,
+            "pending": len(self._pending),
+        }
+
+
+__all__ = ["WarmCacheSnapshot"]
@@ -0,0 +1,99 @@
+"""Startup-time benchmark: legacy entrypoint steps vs. single-process api.boot.
+
+Runs against a throwaway SQLite database, so no Postgres is needed:
+
+    python benchmarks/startup_benchmark.py --runs 5 --workers 4
+
+"legacy" replays what entrypoint.sh used to do: one interpreter for the
+readiness probe, one for database/seed.py, then one interpreter per gunicorn
+worker importing api.wsgi (started together, timed until all are done).
+"boot" is `python -m api.boot --check-only`: the same checks in one
+interpreter that also builds the app; forked workers reuse it, so their
+import cost disappears.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SERVICE_ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+from sqlalchemy import create_engine, text
+from database.database_config import SQLAlchemy_DATABASE
+with create_engine(SQLAlchemy_DATABASE).connect() as conn:
+    conn.execute(text("SELECT 1"))
+"""
+
+
+def _env(database_path: Path) -> dict:
+    env = dict(os.environ)
+    env.update(
+        DATABASE_DRIVER="sqlite",
+        DATABASE_USERNAME="",
+        DATABASE_PASSWORD="",
+        DATABASE_HOST="",
+        DATABASE_NAME=str(database_path),
+        LOG_LEVEL="WARNING",
+        PYTHONPATH=os.pathsep.join(
+            filter(None, [str(SERVICE_ROOT), str(SERVICE_ROOT.parent / "common"), env.get("PYTHONPATH")])
+        ),
+    )
+    return env
+
+
+def _run(args: list[str], env: dict) -> None:
+    subprocess.run(args, cwd=SERVICE_ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+
+def legacy_startup(env: dict, workers: int) -> float:
+    started = time.perf_counter()
+    _run([sys.executable, "-c", PROBE], env)
+    _run([sys.executable, "database/seed.py"], env)
+    procs = [
+        subprocess.Popen([sys.executable, "-c", "import api.wsgi"], cwd=SERVICE_ROOT, env=env)
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        if proc.wait():
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
+    return time.perf_counter() - started
+
+
+def boot_startup(env: dict, workers: int) -> float:
+    started = time.perf_counter()
+    _run([sys.executable, "-m", "api.boot", "--check-only"], env)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<8} {'path':<7} {'median_s':>9} {'min_s':>7} {'max_s':>7}")
+    for scenario in ("cold", "warm"):
+        for name, startup in (("legacy", legacy_startup), ("boot", boot_startup)):
+            timings = []
+            with tempfile.TemporaryDirectory() as tmp:
+                database_path = Path(tmp) / "bench.db"
+                env = _env(database_path)
+                if scenario == "warm":
+                    _run([sys.executable, "database/seed.py"], env)
+                for _ in range(args.runs):
+                    if scenario == "cold":
+                        database_path.unlink(missing_ok=True)
+                    timings.append(startup(env, args.workers))
+            print(
+                f"{scenario:<8} {name:<7} {statistics.median(timings):>9.3f} "
+                f"{min(timings):>7.3f} {max(timings):>7.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import URL
 from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass
 
+from database.pool import InstrumentedQueuePool, install_fork_safety
+
 
 class Base(MappedAsDataclass, DeclarativeBase):
     """Shared declarative base for all models."""
@@ -22,11 +24,46 @@ SQLAlchemy_DATABASE = URL.create(
     database=os.environ["DATABASE_NAME"],
 )
 
+# Gunicorn process model; gunicorn.conf.py reads the same variables.
+GUNICORN_WORKERS = int(os.getenv("GUNICORN_WORKERS", 4))
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", 4))
+
+
+def build_engine_options(workers: int = GUNICORN_WORKERS, threads: int = GUNICORN_THREADS) -> dict:
+    """Derive per-worker pool settings from the gunicorn worker/thread counts.
+
+    Each worker gets one pooled connection per request thread plus a little
+    overflow, clamped so that all workers together stay inside the
+    DB_MAX_CONNECTIONS budget. Every value can be pinned through env vars.
+    """
+    budget = int(os.getenv("DB_MAX_CONNECTIONS", 90))
+    per_worker = max(budget // max(workers, 1), 1)
+
+    pool_size = int(os.getenv("DB_POOL_SIZE", threads))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", max(threads // 2, 1)))
+    pool_size = min(max(pool_size, 1), per_worker)
+    max_overflow = max(min(max_overflow, per_worker - pool_size), 0)
+
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+
+
 def init_app(app):
     """Bind SQLAlchemy to the Flask app with sane defaults."""
     app.config["SQLALCHEMY_DATABASE_URI"] = SQLAlchemy_DATABASE
+    if SQLAlchemy_DATABASE.get_backend_name() != "sqlite":
+        app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", build_engine_options())
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            install_fork_safety(engine)
     return db
 
 
-__all__ = ["db", "Base", "init_app", "SQLAlchemy_DATABASE"]
+__all__ = ["db", "Base", "init_app", "build_engine_options", "SQLAlchemy_DATABASE"]
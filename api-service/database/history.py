@@ -0,0 +1,39 @@
+"""Per-customer purchase history, paged newest first.
+
+Pages are keyed on (created_at, id) and served from the composite
+`ix_purchase_user_id_created_at` index, so fetching a page costs the same
+however long the customer's history is. Baskets are loaded for the whole
+page in one extra IN query instead of once per purchase.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, selectinload
+
+from database.models import Purchase
+
+
+def user_purchases_page(
+    session: Session, user_id, limit: int, before: tuple[datetime, int] | None = None
+) -> list[Purchase]:
+    """Up to `limit` purchases of `user_id` older than `before`, newest first.
+
+    `before` is the (created_at, id) of the last purchase of the previous page.
+    """
+    stmt = (
+        select(Purchase)
+        .where(Purchase.user_id == user_id)
+        .options(selectinload(Purchase.products))
+        .order_by(Purchase.created_at.desc(), Purchase.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        created_at, purchase_id = before
+        stmt = stmt.where(or_(
+            Purchase.created_at < created_at,
+            and_(Purchase.created_at == created_at, Purchase.id < purchase_id),
+        ))
+    return list(session.scalars(stmt))
+
+
+__all__ = ["user_purchases_page"]
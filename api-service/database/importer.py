@@ -0,0 +1,441 @@
+"""Bulk import of historical purchase CSVs, one file per branch per day.
+
+Files use the same columns as `data/purchases.csv` (supermarket_id,
+timestamp, user_id, items_list, total_amount). A process pool hashes and
+parses them; files whose checksum is already in `imported_file` are skipped,
+so re-running an import over the same directory only loads new files. Rows
+with a bad user_id, timestamp or amount, or naming an unknown product, are
+rejected and reported per file; the rest of the file still loads.
+
+A file with rejected rows is still recorded as imported, so a plain rerun
+skips it. Once the cause is fixed (say the missing products were added),
+rerun with --retry-rejected: such files are parsed again and only rows not
+stored yet are loaded. Every imported row carries an idempotency key made of
+the file checksum and its line, which is what makes the retry safe.
+
+Parsed files go to a bounded number of writer threads, each with its own
+connection. Files are sharded across writers by branch, so one branch's days
+load in order on one writer while different branches load side by side. A
+file loads in one transaction together with its `imported_file` row: it is
+either fully imported or not at all.
+
+Run as a script:
+    python database/importer.py /data/history/               # every *.csv in the directory
+    python database/importer.py "/data/history/SMKT00*_2024-*.csv" --workers 4 --writers 2
+    python database/importer.py /data/history/ --retry-rejected   # after adding missing products
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import io
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import Connection, Engine, create_engine, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+# Allow running as a script (python database/importer.py) by adding repo root to sys.path
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from database.database_config import SQLAlchemy_DATABASE
+from database.models import Product, Purchase, imported_file, purchase_product
+from database.partitioning import ensure_month_partitions
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("supermarket_id", "timestamp", "user_id", "items_list", "total_amount")
+INSERT_BATCH = 1000
+MAX_ERRORS_SHOWN = 20
+
+
+@dataclass
+class ParsedFile:
+    path: str
+    checksum: str
+    branch: str | None = None
+    purchases: list[dict] = field(default_factory=list)
+    errors: list[tuple[int, str]] = field(default_factory=list)  # (line number, reason)
+    skipped: bool = False
+    failed: str | None = None  # why the file could not be read
+    retry: bool = False  # recorded before with rejected rows; load only the rows not stored yet
+
+
+@dataclass
+class ImportReport:
+    files_found: int = 0
+    files_imported: int = 0
+    files_skipped: int = 0
+    files_failed: int = 0
+    purchases_imported: int = 0
+    rows_rejected: int = 0
+    parse_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    errors: dict[str, list[tuple[int, str]]] = field(default_factory=dict)
+    failures: dict[str, str] = field(default_factory=dict)  # path -> reason, for files_failed
+
+    def render(self) -> str:
+        elapsed = max(self.elapsed_seconds, 1e-9)
+        lines = [
+            f"Files: {self.files_found} found, {self.files_imported} imported, "
+            f"{self.files_skipped} already imported, {self.files_failed} failed",
+            f"Purchases: {self.purchases_imported} imported, {self.rows_rejected} rows rejected",
+            f"Time: {self.elapsed_seconds:.2f}s ({self.parse_seconds:.2f}s parsing), "
+            f"{self.purchases_imported / elapsed:,.0f} purchases/s, {self.files_imported / elapsed:.1f} files/s",
+        ]
+        lines.extend(f"{path}: failed: {reason}" for path, reason in sorted(self.failures.items()))
+        for path, errors in sorted(self.errors.items()):
+            lines.append(f"{path}: {len(errors)} rejected")
+            lines.extend(f"  line {line}: {reason}" for line, reason in errors[:MAX_ERRORS_SHOWN])
+            if len(errors) > MAX_ERRORS_SHOWN:
+                lines.append(f"  ... and {len(errors) - MAX_ERRORS_SHOWN} more")
+        if self.errors:
+            lines.append("Files with rejected rows are recorded as imported; "
+                         "fix the cause and rerun with --retry-rejected to load those rows.")
+        return "\n".join(lines)
+
+
+def find_files(source: str) -> list[str]:
+    """CSV files in a directory, or the files matching a glob, in name order."""
+    if os.path.isdir(source):
+        return sorted(str(path) for path in Path(source).glob("*.csv"))
+    return sorted(path for path in glob.glob(source) if os.path.isfile(path))
+
+
+def parse_purchases(text: str, product_ids: dict[str, int]) -> tuple[list[dict], list[tuple[int, str]]]:
+    """(purchases, errors) from CSV text; a bad row is reported and left out."""
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        return [], [(1, f"missing columns: {', '.join(missing)}")]
+
+    purchases, errors = [], []
+    for row in reader:
+        line = reader.line_num
+        try:
+            purchases.append({**_parse_row(row, product_ids), "line": line})
+        except ValueError as exc:
+            errors.append((line, str(exc)))
+    return purchases, errors
+
+
+def _parse_row(row: dict, product_ids: dict[str, int]) -> dict:
+    supermarket_id = (row["supermarket_id"] or "").strip()
+    if not supermarket_id:
+        raise ValueError("supermarket_id is required")
+    try:
+        user_id = uuid.UUID((row["user_id"] or "").strip())
+    except ValueError:
+        raise ValueError(f"invalid user_id {row['user_id']!r}") from None
+    try:
+        created_at = datetime.fromisoformat((row["timestamp"] or "").strip())
+    except ValueError:
+        raise ValueError(f"invalid timestamp {row['timestamp']!r}") from None
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    try:
+        total_amount = float(row["total_amount"])
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid total_amount {row['total_amount']!r}") from None
+    if total_amount <= 0:
+        raise ValueError("total_amount must be positive")
+
+    names = [name.strip() for name in (row["items_list"] or "").split(",") if name.strip()]
+    if not names:
+        raise ValueError("items_list is empty")
+    unknown = [name for name in names if name not in product_ids]
+    if unknown:
+        raise ValueError(f"unknown product(s): {', '.join(unknown)}")
+    return {
+        "supermarket_id": supermarket_id,
+        "created_at": created_at,
+        "user_id": user_id,
+        "total_amount": total_amount,
+        "product_ids": list(dict.fromkeys(product_ids[name] for name in names)),
+    }
+
+
+# Per-process state of the parse pool, set once by _init_parser.
+_product_ids: dict[str, int] = {}
+_known_checksums: frozenset[str] = frozenset()
+_retry_checksums: frozenset[str] = frozenset()
+
+
+def _init_parser(
+    product_ids: dict[str, int], known_checksums: frozenset[str], retry_checksums: frozenset[str] = frozenset()
+) -> None:
+    global _product_ids, _known_checksums, _retry_checksums
+    _product_ids, _known_checksums, _retry_checksums = product_ids, known_checksums, retry_checksums
+
+
+def parse_file(path: str) -> ParsedFile:
+    """Hash and parse one file; a file imported before is only hashed, unless it is to be retried."""
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except OSError as exc:
+        # Vanished or unreadable since it was listed: fail this file, not the run.
+        return ParsedFile(path=path, checksum="", failed=f"unreadable: {exc}")
+    parsed = ParsedFile(path=path, checksum=hashlib.sha256(data).hexdigest())
+    if parsed.checksum in _retry_checksums:
+        parsed.retry = True
+    elif parsed.checksum in _known_checksums:
+        parsed.skipped = True
+        return parsed
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError as exc:
+        parsed.errors.append((1, f"not UTF-8: {exc}"))
+        return parsed
+    parsed.purchases, parsed.errors = parse_purchases(text, _product_ids)
+    if parsed.purchases:
+        parsed.branch = parsed.purchases[0]["supermarket_id"]
+    return parsed
+
+
+def row_key(checksum: str, line: int) -> str:
+    """Idempotency key of one imported row: its file's content and its line in it."""
+    return f"import:{checksum[:40]}:{line}"
+
+
+def write_file(engine: Engine, parsed: ParsedFile) -> int | None:
+    """Load one parsed file and record it; returns the purchases stored.
+
+    None if another import recorded the file first. A retried file only
+    stores the rows that are not stored yet, and updates its record.
+    """
+    if parsed.purchases:
+        stamps = [purchase["created_at"] for purchase in parsed.purchases]
+        ensure_month_partitions(engine, min(stamps), max(stamps))
+    purchase_table = Purchase.__table__
+    try:
+        with engine.begin() as conn:
+            if parsed.retry:
+                record = imported_file.c.checksum == parsed.checksum
+                # Update the record first: a concurrent retry of the same file then waits for this one.
+                conn.execute(update(imported_file).where(record).values(
+                    imported_at=datetime.now(timezone.utc), rows_rejected=len(parsed.errors),
+                ))
+                purchases = _unstored(conn, parsed)
+                conn.execute(update(imported_file).where(record).values(
+                    purchases_imported=imported_file.c.purchases_imported + len(purchases),
+                ))
+            else:
+                purchases = parsed.purchases
+                # Claim the file first: a concurrent import of the same content fails here, not after loading it.
+                conn.execute(insert(imported_file).values(
+                    checksum=parsed.checksum,
+                    filename=os.path.basename(parsed.path)[:255],
+                    imported_at=datetime.now(timezone.utc),
+                    purchases_imported=len(purchases),
+                    rows_rejected=len(parsed.errors),
+                ))
+            for start in range(0, len(purchases), INSERT_BATCH):
+                batch = purchases[start:start + INSERT_BATCH]
+                ids = conn.execute(
+                    insert(purchase_table).returning(purchase_table.c.id, sort_by_parameter_order=True),
+                    [_purchase_row(parsed.checksum, purchase) for purchase in batch],
+                ).scalars().all()
+                conn.execute(insert(purchase_product), [
+                    {"purchase_id": purchase_id, "product_id": product_id}
+                    for purchase_id, purchase in zip(ids, batch)
+                    for product_id in purchase["product_ids"]
+                ])
+    except IntegrityError:
+        if parsed.retry:
+            raise
+        with engine.connect() as conn:
+            if conn.scalar(select(imported_file.c.checksum).where(imported_file.c.checksum == parsed.checksum)):
+                return None
+        raise
+    return len(purchases)
+
+
+def _purchase_row(checksum: str, purchase: dict) -> dict:
+    row = {key: purchase[key] for key in ("supermarket_id", "created_at", "user_id", "total_amount")}
+    row["idempotency_key"] = row_key(checksum, purchase["line"])
+    return row
+
+
+def _unstored(conn: Connection, parsed: ParsedFile) -> list[dict]:
+    """The rows of a retried file that a previous import did not store."""
+    key_column = Purchase.__table__.c.idempotency_key
+    stored = set()
+    for start in range(0, len(parsed.purchases), INSERT_BATCH):
+        batch = parsed.purchases[start:start + INSERT_BATCH]
+        keys = [row_key(parsed.checksum, purchase["line"]) for purchase in batch]
+        stored.update(conn.scalars(select(key_column).where(key_column.in_(keys))))
+    recorded = conn.scalar(
+        select(imported_file.c.purchases_imported).where(imported_file.c.checksum == parsed.checksum)
+    )
+    if recorded and not stored:
+        # Loaded before rows carried keys: its stored rows cannot be told apart, so a retry would duplicate them.
+        raise ValueError(f"{parsed.path} was imported without row keys and cannot be retried")
+    return [purchase for purchase in parsed.purchases if row_key(parsed.checksum, purchase["line"]) not in stored]
+
+
+class _Writers:
+    """`count` writer threads, each fed by its own bounded queue; a branch always maps to one writer."""
+
+    def __init__(self, engine: Engine, count: int, report: ImportReport, depth: int = 2):
+        self.engine = engine
+        self.report = report
+        self._lock = threading.Lock()
+        self._queues = [queue.Queue(maxsize=depth) for _ in range(max(count, 1))]
+        self._threads = [
+            threading.Thread(target=self._run, args=(q,), name=f"import-writer-{n}", daemon=True)
+            for n, q in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, parsed: ParsedFile) -> None:
+        # crc32, not hash(): stable across runs, so a rerun shards the same way.
+        shard = zlib.crc32((parsed.branch or parsed.path).encode()) % len(self._queues)
+        self._queues[shard].put(parsed)  # blocks while that writer is behind
+
+    def fail(self, path: str, reason: str) -> None:
+        with self._lock:
+            self.report.files_failed += 1
+            self.report.failures[path] = reason
+
+    def close(self) -> None:
+        for q in self._queues:
+            q.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self, jobs: queue.Queue) -> None:
+        while (parsed := jobs.get()) is not None:
+            try:
+                stored = write_file(self.engine, parsed)
+            except Exception as exc:
+                logger.exception("Import of %s failed", parsed.path)
+                self.fail(parsed.path, str(exc))
+                continue
+            with self._lock:
+                if stored is not None:
+                    self.report.files_imported += 1
+                    self.report.purchases_imported += stored
+                    self.report.rows_rejected += len(parsed.errors)
+                    if parsed.errors:
+                        self.report.errors[parsed.path] = parsed.errors
+                else:
+                    self.report.files_skipped += 1
+
+
+def run_import(
+    engine: Engine,
+    paths: list[str],
+    workers: int = 1,
+    writers: int = 1,
+    retry_rejected: bool = False,
+) -> ImportReport:
+    """Import `paths`; with `workers` > 1 files are hashed and parsed in a process pool.
+
+    With `retry_rejected`, files recorded before with rejected rows are parsed
+    again and their rows that are not stored yet are loaded.
+    """
+    started = time.perf_counter()
+    report = ImportReport(files_found=len(paths))
+    with engine.connect() as conn:
+        product_ids = {name: product_id for product_id, name in conn.execute(select(Product.id, Product.name))}
+        known = frozenset(conn.scalars(select(imported_file.c.checksum)))
+        retry = frozenset(conn.scalars(
+            select(imported_file.c.checksum).where(imported_file.c.rows_rejected > 0)
+        )) if retry_rejected else frozenset()
+
+    seen: set[str] = set()
+    writer_pool = _Writers(engine, writers, report)
+
+    def dispatch(parsed: ParsedFile) -> None:
+        if parsed.failed:
+            logger.error("Import of %s failed: %s", parsed.path, parsed.failed)
+            writer_pool.fail(parsed.path, parsed.failed)
+            return
+        if parsed.skipped or parsed.checksum in seen:
+            report.files_skipped += 1
+            return
+        seen.add(parsed.checksum)
+        writer_pool.put(parsed)
+
+    parse_started = time.perf_counter()
+    try:
+        if workers > 1 and len(paths) > 1:
+            pending_paths = iter(paths)
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_parser, initargs=(product_ids, known, retry)
+            ) as pool:
+                # Keep a bounded window in flight so parsed files never pile up in memory.
+                in_flight = {pool.submit(parse_file, path) for _, path in zip(range(workers * 2), pending_paths)}
+                while in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        dispatch(future.result())
+                        if (path := next(pending_paths, None)) is not None:
+                            in_flight.add(pool.submit(parse_file, path))
+        else:
+            _init_parser(product_ids, known, retry)
+            for path in paths:
+                dispatch(parse_file(path))
+        report.parse_seconds = time.perf_counter() - parse_started
+    finally:
+        writer_pool.close()
+    report.elapsed_seconds = time.perf_counter() - started
+    return report
+
+
+def main(argv=None) -> None:
+    from icash_common import setup_logging
+    from database.rollups import refresh_views
+
+    setup_logging()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("source", help="directory of CSV files, or a glob pattern")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parser processes")
+    parser.add_argument("--writers", type=int, default=2,
+                        help="parallel database writers (each holds one connection)")
+    parser.add_argument("--retry-rejected", action="store_true",
+                        help="re-parse files imported with rejected rows and load the rows not stored yet")
+    args = parser.parse_args(argv)
+
+    paths = find_files(args.source)
+    if not paths:
+        parser.error(f"no CSV files found at {args.source}")
+    engine = create_engine(SQLAlchemy_DATABASE, pool_size=max(args.writers, 1))
+    imported_file.create(engine, checkfirst=True)
+    report = run_import(
+        engine, paths, workers=args.workers, writers=args.writers, retry_rejected=args.retry_rejected
+    )
+    if report.files_imported:
+        refresh_views(engine)
+    print(report.render())
+    if report.files_failed:
+        sys.exit(1)
+
+
+__all__ = [
+    "ImportReport",
+    "ParsedFile",
+    "find_files",
+    "parse_purchases",
+    "parse_file",
+    "row_key",
+    "write_file",
+    "run_import",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ from datetime import datetime
 import uuid
 from typing import List
 
-from sqlalchemy import Column, DateTime, ForeignKey, Index, String, Table, func, CheckConstraint
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Table, func, CheckConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID as PGUUID
 
@@ -17,11 +17,85 @@ purchase_product = Table(
 
 Index("ix_purchase_product_product_id", purchase_product.c.product_id)
 
+# Last refresh time of each analytics summary view (see database/rollups.py).
+analytics_refresh = Table(
+    "analytics_refresh",
+    Base.metadata,
+    Column("view_name", String(63), primary_key=True),
+    Column("refreshed_at", DateTime(timezone=True), nullable=False),
+)
+
+# Summary-only storage for archived months (see database/partitioning.py).
+purchase_archive_summary = Table(
+    "purchase_archive_summary",
+    Base.metadata,
+    Column("month", Date, primary_key=True),
+    Column("supermarket_id", String, primary_key=True),
+    Column("user_id", PGUUID(as_uuid=True), primary_key=True),
+    Column("purchase_count", Integer, nullable=False),
+    Column("total_amount", Float, nullable=False),
+)
+
+product_archive_summary = Table(
+    "product_archive_summary",
+    Base.metadata,
+    Column("month", Date, primary_key=True),
+    Column("supermarket_id", String, primary_key=True),
+    Column("product_id", ForeignKey("product.id"), primary_key=True),
+    Column("times_sold", Integer, nullable=False),
+)
+
+# RFM scores per customer, written by the segmentation job (database/segments.py).
+customer_segment = Table(
+    "customer_segment",
+    Base.metadata,
+    Column("user_id", PGUUID(as_uuid=True), primary_key=True),
+    Column("last_purchase_at", DateTime(timezone=True), nullable=False),
+    Column("frequency", Integer, nullable=False),
+    Column("monetary", Float, nullable=False),
+    Column("recency_score", Integer, nullable=False),
+    Column("frequency_score", Integer, nullable=False),
+    Column("monetary_score", Integer, nullable=False),
+    Column("segment", String(32), nullable=False),
+    Column("scored_at", DateTime(timezone=True), nullable=False),
+)
+
+# Segment listings page by (segment, monetary desc, user_id).
+Index(
+    "ix_customer_segment_segment_monetary",
+    customer_segment.c.segment,
+    customer_segment.c.monetary.desc(),
+    customer_segment.c.user_id,
+)
+
+# One row per segmentation run; incremental runs start after the last max_purchase_id.
+segment_run = Table(
+    "segment_run",
+    Base.metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("mode", String(16), nullable=False),
+    Column("started_at", DateTime(timezone=True), nullable=False),
+    Column("finished_at", DateTime(timezone=True), nullable=False),
+    Column("max_purchase_id", Integer, nullable=False),
+    Column("customers_scored", Integer, nullable=False),
+)
+
+# Historical CSV files already loaded (see database/importer.py), keyed by content.
+imported_file = Table(
+    "imported_file",
+    Base.metadata,
+    Column("checksum", String(64), primary_key=True),
+    Column("filename", String(255), nullable=False),
+    Column("imported_at", DateTime(timezone=True), nullable=False),
+    Column("purchases_imported", Integer, nullable=False),
+    Column("rows_rejected", Integer, nullable=False),
+)
+
 class Purchase(db.Model):
     __tablename__ = "purchase"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True, init=False)
-    supermarket_id: Mapped[str] = mapped_column(nullable=False, index=True)
+    supermarket_id: Mapped[str] = mapped_column(nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),  # store timezone-aware timestamps
         server_default=func.now(),  # DB sets it on INSERT
@@ -35,13 +109,28 @@ class Purchase(db.Model):
     user_id: Mapped[uuid.UUID] = mapped_column(
         PGUUID(as_uuid=True),
         nullable=False,
-        index=True,
     )
     total_amount: Mapped[float] = mapped_column(nullable=False)
+    # Sender-chosen key of a sale; a re-sent sale with the same key is not stored again.
+    idempotency_key: Mapped[str | None] = mapped_column(String(64), nullable=True, default=None)
 
     __table_args__ = (
         # Disallow free purchases; amount must be strictly positive.
         CheckConstraint("total_amount > 0", name="ck_purchase_total_amount_positive"),
+        # Branch + time range scans; also serves plain supermarket_id lookups.
+        Index("ix_purchase_supermarket_id_created_at", "supermarket_id", "created_at"),
+        # Customer history pages (newest first); also serves plain user_id lookups.
+        # On PostgreSQL the INCLUDE columns make it covering for history rows.
+        Index(
+            "ix_purchase_user_id_created_at",
+            "user_id",
+            "created_at",
+            "id",
+            postgresql_include=["supermarket_id", "total_amount"],
+        ),
+        # A unique index on a partitioned table must contain the partition key;
+        # senders fix created_at when the sale is made, so it is the same on every retry.
+        Index("ux_purchase_idempotency_key", "idempotency_key", "created_at", unique=True),
     )
 
 class Product(db.Model):
@@ -0,0 +1,273 @@
+"""Monthly range partitioning and archival of the purchase tables.
+
+With PURCHASE_PARTITIONING=monthly a fresh PostgreSQL database gets `purchase`
+as a table partitioned by `created_at`, one partition per month plus a
+DEFAULT partition so inserts never fail for a month without its own table.
+PostgreSQL cannot enforce a foreign key to a partitioned table unless the
+key includes the partition column, so in that mode `purchase_product` keeps
+its link to `purchase` in the ORM only.
+
+Archiving folds old months into `purchase_archive_summary` and
+`product_archive_summary` and then drops their rows (or whole partitions);
+the analytics rollups read both, so totals stay the same across archival.
+
+Run as a script:
+    python database/partitioning.py create-partitions --months-ahead 3
+    python database/partitioning.py archive --keep-months 12
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import Connection, Date, Engine, Table, create_engine, delete, func, insert, literal, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# Allow running as a script (python database/partitioning.py) by adding repo root to sys.path
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from database.database_config import SQLAlchemy_DATABASE
+from database.models import (
+    Purchase,
+    product_archive_summary,
+    purchase_archive_summary,
+    purchase_product,
+)
+
+logger = logging.getLogger(__name__)
+
+PARTITIONING_MODE = os.getenv("PURCHASE_PARTITIONING", "none")
+# Serializes partition creation across processes and import writers; any constant works.
+PARTITION_LOCK_KEY = 0x1CA5_0043
+
+# Mirrors database.models.Purchase; the primary key must include created_at.
+_PARTITIONED_PURCHASE_DDL = """
+CREATE TABLE IF NOT EXISTS purchase (
+    id SERIAL NOT NULL,
+    supermarket_id VARCHAR NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+    user_id UUID NOT NULL,
+    total_amount FLOAT NOT NULL,
+    idempotency_key VARCHAR(64),
+    CONSTRAINT ck_purchase_total_amount_positive CHECK (total_amount > 0),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at)
+"""
+
+_PARTITIONED_PURCHASE_PRODUCT_DDL = """
+CREATE TABLE IF NOT EXISTS purchase_product (
+    purchase_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL REFERENCES product (id),
+    PRIMARY KEY (purchase_id, product_id)
+)
+"""
+
+
+def month_start(value: date | datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"purchase_p{month:%Y_%m}"
+
+
+def _utc_bound(month: date) -> str:
+    return f"{month.isoformat()} 00:00:00+00"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    """True if `purchase` is a PostgreSQL partitioned table."""
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.scalar(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('purchase')"))
+    return relkind == "p"
+
+
+def create_partitioned_tables(engine: Engine) -> None:
+    """Create the partitioned purchase tables; call before Base.metadata.create_all."""
+    if engine.dialect.name != "postgresql":
+        logger.warning("Partitioning requested on %s; using plain tables", engine.dialect.name)
+        return
+    with engine.begin() as conn:
+        if conn.scalar(text("SELECT to_regclass('purchase')")) is None:
+            conn.execute(text(_PARTITIONED_PURCHASE_DDL))
+            conn.execute(text(_PARTITIONED_PURCHASE_PRODUCT_DDL))
+            for index in (*Purchase.__table__.indexes, *purchase_product.indexes):
+                index.create(conn, checkfirst=True)
+            logger.info("Created partitioned purchase table")
+        if is_partitioned(conn):
+            conn.execute(text("CREATE TABLE IF NOT EXISTS purchase_default PARTITION OF purchase DEFAULT"))
+        else:
+            logger.warning("purchase already exists as a plain table; partitioning not applied")
+
+
+def ensure_month_partitions(engine: Engine, first: date | datetime, last: date | datetime) -> list[str]:
+    """Make sure a partition exists for every month in [first, last]; returns new names."""
+    created = []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return created
+        # Two writers missing the same month would both CREATE it; the loser's
+        # transaction would fail on the duplicate relation. Held until commit.
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+        month, stop = month_start(first), month_start(last)
+        while month <= stop:
+            name = partition_name(month)
+            if conn.scalar(text("SELECT to_regclass(:name)"), {"name": name}) is None:
+                _create_month_partition(conn, month)
+                created.append(name)
+            month = add_months(month, 1)
+    if created:
+        logger.info("Created purchase partitions: %s", ", ".join(created))
+    return created
+
+
+def _create_month_partition(conn: Connection, month: date) -> None:
+    """Create one month's partition, moving any of its rows out of the default partition.
+
+    PostgreSQL refuses to create a partition while the default partition holds
+    rows in its range (written before the partition existed), so those rows
+    are moved with the default partition detached.
+    """
+    name = partition_name(month)
+    lower, upper = _utc_bound(month), _utc_bound(add_months(month, 1))
+    in_month = f"created_at >= '{lower}' AND created_at < '{upper}'"
+    create = text(f"CREATE TABLE {name} PARTITION OF purchase FOR VALUES FROM ('{lower}') TO ('{upper}')")
+    stranded = conn.scalar(text(f"SELECT count(*) FROM purchase_default WHERE {in_month}"))
+    if not stranded:
+        conn.execute(create)
+        return
+
+    conn.execute(text("ALTER TABLE purchase DETACH PARTITION purchase_default"))
+    conn.execute(create)
+    conn.execute(text(f"INSERT INTO {name} SELECT * FROM purchase_default WHERE {in_month}"))
+    conn.execute(text(f"DELETE FROM purchase_default WHERE {in_month}"))
+    conn.execute(text("ALTER TABLE purchase ATTACH PARTITION purchase_default DEFAULT"))
+    logger.info("Moved %d purchases from purchase_default into %s", stranded, name)
+
+
+def _merge_into_summary(conn: Connection, table: Table, query, counters: tuple[str, ...]) -> None:
+    """INSERT ... SELECT that adds onto existing rows when a month is archived twice."""
+    columns = [column.name for column in table.columns]
+    upsert = {"postgresql": pg_insert, "sqlite": sqlite_insert}.get(conn.dialect.name)
+    if upsert is None:
+        conn.execute(insert(table).from_select(columns, query))
+        return
+    stmt = upsert(table).from_select(columns, query)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key],
+        set_={name: table.c[name] + stmt.excluded[name] for name in counters},
+    )
+    conn.execute(stmt)
+
+
+def archive_month(engine: Engine, month: date) -> int:
+    """Fold one month of purchases into the summary tables and drop its rows."""
+    start = datetime.combine(month, datetime.min.time(), tzinfo=timezone.utc)
+    end = datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=timezone.utc)
+    in_month = Purchase.created_at >= start, Purchase.created_at < end
+
+    with engine.begin() as conn:
+        month_ids = select(Purchase.id).where(*in_month)
+        purchases = conn.scalar(select(func.count()).select_from(month_ids.subquery()))
+        if not purchases:
+            return 0
+
+        _merge_into_summary(
+            conn,
+            purchase_archive_summary,
+            select(
+                literal(month, Date),
+                Purchase.supermarket_id,
+                Purchase.user_id,
+                func.count(Purchase.id),
+                func.sum(Purchase.total_amount),
+            )
+            .where(*in_month)
+            .group_by(Purchase.supermarket_id, Purchase.user_id),
+            counters=("purchase_count", "total_amount"),
+        )
+        _merge_into_summary(
+            conn,
+            product_archive_summary,
+            select(
+                literal(month, Date),
+                Purchase.supermarket_id,
+                purchase_product.c.product_id,
+                func.count(),
+            )
+            .join(purchase_product, purchase_product.c.purchase_id == Purchase.id)
+            .where(*in_month)
+            .group_by(Purchase.supermarket_id, purchase_product.c.product_id),
+            counters=("times_sold",),
+        )
+
+        conn.execute(delete(purchase_product).where(purchase_product.c.purchase_id.in_(month_ids)))
+        name = partition_name(month)
+        if is_partitioned(conn) and conn.scalar(text("SELECT to_regclass(:name)"), {"name": name}):
+            conn.execute(text(f"ALTER TABLE purchase DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        conn.execute(delete(Purchase.__table__).where(*in_month))
+
+    logger.info("Archived %d purchases from %s", purchases, month.isoformat())
+    return purchases
+
+
+def archive_before(engine: Engine, cutoff: date) -> int:
+    """Archive every month that ends on or before `cutoff`'s month start."""
+    cutoff = month_start(cutoff)
+    with engine.connect() as conn:
+        oldest = conn.scalar(select(func.min(Purchase.created_at)))
+    if oldest is None:
+        return 0
+
+    archived = 0
+    month = month_start(oldest)
+    while month < cutoff:
+        archived += archive_month(engine, month)
+        month = add_months(month, 1)
+    return archived
+
+
+def main(argv=None) -> None:
+    from icash_common import setup_logging
+
+    setup_logging()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create-partitions", help="create monthly partitions up to N months ahead")
+    create.add_argument("--months-ahead", type=int, default=3)
+    archive = commands.add_parser("archive", help="fold months older than the retention window into summaries")
+    archive.add_argument("--keep-months", type=int, default=12)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(SQLAlchemy_DATABASE)
+    this_month = month_start(datetime.now(timezone.utc))
+    if args.command == "create-partitions":
+        ensure_month_partitions(engine, this_month, add_months(this_month, args.months_ahead))
+    else:
+        archived = archive_before(engine, add_months(this_month, -args.keep_months))
+        logger.info("Archive complete, purchases_archived: %d", archived)
+
+
+__all__ = [
+    "PARTITIONING_MODE",
+    "create_partitioned_tables",
+    "ensure_month_partitions",
+    "archive_month",
+    "archive_before",
+    "is_partitioned",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Connection pool instrumentation and fork safety for the API engines."""
+import os
+import threading
+import time
+import weakref
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds (milliseconds) of the checkout wait-time histogram buckets.
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class CheckoutHistogram:
+    """Thread-safe cumulative histogram of pool checkout wait times."""
+
+    def __init__(self, buckets_ms=CHECKOUT_BUCKETS_MS):
+        self._buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(self._buckets_ms) + 1)
+            self._count = 0
+            self._sum_ms = 0.0
+            self._max_ms = 0.0
+
+    def observe(self, wait_ms: float) -> None:
+        index = len(self._buckets_ms)
+        for i, bound in enumerate(self._buckets_ms):
+            if wait_ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum_ms += wait_ms
+            self._max_ms = max(self._max_ms, wait_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            bounds = [*self._buckets_ms, None]  # None is the +Inf bucket
+            return {
+                "count": self._count,
+                "sum_ms": round(self._sum_ms, 3),
+                "max_ms": round(self._max_ms, 3),
+                "buckets": [
+                    {"le_ms": bound, "count": count}
+                    for bound, count in zip(bounds, self._counts)
+                ],
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_histogram = CheckoutHistogram()
+        self.checkout_timeouts = 0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            self.checkout_histogram.observe((time.perf_counter() - started) * 1000)
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # dispose() swaps in a fresh pool; keep the counters across the swap.
+        pool = super().recreate()
+        pool.checkout_histogram = self.checkout_histogram
+        pool.checkout_timeouts = self.checkout_timeouts
+        return pool
+
+
+_fork_safe_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def install_fork_safety(engine: Engine) -> Engine:
+    """Make `engine` safe to share across os.fork() (gunicorn, incl. --preload).
+
+    Connections remember the pid that opened them; a checkout from another
+    process discards the inherited socket instead of sharing it, and the
+    after-fork hook below drops the parent's pool in every child.
+    """
+    if engine in _fork_safe_engines:
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _remember_pid(dbapi_connection, connection_record):
+        connection_record.info["pid"] = os.getpid()
+
+    @event.listens_for(engine, "checkout")
+    def _reject_foreign_pid(dbapi_connection, connection_record, connection_proxy):
+        pid = os.getpid()
+        if connection_record.info.get("pid", pid) != pid:
+            connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+            raise exc.DisconnectionError(
+                f"Connection record belongs to pid {connection_record.info['pid']}, "
+                f"attempting to check out in pid {pid}"
+            )
+
+    _fork_safe_engines.add(engine)
+    return engine
+
+
+def dispose_inherited_pools() -> None:
+    """Drop pools inherited from the parent without closing its sockets."""
+    for engine in list(_fork_safe_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=dispose_inherited_pools)
+
+
+def pool_stats(engine: Engine) -> dict:
+    """Return a point-in-time view of the engine's pool for this process."""
+    pool = engine.pool
+    stats = {"pid": os.getpid(), "pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            timeout_seconds=pool.timeout(),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        stats["checkout_timeouts"] = pool.checkout_timeouts
+        stats["checkout_wait"] = pool.checkout_histogram.snapshot()
+    return stats
+
+
+__all__ = [
+    "CheckoutHistogram",
+    "InstrumentedQueuePool",
+    "install_fork_safety",
+    "dispose_inherited_pools",
+    "pool_stats",
+]
@@ -0,0 +1,430 @@
+"""Analytics rollups: aggregate queries and the summary views built from them.
+
+On PostgreSQL the summaries are materialized views refreshed CONCURRENTLY, so
+readers are never blocked. Other backends (SQLite in tests and local runs)
+get plain summary tables that are rebuilt in a single transaction.
+"""
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    Column,
+    Connection,
+    Engine,
+    FromClause,
+    Integer,
+    MetaData,
+    Select,
+    String,
+    Table,
+    Uuid,
+    and_,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    null,
+    or_,
+    select,
+    text,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.dialects import postgresql
+
+from database.models import (
+    Product,
+    Purchase,
+    analytics_refresh,
+    product_archive_summary,
+    purchase_archive_summary,
+    purchase_product,
+)
+
+logger = logging.getLogger(__name__)
+
+# Summary relations live outside Base.metadata so create_all never turns the
+# PostgreSQL materialized views into ordinary tables.
+views_metadata = MetaData()
+
+user_purchase_counts_view = Table(
+    "mv_user_purchase_counts",
+    views_metadata,
+    Column("user_id", Uuid, primary_key=True),
+    Column("purchase_count", Integer, nullable=False),
+)
+
+product_sales_view = Table(
+    "mv_product_sales",
+    views_metadata,
+    Column("product_id", Integer, primary_key=True),
+    Column("name", String(50), nullable=False),
+    Column("times_sold", Integer, nullable=False),
+)
+
+# Any constant works; all API workers must agree on it.
+REFRESH_LOCK_KEY = 0x1CA5_0027
+
+
+def user_purchase_counts_query() -> Select:
+    """Purchases per user across live and archived months."""
+    live = (
+        select(Purchase.user_id, func.count(Purchase.id).label("purchase_count"))
+        .group_by(Purchase.user_id)
+    )
+    archived = (
+        select(
+            purchase_archive_summary.c.user_id,
+            func.sum(purchase_archive_summary.c.purchase_count).label("purchase_count"),
+        )
+        .group_by(purchase_archive_summary.c.user_id)
+    )
+    combined = union_all(live, archived).subquery()
+    return (
+        select(combined.c.user_id, cast(func.sum(combined.c.purchase_count), Integer).label("purchase_count"))
+        .group_by(combined.c.user_id)
+    )
+
+
+def product_sales_query() -> Select:
+    """Times each product was sold across live and archived months."""
+    live = (
+        select(purchase_product.c.product_id, func.count(purchase_product.c.purchase_id).label("times_sold"))
+        .group_by(purchase_product.c.product_id)
+    )
+    archived = (
+        select(
+            product_archive_summary.c.product_id,
+            func.sum(product_archive_summary.c.times_sold).label("times_sold"),
+        )
+        .group_by(product_archive_summary.c.product_id)
+    )
+    combined = union_all(live, archived).subquery()
+    times_sold = cast(func.sum(combined.c.times_sold), Integer)
+    return (
+        select(Product.id.label("product_id"), Product.name, times_sold.label("times_sold"))
+        .join(combined, Product.id == combined.c.product_id)
+        .group_by(Product.id, Product.name)
+    )
+
+
+def _branch_facts(dialect_name: str):
+    """(kind, supermarket_id, user_id, product_id, value) rows from one pass over purchases.
+
+    kind 0 rows hold purchases per (branch, user), kind 1 rows hold units sold
+    per (branch, product). On PostgreSQL a single GROUPING SETS aggregation
+    produces both from one scan; elsewhere the same CTE is grouped twice.
+    Archived months are appended from their summary tables.
+    """
+    lines = (
+        select(
+            Purchase.id.label("purchase_id"),
+            Purchase.supermarket_id,
+            Purchase.user_id,
+            purchase_product.c.product_id,
+        )
+        .outerjoin(purchase_product, purchase_product.c.purchase_id == Purchase.id)
+        .cte("purchase_lines")
+    )
+    purchases = func.count(func.distinct(lines.c.purchase_id))
+    sold = func.count(lines.c.product_id)
+
+    if dialect_name == "postgresql":
+        grouped = (
+            select(
+                func.grouping(lines.c.user_id).label("kind"),
+                lines.c.supermarket_id,
+                lines.c.user_id,
+                lines.c.product_id,
+                case((func.grouping(lines.c.user_id) == 0, purchases), else_=sold).label("value"),
+            )
+            .group_by(func.grouping_sets(
+                tuple_(lines.c.supermarket_id, lines.c.user_id),
+                tuple_(lines.c.supermarket_id, lines.c.product_id),
+            ))
+        ).subquery()
+        live = [
+            select(grouped).where(
+                or_(grouped.c.kind == 0, grouped.c.product_id.is_not(None))
+            )
+        ]
+    else:
+        live = [
+            select(
+                literal(0).label("kind"), lines.c.supermarket_id, lines.c.user_id,
+                null().label("product_id"), purchases.label("value"),
+            ).group_by(lines.c.supermarket_id, lines.c.user_id),
+            select(
+                literal(1).label("kind"), lines.c.supermarket_id, null().label("user_id"),
+                lines.c.product_id, sold.label("value"),
+            ).where(lines.c.product_id.is_not(None)).group_by(lines.c.supermarket_id, lines.c.product_id),
+        ]
+
+    archived = [
+        select(
+            literal(0), purchase_archive_summary.c.supermarket_id, purchase_archive_summary.c.user_id,
+            null(), purchase_archive_summary.c.purchase_count,
+        ),
+        select(
+            literal(1), product_archive_summary.c.supermarket_id, null(),
+            product_archive_summary.c.product_id, product_archive_summary.c.times_sold,
+        ),
+    ]
+    return union_all(*live, *archived).cte("branch_facts")
+
+
+def analytics_summary_statement(
+    dialect_name: str,
+    min_purchases: int,
+    top_limit: int,
+    by_supermarket: bool = False,
+    loyal_limit: int | None = None,
+) -> Select:
+    """One statement returning unique buyers, loyal buyers and top products.
+
+    Rows are (metric, supermarket_id, key, value); supermarket_id is NULL for
+    network-wide figures. `loyal_limit` caps the loyal buyers returned per
+    scope to the first page of `loyal_buyers_page_statement` order; the full
+    count always comes back as "loyal_buyers_count". Use `fold_analytics_summary` to turn them into the
+    analytics payload.
+    """
+    facts = _branch_facts(dialect_name)
+    users_by_branch = (
+        select(facts.c.supermarket_id, facts.c.user_id, cast(func.sum(facts.c.value), Integer).label("n"))
+        .where(facts.c.kind == 0)
+        .group_by(facts.c.supermarket_id, facts.c.user_id)
+        .cte("users_by_branch")
+    )
+    sales_by_branch = (
+        select(facts.c.supermarket_id, facts.c.product_id, cast(func.sum(facts.c.value), Integer).label("n"))
+        .where(facts.c.kind == 1)
+        .group_by(facts.c.supermarket_id, facts.c.product_id)
+        .cte("sales_by_branch")
+    )
+    users = (
+        select(users_by_branch.c.user_id, cast(func.sum(users_by_branch.c.n), Integer).label("n"))
+        .group_by(users_by_branch.c.user_id)
+        .cte("users_total")
+    )
+    sales = (
+        select(sales_by_branch.c.product_id, cast(func.sum(sales_by_branch.c.n), Integer).label("n"))
+        .group_by(sales_by_branch.c.product_id)
+        .cte("sales_total")
+    )
+
+    def figures(user_rows, sale_rows, branch):
+        partition = [sale_rows.c.supermarket_id] if branch is not None else None
+        ranked = (
+            select(
+                branch if branch is not None else null().label("supermarket_id"),
+                Product.name,
+                sale_rows.c.n,
+                func.rank().over(partition_by=partition, order_by=sale_rows.c.n.desc()).label("sales_rank"),
+            )
+            .join(Product, Product.id == sale_rows.c.product_id)
+            .subquery()
+        )
+        user_branch = user_rows.c.supermarket_id if branch is not None else null()
+        user_partition = [user_rows.c.supermarket_id] if branch is not None else None
+        loyal = (
+            select(
+                user_branch.label("supermarket_id"),
+                user_rows.c.user_id,
+                user_rows.c.n,
+                func.row_number().over(
+                    partition_by=user_partition, order_by=(user_rows.c.n.desc(), user_rows.c.user_id)
+                ).label("loyal_rank"),
+            )
+            .where(user_rows.c.n >= min_purchases)
+            .subquery()
+        )
+        loyal_page = select(
+            literal("loyal_buyers"), loyal.c.supermarket_id, cast(loyal.c.user_id, String), loyal.c.n
+        )
+        if loyal_limit is not None:
+            loyal_page = loyal_page.where(loyal.c.loyal_rank <= loyal_limit)
+        unique = select(
+            literal("unique_buyers"), user_branch, null(), func.count()
+        ).select_from(user_rows)
+        loyal_count = select(
+            literal("loyal_buyers_count"), loyal.c.supermarket_id, null(), func.count()
+        ).select_from(loyal)
+        if branch is not None:
+            unique = unique.group_by(user_rows.c.supermarket_id)
+            loyal_count = loyal_count.group_by(loyal.c.supermarket_id)
+        return [
+            unique,
+            loyal_page,
+            loyal_count,
+            select(
+                literal("top_products"), ranked.c.supermarket_id, ranked.c.name, ranked.c.n
+            ).where(ranked.c.sales_rank <= top_limit),
+        ]
+
+    parts = figures(users, sales, None)
+    if by_supermarket:
+        parts += figures(users_by_branch, sales_by_branch, sales_by_branch.c.supermarket_id)
+    return union_all(*parts)
+
+
+def fold_analytics_summary(rows) -> dict:
+    """Shape `analytics_summary_statement` rows like the analytics payload."""
+    def empty():
+        return {"unique_buyers": 0, "loyal_buyers": [], "loyal_buyers_count": 0, "top_products": []}
+
+    network, branches = empty(), {}
+    for metric, supermarket_id, key, value in rows:
+        target = network if supermarket_id is None else branches.setdefault(supermarket_id, empty())
+        if metric in ("unique_buyers", "loyal_buyers_count"):
+            target[metric] = int(value)
+        elif metric == "loyal_buyers":
+            target["loyal_buyers"].append({"user_id": str(uuid.UUID(str(key))), "purchase_count": int(value)})
+        else:
+            target["top_products"].append({"name": key, "times_sold": int(value)})
+
+    for figures in (network, *branches.values()):
+        figures["loyal_buyers"].sort(key=lambda row: (-row["purchase_count"], row["user_id"]))
+        figures["top_products"].sort(key=lambda row: (-row["times_sold"], row["name"]))
+    network["by_supermarket"] = dict(sorted(branches.items()))
+    return network
+
+
+def loyal_buyers_page_statement(
+    counts: FromClause, min_purchases: int, limit: int | None = None, after: tuple[int, str] | None = None
+) -> Select:
+    """Loyal buyers from `counts` in (purchase_count desc, user_id) keyset order.
+
+    `counts` is either the live `user_purchase_counts_query()` subquery or the
+    summary view. `after` is the (purchase_count, user_id) of the last row of
+    the previous page; rows strictly after it are returned, so paging stays
+    cheap however deep it goes.
+    """
+    stmt = select(counts.c.user_id, counts.c.purchase_count).where(counts.c.purchase_count >= min_purchases)
+    if after is not None:
+        after_count, after_user = after
+        # The cursor carries text; compare it as whatever the column holds (str or UUID).
+        after_user = counts.c.user_id.type.python_type(after_user)
+        stmt = stmt.where(or_(
+            counts.c.purchase_count < after_count,
+            and_(counts.c.purchase_count == after_count, counts.c.user_id > after_user),
+        ))
+    stmt = stmt.order_by(counts.c.purchase_count.desc(), counts.c.user_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+_VIEW_QUERIES = {
+    user_purchase_counts_view: user_purchase_counts_query,
+    product_sales_view: product_sales_query,
+}
+
+_PG_VIEW_INDEXES = {
+    # REFRESH ... CONCURRENTLY requires a unique index on every view.
+    user_purchase_counts_view: [
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_user_purchase_counts_user_id "
+        "ON mv_user_purchase_counts (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_mv_user_purchase_counts_rank "
+        "ON mv_user_purchase_counts (purchase_count DESC, user_id)",
+    ],
+    product_sales_view: [
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_product_sales_product_id "
+        "ON mv_product_sales (product_id)",
+    ],
+}
+
+
+def _is_postgres(bind: Engine | Connection) -> bool:
+    return bind.dialect.name == "postgresql"
+
+
+def _compile_pg(query: Select) -> str:
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def create_views(engine: Engine) -> None:
+    """Create the summary views (or tables) if missing and populate them."""
+    if not _is_postgres(engine):
+        views_metadata.create_all(engine)
+        refresh_views(engine)
+        return
+
+    created = []
+    with engine.begin() as conn:
+        for view, build_query in _VIEW_QUERIES.items():
+            if conn.scalar(text("SELECT to_regclass(:name)"), {"name": view.name}) is None:
+                created.append(view)
+            conn.execute(text(
+                f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view.name} AS {_compile_pg(build_query())}"
+            ))
+            for statement in _PG_VIEW_INDEXES[view]:
+                conn.execute(text(statement))
+    # Views that survived a restart keep their last refresh time; only the
+    # ones populated just now are fresh.
+    if created:
+        _record_refresh(engine, created)
+
+
+def refresh_views(engine: Engine) -> bool:
+    """Refresh every summary view; returns False if another process holds the lock."""
+    if _is_postgres(engine):
+        # Autocommit: CONCURRENTLY cannot run inside a transaction block.
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if not conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": REFRESH_LOCK_KEY}):
+                logger.info("Analytics view refresh skipped: another worker is refreshing")
+                return False
+            try:
+                for view in _VIEW_QUERIES:
+                    conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view.name}"))
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": REFRESH_LOCK_KEY})
+    else:
+        with engine.begin() as conn:
+            for view, build_query in _VIEW_QUERIES.items():
+                query = build_query()
+                conn.execute(delete(view))
+                conn.execute(insert(view).from_select([c.name for c in view.columns], query))
+    _record_refresh(engine)
+    return True
+
+
+def _record_refresh(engine: Engine, views=None) -> None:
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        for view in views or _VIEW_QUERIES:
+            updated = conn.execute(
+                analytics_refresh.update()
+                .where(analytics_refresh.c.view_name == view.name)
+                .values(refreshed_at=now)
+            )
+            if not updated.rowcount:
+                conn.execute(insert(analytics_refresh).values(view_name=view.name, refreshed_at=now))
+
+
+def views_refreshed_at(conn) -> datetime | None:
+    """Timestamp of the oldest summary view, i.e. how fresh view-backed reads are."""
+    refreshed_at = conn.scalar(
+        select(func.min(analytics_refresh.c.refreshed_at))
+        .where(analytics_refresh.c.view_name.in_([view.name for view in _VIEW_QUERIES]))
+    )
+    if refreshed_at is not None and refreshed_at.tzinfo is None:
+        refreshed_at = refreshed_at.replace(tzinfo=timezone.utc)
+    return refreshed_at
+
+
+__all__ = [
+    "views_metadata",
+    "user_purchase_counts_view",
+    "product_sales_view",
+    "user_purchase_counts_query",
+    "product_sales_query",
+    "analytics_summary_statement",
+    "fold_analytics_summary",
+    "loyal_buyers_page_statement",
+    "create_views",
+    "refresh_views",
+    "views_refreshed_at",
+]
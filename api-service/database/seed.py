@@ -2,10 +2,10 @@ import csv
 import logging
 import sys
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 
-from sqlalchemy import create_engine, select
+from sqlalchemy import Engine, create_engine, select
 from sqlalchemy.orm import Session
 
 # Allow running as a script (python database/seed.py) by adding repo root to sys.path
@@ -16,13 +16,29 @@ if __package__ in (None, ""):
 
 from database.database_config import Base, SQLAlchemy_DATABASE
 from database.models import Purchase, Product
+from database.partitioning import (
+    PARTITIONING_MODE,
+    add_months,
+    create_partitioned_tables,
+    ensure_month_partitions,
+    month_start,
+)
+from database.rollups import create_views
 from icash_common import setup_logging
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
-def seed_db(database_url: str | None = None):
+def ensure_purchase_partitions(engine, purchases_path: Path, months_ahead: int = 3):
+    """Pre-create monthly partitions from the oldest CSV row up to a few months ahead."""
+    with purchases_path.open(newline="", encoding="utf-8-sig") as purchases_file:
+        timestamps = [datetime.fromisoformat(row["timestamp"]) for row in csv.DictReader(purchases_file)]
+    this_month = month_start(datetime.now(timezone.utc))
+    ensure_month_partitions(engine, min(timestamps, default=this_month), add_months(this_month, months_ahead))
+
+
+def seed_db(engine: Engine | None = None):
     """Create tables and seed purchases from the CSV once, using plain SQLAlchemy."""
     products_path = Path(__file__).resolve().parents[0] / "data" / "products_list.csv"
     purchases_path = Path(__file__).resolve().parents[0] / "data" / "purchases.csv"
@@ -39,14 +55,19 @@ def seed_db(database_url: str | None = None):
         str(purchases_path),
     )
 
-    engine = create_engine(SQLAlchemy_DATABASE)
+    engine = engine or create_engine(SQLAlchemy_DATABASE)
+    if PARTITIONING_MODE == "monthly":
+        create_partitioned_tables(engine)
     Base.metadata.create_all(engine)
     logger.info("Ensured all tables exist")
+    if PARTITIONING_MODE == "monthly":
+        ensure_purchase_partitions(engine, purchases_path)
 
     with Session(engine) as session:
         already_loaded = session.execute(select(Purchase.id).limit(1)).first()
         if already_loaded:
             logger.info("Seed skipped: purchases already present")
+            create_views(engine)
             return
 
         with products_path.open(newline="", encoding="utf-8-sig") as products_file:
@@ -99,5 +120,9 @@ def seed_db(database_url: str | None = None):
             len(product_rows),
             len(purchase_rows),
         )
+    create_views(engine)
+    logger.info("Ensured analytics summary views exist")
+
+
 if __name__ == "__main__":
     seed_db()
@@ -0,0 +1,364 @@
+"""Recency / frequency / monetary (RFM) segmentation of customers.
+
+An offline job, not a request-time query. Customers are sharded by user_id
+range across a process pool. Each worker streams its shard's purchases in
+chunks, plus the archived monthly summaries, and folds them into one
+(last purchase, purchase count, total spent) per customer. The parent then
+scores every metric 1-5 by its rank among all customers (quintiles), names a segment
+from the three scores and upserts the results into `customer_segment`.
+
+A full run rescores every customer. An incremental run only re-aggregates
+customers with purchases after the previous run's last purchase id; the
+quintiles still come from every customer, but the scores of customers it
+did not touch (including their recency) stay as of the run that wrote them.
+Schedule a full run now and then, e.g. nightly full and hourly incremental.
+
+Archived months only keep a month, so their purchases count as made on the
+first of that month.
+
+Run as a script:
+    python database/segments.py                  # full run
+    python database/segments.py --incremental --workers 4
+"""
+import argparse
+import logging
+import os
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timezone
+from pathlib import Path
+
+from sqlalchemy import Engine, String, and_, cast, create_engine, delete, func, insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+# Allow running as a script (python database/segments.py) by adding repo root to sys.path
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from database.database_config import SQLAlchemy_DATABASE
+from database.models import Purchase, customer_segment, purchase_archive_summary, segment_run
+
+logger = logging.getLogger(__name__)
+
+# First matching rule wins; (recency, frequency, monetary) scores run 1 (worst) to 5 (best).
+SEGMENT_RULES = (
+    ("champions", lambda r, f, m: r >= 4 and f >= 4 and m >= 4),
+    ("loyal", lambda r, f, m: r >= 3 and f >= 4),
+    ("new", lambda r, f, m: r >= 4 and f <= 2),
+    ("promising", lambda r, f, m: r >= 3),
+    ("at_risk", lambda r, f, m: f >= 3),
+    ("hibernating", lambda r, f, m: True),
+)
+SEGMENTS = tuple(name for name, _ in SEGMENT_RULES)
+
+WRITE_BATCH = 1000
+_IN_BATCH = 500
+_UUID_SPACE = 1 << 128
+
+
+def quintile_scores(values: dict) -> dict:
+    """Score each key 1 (lowest fifth of values) to 5 (highest) by rank, like SQL NTILE(5).
+
+    Ties are ordered by key, so equal values may straddle a boundary but every
+    fifth of the population gets its own score, however skewed the values are.
+    """
+    ranked = sorted(values, key=lambda key: (values[key], key))
+    return {key: 1 + rank * 5 // len(ranked) for rank, key in enumerate(ranked)}
+
+
+def segment_for(recency: int, frequency: int, monetary: int) -> str:
+    return next(name for name, rule in SEGMENT_RULES if rule(recency, frequency, monetary))
+
+
+def shard_bounds(shards: int) -> list[tuple[uuid.UUID | None, uuid.UUID | None]]:
+    """Split the UUID space into `shards` contiguous [lower, upper) ranges."""
+    step = _UUID_SPACE // shards
+    return [
+        (uuid.UUID(int=k * step) if k else None, uuid.UUID(int=(k + 1) * step) if k < shards - 1 else None)
+        for k in range(shards)
+    ]
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _in_range(column, lower, upper, dialect: str) -> list:
+    if dialect == "sqlite":
+        # A UUID column has numeric affinity on SQLite, so an all-digit bound
+        # (0x5555...) would be compared as a number; compare the stored hex text.
+        column = cast(column, String)
+        lower, upper = (bound.hex if bound is not None else None for bound in (lower, upper))
+    return [condition for condition in (
+        column >= lower if lower is not None else None,
+        column < upper if upper is not None else None,
+    ) if condition is not None]
+
+
+def aggregate_shard(engine: Engine, lower, upper, users: list | None, chunk_size: int) -> dict[uuid.UUID, list]:
+    """{user_id: [last_purchase_at, purchase_count, total_amount]} for one shard.
+
+    `users`, when given, limits the shard to those customers (incremental runs).
+    """
+    totals: dict[uuid.UUID, list] = {}
+
+    def fold(user_id, last_at, count, amount):
+        key = uuid.UUID(str(user_id))
+        last_at = _as_utc(last_at)
+        entry = totals.get(key)
+        if entry is None:
+            totals[key] = [last_at, count, amount]
+        else:
+            entry[0] = max(entry[0], last_at)
+            entry[1] += count
+            entry[2] += amount
+
+    batches = [users[i:i + _IN_BATCH] for i in range(0, len(users), _IN_BATCH)] if users is not None else [None]
+    with engine.connect() as conn:
+        for batch in batches:
+            live = select(Purchase.user_id, Purchase.created_at, Purchase.total_amount).where(
+                *_in_range(Purchase.user_id, lower, upper, engine.dialect.name)
+            )
+            archived = select(
+                purchase_archive_summary.c.user_id,
+                func.max(purchase_archive_summary.c.month),
+                func.sum(purchase_archive_summary.c.purchase_count),
+                func.sum(purchase_archive_summary.c.total_amount),
+            ).where(*_in_range(purchase_archive_summary.c.user_id, lower, upper, engine.dialect.name))
+            if batch is not None:
+                live = live.where(Purchase.user_id.in_(batch))
+                archived = archived.where(purchase_archive_summary.c.user_id.in_([uuid.UUID(str(u)) for u in batch]))
+
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(live)
+            for rows in result.partitions():
+                for user_id, created_at, amount in rows:
+                    fold(user_id, created_at, 1, amount)
+            for user_id, month, count, amount in conn.execute(archived.group_by(purchase_archive_summary.c.user_id)):
+                fold(user_id, datetime.combine(month, time.min, tzinfo=timezone.utc), int(count), amount)
+    return totals
+
+
+_worker_engine = None
+
+
+def _init_worker(url: str) -> None:
+    global _worker_engine
+    _worker_engine = create_engine(url)
+
+
+def _aggregate_in_worker(lower, upper, users, chunk_size):
+    return aggregate_shard(_worker_engine, lower, upper, users, chunk_size)
+
+
+def score_customers(aggregates: dict[uuid.UUID, list], as_of: datetime) -> dict[uuid.UUID, dict]:
+    """Score every customer in `aggregates` against the quintiles of all of them."""
+    # Fewer days since the last purchase is better, so recency is scored on its negation.
+    recency = quintile_scores({user: -(as_of - last_at).days for user, (last_at, _, _) in aggregates.items()})
+    frequency = quintile_scores({user: count for user, (_, count, _) in aggregates.items()})
+    monetary = quintile_scores({user: amount for user, (_, _, amount) in aggregates.items()})
+
+    scored = {}
+    for user, (last_at, count, amount) in aggregates.items():
+        r, f, m = recency[user], frequency[user], monetary[user]
+        scored[user] = {
+            "user_id": user,
+            "last_purchase_at": last_at,
+            "frequency": count,
+            "monetary": round(amount, 2),
+            "recency_score": r,
+            "frequency_score": f,
+            "monetary_score": m,
+            "segment": segment_for(r, f, m),
+            "scored_at": as_of,
+        }
+    return scored
+
+
+def _write_segments(engine: Engine, rows: list[dict]) -> None:
+    upsert = {"postgresql": pg_insert, "sqlite": sqlite_insert}.get(engine.dialect.name)
+    with engine.begin() as conn:
+        for start in range(0, len(rows), WRITE_BATCH):
+            batch = rows[start:start + WRITE_BATCH]
+            if upsert is None:
+                conn.execute(delete(customer_segment).where(
+                    customer_segment.c.user_id.in_([row["user_id"] for row in batch])
+                ))
+                conn.execute(insert(customer_segment), batch)
+                continue
+            stmt = upsert(customer_segment)
+            conn.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[customer_segment.c.user_id],
+                    set_={column.name: stmt.excluded[column.name] for column in customer_segment.columns
+                          if column.name != "user_id"},
+                ),
+                batch,
+            )
+
+
+def run_segmentation(
+    engine: Engine,
+    incremental: bool = False,
+    workers: int = 1,
+    chunk_size: int = 5000,
+    as_of: datetime | None = None,
+    url: str | None = None,
+) -> dict:
+    """Aggregate, score and store customer segments; returns a run summary.
+
+    With `workers` > 1 the shards are aggregated in a process pool whose
+    workers open their own engine on `url` (default: the engine's URL).
+    """
+    as_of = as_of or datetime.now(timezone.utc)
+    started_at = datetime.now(timezone.utc)
+    with engine.connect() as conn:
+        max_purchase_id = conn.scalar(select(func.max(Purchase.id))) or 0
+        last_run = conn.execute(
+            select(segment_run.c.max_purchase_id).order_by(segment_run.c.id.desc()).limit(1)
+        ).scalar()
+
+    users = None
+    if incremental and last_run is not None:
+        with engine.connect() as conn:
+            users = list(conn.scalars(select(Purchase.user_id).where(Purchase.id > last_run).distinct()))
+    mode = "incremental" if users is not None else "full"
+
+    shards = shard_bounds(max(workers, 1))
+    tasks = []
+    for lower, upper in shards:
+        shard_users = None
+        if users is not None:
+            shard_users = [u for u in users if _in_shard(u, lower, upper)]
+            if not shard_users:
+                continue
+        tasks.append((lower, upper, shard_users, chunk_size))
+
+    aggregates: dict[uuid.UUID, list] = {}
+    if workers > 1 and len(tasks) > 1:
+        url = url or engine.url.render_as_string(hide_password=False)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(url,)) as pool:
+            for shard in pool.map(_aggregate_in_worker, *zip(*tasks)):
+                aggregates.update(shard)
+    else:
+        for task in tasks:
+            aggregates.update(aggregate_shard(engine, *task))
+
+    if mode == "incremental":
+        # Quintiles span every customer, so fold in the stored figures of the untouched ones.
+        with engine.connect() as conn:
+            stored = conn.execute(select(
+                customer_segment.c.user_id,
+                customer_segment.c.last_purchase_at,
+                customer_segment.c.frequency,
+                customer_segment.c.monetary,
+            ))
+            population = {row.user_id: [_as_utc(row.last_purchase_at), row.frequency, row.monetary] for row in stored}
+        population.update(aggregates)
+        scored = score_customers(population, as_of)
+        rows = [scored[user] for user in aggregates]
+    else:
+        rows = list(score_customers(aggregates, as_of).values())
+
+    _write_segments(engine, rows)
+    with engine.begin() as conn:
+        conn.execute(insert(segment_run).values(
+            mode=mode,
+            started_at=started_at,
+            finished_at=datetime.now(timezone.utc),
+            max_purchase_id=max_purchase_id,
+            customers_scored=len(rows),
+        ))
+    summary = {"mode": mode, "customers_scored": len(rows), "max_purchase_id": max_purchase_id, "shards": len(tasks)}
+    logger.info("Segmentation complete: %s", summary)
+    return summary
+
+
+def _in_shard(user_id, lower, upper) -> bool:
+    value = uuid.UUID(str(user_id))
+    return (lower is None or value >= lower) and (upper is None or value < upper)
+
+
+def segment_summary(session: Session) -> list[dict]:
+    """Customers and average figures per segment, largest segment first."""
+    rows = session.execute(
+        select(
+            customer_segment.c.segment,
+            func.count().label("customers"),
+            func.avg(customer_segment.c.frequency).label("avg_frequency"),
+            func.avg(customer_segment.c.monetary).label("avg_monetary"),
+        )
+        .group_by(customer_segment.c.segment)
+        .order_by(func.count().desc(), customer_segment.c.segment)
+    )
+    return [
+        {
+            "segment": row.segment,
+            "customers": int(row.customers),
+            "avg_frequency": round(float(row.avg_frequency), 2),
+            "avg_monetary": round(float(row.avg_monetary), 2),
+        }
+        for row in rows
+    ]
+
+
+def segment_customers_page(session: Session, segment: str, limit: int, after: tuple[float, uuid.UUID] | None = None):
+    """Customers of one segment in (monetary desc, user_id) keyset order."""
+    table = customer_segment
+    stmt = select(table).where(table.c.segment == segment)
+    if after is not None:
+        after_monetary, after_user = after
+        stmt = stmt.where(or_(
+            table.c.monetary < after_monetary,
+            and_(table.c.monetary == after_monetary, table.c.user_id > after_user),
+        ))
+    return session.execute(stmt.order_by(table.c.monetary.desc(), table.c.user_id).limit(limit)).all()
+
+
+def last_segment_run(session: Session):
+    """The most recent segment_run row, or None before the first run."""
+    return session.execute(select(segment_run).order_by(segment_run.c.id.desc()).limit(1)).first()
+
+
+def main(argv=None) -> None:
+    from icash_common import setup_logging
+
+    setup_logging()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--incremental", action="store_true",
+                        help="only customers with purchases since the last run")
+    parser.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 4),
+                        help="processes aggregating shards in parallel")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="purchase rows fetched per round trip")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(SQLAlchemy_DATABASE)
+    customer_segment.create(engine, checkfirst=True)
+    segment_run.create(engine, checkfirst=True)
+    run_segmentation(
+        engine,
+        incremental=args.incremental,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        url=SQLAlchemy_DATABASE.render_as_string(hide_password=False),
+    )
+
+
+__all__ = [
+    "SEGMENTS",
+    "quintile_scores",
+    "segment_for",
+    "shard_bounds",
+    "aggregate_shard",
+    "score_customers",
+    "run_segmentation",
+    "segment_summary",
+    "segment_customers_page",
+    "last_segment_run",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""Gunicorn settings for the API service.
+
+Worker and thread counts are read from the same env vars that
+`database.database_config.build_engine_options` uses to size each worker's
+connection pool, so the two never drift apart.
+"""
+import os
+
+bind = "0.0.0.0:8001"
+worker_class = "gthread"
+workers = int(os.getenv("GUNICORN_WORKERS", 4))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+timeout = 60
+
+# Workers fork from an app that is already imported (api/boot.py builds it;
+# plain `gunicorn -c gunicorn.conf.py api.wsgi:app` preloads it here).
+preload_app = True
@@ -0,0 +1,212 @@
+"""Performance regression suite for the real api.services functions.
+
+Unlike tests/, nothing is stubbed here: the real cashier and dashboard
+services run against generated datasets at several sizes. Budgets on SQL
+statements per call and on how wall time scales with data size are asserted
+in the tests. Every measurement is written to a JSON report and its
+statement counts are compared with the stored baseline; wall times are only
+compared when PERF_CHECK_TIMES is set, since they depend on the machine.
+Run it separately from the unit tests:
+
+    python -m pytest api-service/perf -q
+    python -m pytest api-service/perf --perf-update-baseline
+
+Environment:
+    PERF_SIZES           purchases per dataset (default "1000,10000,50000")
+    PERF_DATABASE_URL    run on this database instead of temporary SQLite files
+    PERF_CHECK_TIMES     set to 1 to also fail on wall times slower than the baseline
+    PERF_TIME_TOLERANCE  allowed slowdown vs the baseline (default 1.0 = +100%)
+    PERF_REPORT          report path (default perf/report.json)
+"""
+import json
+import os
+import platform
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("DATABASE_DRIVER", "sqlite")
+os.environ.setdefault("DATABASE_USERNAME", "")
+os.environ.setdefault("DATABASE_PASSWORD", "")
+os.environ.setdefault("DATABASE_HOST", "")
+os.environ.setdefault("DATABASE_NAME", ":memory:")
+
+from sqlalchemy import Engine, create_engine, event, insert
+from sqlalchemy.orm import Session
+
+from database.database_config import Base
+from database.models import Product, Purchase, purchase_product
+from database.rollups import create_views, views_metadata
+
+PERF_DIR = Path(__file__).resolve().parent
+BASELINE_PATH = PERF_DIR / "baseline.json"
+SIZES = [int(size) for size in os.getenv("PERF_SIZES", "1000,10000,50000").split(",")]
+CHECK_TIMES = os.getenv("PERF_CHECK_TIMES", "") not in ("", "0")
+TIME_TOLERANCE = float(os.getenv("PERF_TIME_TOLERANCE", 1.0))
+# Timings below this are noise; never flag them as regressions.
+TIME_FLOOR_SECONDS = 0.002
+
+SUPERMARKETS = [f"SMKT{n:03d}" for n in range(1, 11)]
+PRODUCTS = 50
+
+
+def pytest_collectstart(collector):
+    # tests/conftest.py replaces the api package with stubs; when both suites
+    # run in one session, drop them so the modules here import the real services.
+    for name, module in list(sys.modules.items()):
+        if (name == "api" or name.startswith("api.")) and getattr(module, "__file__", None) is None:
+            del sys.modules[name]
+
+
+def pytest_generate_tests(metafunc):
+    # Every test taking `size` runs once per dataset size.
+    if "size" in metafunc.fixturenames:
+        metafunc.parametrize("size", SIZES)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--perf-update-baseline",
+        action="store_true",
+        help="write the measurements to perf/baseline.json instead of comparing against it",
+    )
+
+
+@dataclass
+class Dataset:
+    size: int
+    engine: Engine
+    whale: uuid.UUID  # one customer whose history grows with the dataset
+
+    def session(self) -> Session:
+        return Session(self.engine, expire_on_commit=False)
+
+
+def _generate(engine: Engine, size: int, seed: int = 26) -> Dataset:
+    rng = random.Random(seed)
+    users = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(max(size // 5, 1))]
+    whale = users[0]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    Base.metadata.drop_all(engine)
+    views_metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Product), [
+            {"name": f"product-{n}", "unit_price": round(rng.uniform(0.5, 20), 2)} for n in range(1, PRODUCTS + 1)
+        ])
+        purchases, links = [], []
+        for purchase_id in range(1, size + 1):
+            user = whale if purchase_id % 10 == 0 else rng.choice(users)
+            purchases.append({
+                "id": purchase_id,
+                "supermarket_id": rng.choice(SUPERMARKETS),
+                "created_at": start + timedelta(minutes=purchase_id * 525_600 / size),
+                "user_id": user,
+                "total_amount": round(rng.uniform(1, 100), 2),
+            })
+            for product_id in rng.sample(range(1, PRODUCTS + 1), rng.randint(1, 4)):
+                links.append({"purchase_id": purchase_id, "product_id": product_id})
+        conn.execute(insert(Purchase), purchases)
+        conn.execute(insert(purchase_product), links)
+    create_views(engine)
+    return Dataset(size=size, engine=engine, whale=whale)
+
+
+@pytest.fixture(scope="session")
+def datasets(tmp_path_factory) -> dict[int, Dataset]:
+    built = {}
+    for size in SIZES:
+        url = os.getenv("PERF_DATABASE_URL") or f"sqlite:///{tmp_path_factory.mktemp('perf')}/perf_{size}.db"
+        if os.getenv("PERF_DATABASE_URL") and built:
+            # One shared database: measure each size before generating the next.
+            raise pytest.UsageError("PERF_DATABASE_URL supports a single PERF_SIZES entry")
+        built[size] = _generate(create_engine(url), size)
+    yield built
+    for dataset in built.values():
+        dataset.engine.dispose()
+
+
+@contextmanager
+def count_statements(engine: Engine):
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+
+class PerfRecorder:
+    def __init__(self, baseline: dict, sizes: list[int]):
+        self.baseline = baseline
+        self.sizes = sizes
+        self.results: dict[str, dict] = {}
+
+    def measure(self, name: str, dataset: Dataset, fn, statements: int, repeat: int = 5):
+        """Run `fn` once to count SQL statements, then `repeat` times for the best wall time.
+
+        Asserts the statement budget and, when a baseline exists, that the
+        statement count did not regress (and, with PERF_CHECK_TIMES, the time
+        neither). Returns fn's last result.
+        """
+        with count_statements(dataset.engine) as executed:
+            result = fn()
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - started)
+
+        key = f"{name}[{dataset.size}]"
+        self.results[key] = {"seconds": round(best, 6), "statements": len(executed)}
+        assert len(executed) <= statements, f"{key}: {len(executed)} SQL statements, budget {statements}"
+
+        expected = self.baseline.get(key)
+        if expected:
+            assert len(executed) <= expected["statements"], (
+                f"{key}: {len(executed)} SQL statements, baseline {expected['statements']}"
+            )
+        if expected and CHECK_TIMES:
+            limit = max(expected["seconds"] * (1 + TIME_TOLERANCE), TIME_FLOOR_SECONDS)
+            assert best <= limit, f"{key}: {best:.4f}s, baseline {expected['seconds']:.4f}s (limit {limit:.4f}s)"
+        return result
+
+    def growth(self, name: str) -> float:
+        """Time at the largest size over time at the smallest."""
+        smallest, largest = self.results[f"{name}[{min(self.sizes)}]"], self.results[f"{name}[{max(self.sizes)}]"]
+        return max(largest["seconds"], TIME_FLOOR_SECONDS) / max(smallest["seconds"], TIME_FLOOR_SECONDS)
+
+
+@pytest.fixture(scope="session")
+def perf(request) -> PerfRecorder:
+    baseline = {}
+    if not request.config.getoption("--perf-update-baseline") and BASELINE_PATH.exists():
+        baseline = json.loads(BASELINE_PATH.read_text())["results"]
+    recorder = PerfRecorder(baseline, SIZES)
+    yield recorder
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "database": os.getenv("PERF_DATABASE_URL", "sqlite").split("://")[0].split("+")[0],
+        "sizes": SIZES,
+        "results": dict(sorted(recorder.results.items())),
+    }
+    path = BASELINE_PATH if request.config.getoption("--perf-update-baseline") else Path(
+        os.getenv("PERF_REPORT", PERF_DIR / "report.json")
+    )
+    path.write_text(json.dumps(report, indent=2) + "\n")
+
+
+@pytest.fixture(scope="session")
+def data_growth() -> float:
+    return max(SIZES) / min(SIZES)
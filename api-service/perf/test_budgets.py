@@ -0,0 +1,142 @@
+"""Statement-count and scaling budgets for the API's hot service calls.
+
+Each test measures one call on every dataset size. Budgets are the number
+of SQL statements a call may issue and, for reads that should not depend on
+the data size, how much their time may grow between the smallest and the
+largest dataset.
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+from api.services import cashier_service, dashboard_service
+
+# Reads served from the summary views or an index should stay roughly flat;
+# this bounds their growth at a fraction of the data growth.
+MAX_FLAT_GROWTH = 0.25
+
+
+def _flat(perf, name, data_growth):
+    if len(perf.sizes) > 1 and _name_measured_everywhere(perf, name):
+        assert perf.growth(name) <= max(1.0, data_growth * MAX_FLAT_GROWTH), (
+            f"{name}: time grew {perf.growth(name):.1f}x for {data_growth:.0f}x more data"
+        )
+
+
+def _name_measured_everywhere(perf, name) -> bool:
+    return all(f"{name}[{size}]" in perf.results for size in perf.sizes)
+
+
+def test_catalog_reads(perf, datasets, size):
+    dataset = datasets[size]
+    with dataset.session() as session:
+        products = perf.measure("get_product_rows", dataset, lambda: cashier_service.get_product_rows(session), 1)
+        supermarkets = perf.measure(
+            "get_all_supermarkets", dataset, lambda: cashier_service.get_all_supermarkets(session), 1
+        )
+    assert len(products) == 50
+    assert len(supermarkets) == 10
+
+
+def test_analytics_summary_is_one_round_trip(perf, datasets, size):
+    dataset = datasets[size]
+    with dataset.session() as session:
+        summary = perf.measure(
+            "get_analytics_summary",
+            dataset,
+            lambda: dashboard_service.get_analytics_summary(session, 3, 3, loyal_page_size=50),
+            statements=1,
+            repeat=3,
+        )
+    assert summary["unique_buyers"] > 0
+    assert len(summary["loyal_buyers"]) <= 50
+
+
+def test_view_backed_analytics_do_not_scale_with_purchases(perf, datasets, size, data_growth):
+    dataset = datasets[size]
+    with dataset.session() as session:
+        page = perf.measure(
+            "loyal_buyers_page_views",
+            dataset,
+            lambda: dashboard_service.get_loyal_buyers_page(session, 3, 50, use_views=True),
+            statements=1,
+        )
+        perf.measure(
+            "top_products_views", dataset, lambda: dashboard_service.get_top_products_from_views(session, 3), 1
+        )
+    # The whale bought every tenth sale, so it always heads the ranking.
+    assert page["loyal_buyers"][0]["user_id"] == str(dataset.whale)
+    if size == max(perf.sizes):
+        _flat(perf, "loyal_buyers_page_views", data_growth)
+        _flat(perf, "top_products_views", data_growth)
+
+
+def test_purchase_history_is_keyset_paged(perf, datasets, size, data_growth):
+    dataset = datasets[size]
+    with dataset.session() as session:
+        first = perf.measure(
+            "get_user_purchases",
+            dataset,
+            lambda: cashier_service.get_user_purchases(session, dataset.whale, 20),
+            statements=2,  # the page, then its baskets via selectinload
+        )
+        session.expunge_all()
+    assert len(first["purchases"]) == 20
+    assert first["next_cursor"]
+    if size == max(perf.sizes):
+        _flat(perf, "get_user_purchases", data_growth)
+
+
+def test_iter_loyal_buyers_streams_in_one_statement(perf, datasets, size):
+    dataset = datasets[size]
+    with dataset.session() as session:
+        buyers = perf.measure(
+            "iter_loyal_buyers",
+            dataset,
+            lambda: list(dashboard_service.iter_loyal_buyers(session, 3, use_views=True)),
+            statements=1,
+            repeat=3,
+        )
+    assert buyers[0]["user_id"] == str(dataset.whale)
+
+
+def test_create_purchase_statement_count(perf, datasets, size):
+    dataset = datasets[size]
+
+    def create():
+        with dataset.session() as session:
+            return cashier_service.create_purchase(
+                session, datetime.now(timezone.utc), "SMKT001", dataset.whale, ["1", "2", "3"], 12.5
+            )
+
+    # Product lookup, purchase insert, link rows (one executemany).
+    perf.measure("create_purchase", dataset, create, statements=3)
+
+
+@pytest.mark.parametrize("batch", [10, 200])
+def test_create_purchases_batch_is_constant_statements(perf, datasets, size, batch):
+    dataset = datasets[size]
+    received_at = datetime.now(timezone.utc)
+    items = [
+        {
+            "supermarket_id": "SMKT002",
+            "user_id": str(dataset.whale),
+            "items_list": [str(n % 50 + 1), str((n + 7) % 50 + 1)],
+            "total_amount": 9.5,
+        }
+        for n in range(batch)
+    ]
+
+    def create():
+        with dataset.session() as session:
+            return cashier_service.create_purchases(session, items, received_at)
+
+    # Product lookup, purchase inserts, link rows (one executemany). PostgreSQL
+    # sends all purchases as one multi-row INSERT ... RETURNING; SQLite has no
+    # ordered multi-row RETURNING in SQLAlchemy, so there it is one per purchase.
+    inserts = 1 if dataset.engine.dialect.name == "postgresql" else batch
+    created, rejected, duplicates = perf.measure(
+        f"create_purchases_{batch}", dataset, create, statements=inserts + 2, repeat=3
+    )
+    assert len(created) == batch
+    assert not rejected and not duplicates
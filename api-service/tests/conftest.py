@@ -2,7 +2,8 @@ import os
 import sys
 import types
 import pytest
-from sqlalchemy import create_engine, select, func, String
+from sqlalchemy import URL, TypeDecorator, create_engine, select, func, String
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
 from sqlalchemy.orm import sessionmaker
 from uuid import UUID
 
@@ -16,9 +17,38 @@ os.environ.setdefault("DATABASE_NAME", "testdb")
 from database.database_config import Base
 from database.models import Product, Purchase, purchase_product
 
-# Force user_id column to behave as string in the SQLite test schema to avoid
-# UUID<->numeric coercion problems.
-Purchase.__table__.c.user_id.type = String(36)
+
+
+class _UserIdText(TypeDecorator):
+    """user_id stored as text in the SQLite test schema, avoiding UUID<->numeric coercion.
+
+    Binds both the str ids the stubs below pass and the UUIDs the real
+    services pass, and reads back UUIDs like the real column, so one schema
+    serves both. On PostgreSQL (pg_session) it keeps the native UUID column.
+    """
+
+    impl = String(36)
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return str
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(PGUUID(as_uuid=True))
+        return dialect.type_descriptor(self.impl)
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return UUID(str(value)) if dialect.name == "postgresql" else str(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None or isinstance(value, UUID) else UUID(value)
+
+
+Purchase.__table__.c.user_id.type = _UserIdText()
 
 # ---------------------------------------------------------------------------
 # Test-only stubs for the api.services package to avoid production imports
@@ -139,10 +169,48 @@ services_pkg.dashboard_service = dashboard_mod
 services_pkg.__all__ = ["cashier_service", "dashboard_service"]
 api_pkg.services = services_pkg
 
-sys.modules["api"] = api_pkg
-sys.modules["api.services"] = services_pkg
-sys.modules["api.services.cashier_service"] = cashier_mod
-sys.modules["api.services.dashboard_service"] = dashboard_mod
+_API_STUBS = {
+    "api": api_pkg,
+    "api.services": services_pkg,
+    "api.services.cashier_service": cashier_mod,
+    "api.services.dashboard_service": dashboard_mod,
+}
+sys.modules.update(_API_STUBS)
+
+
+def pytest_collectstart(collector):
+    # perf/ imports the real api package when it runs in the same session;
+    # modules collected here get the stubs whichever suite was collected first.
+    sys.modules.update(_API_STUBS)
+
+
+@pytest.fixture()
+def api_app(tmp_path, monkeypatch):
+    """The real API app, without the service stubs above, on a temporary SQLite file."""
+    import database.database_config as database_config
+
+    def api_modules():
+        return {name: module for name, module in sys.modules.items() if name == "api" or name.startswith("api.")}
+
+    stubs = api_modules()
+    for name in stubs:
+        del sys.modules[name]
+    monkeypatch.setattr(
+        database_config, "SQLAlchemy_DATABASE", URL.create("sqlite", database=str(tmp_path / "api.db"))
+    )
+    monkeypatch.setenv("WARM_CACHE_PATH", "")
+    try:
+        from api import create_app
+
+        app = create_app()
+        app.config["TESTING"] = True
+        with app.app_context():
+            Base.metadata.create_all(database_config.db.engine)
+        yield app
+    finally:
+        for name in api_modules():
+            del sys.modules[name]
+        sys.modules.update(stubs)
 
 
 @pytest.fixture()
@@ -156,6 +224,28 @@ def session():
     engine.dispose()
 
 
+@pytest.fixture()
+def pg_session():
+    """A session on the PostgreSQL database at TEST_DATABASE_URL; skipped when it is not set.
+
+    The schema is created for the test and dropped afterwards, so point it at a scratch database.
+    """
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(url, future=True)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, future=True)
+    try:
+        with SessionLocal() as session:
+            yield session
+            session.rollback()
+    finally:
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+
 @pytest.fixture()
 def products(session):
     items = [
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from icash_common.admission import AdmissionController, AdmissionRejected
+
+
+def _controller(capacity=2, write_queue=4, analytics_queue=4, max_wait=2.0):
+    controller = AdmissionController()
+    controller.configure(capacity=capacity, budgets={
+        "write": {"limit": capacity, "max_queue": write_queue, "max_wait": max_wait, "priority": 0},
+        "analytics": {"limit": 1, "max_queue": analytics_queue, "max_wait": max_wait, "priority": 1},
+    })
+    return controller
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_budget_limits_and_queue_full_rejection():
+    controller = _controller(analytics_queue=0)
+
+    controller.acquire("analytics")
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire("analytics")
+    controller.acquire("write")  # other budgets are unaffected
+
+    assert rejected.value.reason == "queue full"
+    stats = controller.stats()["budgets"]
+    assert stats["analytics"]["rejected_queue_full"] == 1
+    assert stats["write"]["active"] == 1
+
+
+def test_waiting_request_times_out():
+    controller = _controller(max_wait=0.05)
+    controller.acquire("analytics")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire("analytics")
+
+    assert rejected.value.reason == "wait timeout"
+    stats = controller.stats()["budgets"]["analytics"]
+    assert stats["queued"] == 1 and stats["rejected_timeout"] == 1 and stats["waiting"] == 0
+
+
+def test_freed_slot_goes_to_waiting_write_first():
+    controller = _controller(capacity=1)
+    controller.acquire("write")
+    order = []
+
+    def request(budget):
+        with controller.slot(budget):
+            order.append(budget)
+
+    analytics = threading.Thread(target=request, args=("analytics",))
+    analytics.start()
+    _wait_for(lambda: controller.stats()["budgets"]["analytics"]["waiting"] == 1)
+    write = threading.Thread(target=request, args=("write",))
+    write.start()
+    _wait_for(lambda: controller.stats()["budgets"]["write"]["waiting"] == 1)
+
+    controller.release("write")
+    analytics.join(2)
+    write.join(2)
+
+    assert order == ["write", "analytics"]
+    assert controller.stats()["active"] == 0
+
+
+def test_rejection_is_a_503_with_retry_after():
+    app = Flask(__name__)
+    app.config.update(
+        ADMISSION_ENABLED=True,
+        ADMISSION_CAPACITY=1,
+        ADMISSION_RETRY_AFTER=3,
+        ADMISSION_BUDGETS={"write": {"limit": 1, "max_queue": 0, "max_wait": 0, "priority": 0}},
+    )
+    controller = AdmissionController()
+    controller.init_app(app)
+
+    @app.route("/write")
+    @controller.limit("write")
+    def write():
+        return "ok"
+
+    client = app.test_client()
+    assert client.get("/write").status_code == 200
+    controller.acquire("write")
+    response = client.get("/write")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert response.get_json()["budget"] == "write"
@@ -0,0 +1,161 @@
+import json
+
+from sqlalchemy import func, select
+
+from database import db
+from database.models import Product, Purchase
+
+CUSTOMER = "aaaaaaaa-aaaa-4aaa-8aaa-aaaaaaaaaaaa"
+
+
+def _add_products(app):
+    with app.app_context():
+        db.session.add_all([Product(name="Apples", unit_price=1.0), Product(name="Milk", unit_price=2.5)])
+        db.session.commit()
+
+
+def _purchase_count(app):
+    with app.app_context():
+        return db.session.scalar(select(func.count()).select_from(Purchase))
+
+
+def test_resent_batch_is_not_stored_twice(api_app):
+    _add_products(api_app)
+    batch = {"purchases": [
+        {"supermarket_id": "SMKT001", "user_id": CUSTOMER, "items_list": [1], "total_amount": 1.0,
+         "created_at": "2024-03-01T09:30:00+00:00", "idempotency_key": "sale-1"},
+        {"supermarket_id": "SMKT001", "user_id": CUSTOMER, "items_list": [1, 2], "total_amount": 3.5,
+         "created_at": "2024-03-01T09:31:00+00:00", "idempotency_key": "sale-2"},
+    ]}
+    client = api_app.test_client()
+
+    first = client.post("/cashier/create_purchases", json=batch)
+    assert first.status_code == 201
+    assert first.get_json() == {"created": 2, "duplicates": [], "rejected": []}
+    assert _purchase_count(api_app) == 2
+
+    # The forwarder re-sends a batch whose response it never saw.
+    second = client.post("/cashier/create_purchases", json=batch)
+    assert second.status_code == 201
+    assert second.get_json() == {"created": 0, "duplicates": [0, 1], "rejected": []}
+    assert _purchase_count(api_app) == 2
+
+
+def test_repeated_key_within_a_batch_is_stored_once(api_app):
+    _add_products(api_app)
+    sale = {"supermarket_id": "SMKT001", "user_id": CUSTOMER, "items_list": [1], "total_amount": 1.0,
+            "created_at": "2024-03-01T09:30:00+00:00", "idempotency_key": "sale-1"}
+
+    response = api_app.test_client().post("/cashier/create_purchases", json={"purchases": [sale, sale]})
+
+    assert response.get_json() == {"created": 1, "duplicates": [1], "rejected": []}
+    assert _purchase_count(api_app) == 1
+
+
+def test_catalog_versions_follow_product_content_and_purchases(api_app):
+    _add_products(api_app)
+    client = api_app.test_client()
+    before = client.get("/cashier/catalog/versions").get_json()
+    assert set(before) == {"products", "supermarkets", "users"}
+
+    with api_app.app_context():
+        db.session.get(Product, 1).unit_price = 1.2
+        db.session.commit()
+    repriced = client.get("/cashier/catalog/versions").get_json()
+    assert repriced["products"] != before["products"] and repriced["users"] == before["users"]
+
+    client.post("/cashier/create_purchases", json={"purchases": [
+        {"supermarket_id": "SMKT001", "user_id": CUSTOMER, "items_list": [1], "total_amount": 1.2},
+    ]})
+    bought = client.get("/cashier/catalog/versions").get_json()
+    assert bought["users"] != repriced["users"] and bought["products"] == repriced["products"]
+
+
+def test_catalog_part_revalidates_with_its_etag(api_app):
+    _add_products(api_app)
+    client = api_app.test_client()
+    versions = client.get("/cashier/catalog/versions").get_json()
+
+    response = client.get("/cashier/catalog/products")
+    assert response.status_code == 200
+    assert [product["name"] for product in response.get_json()] == ["Apples", "Milk"]
+    assert response.headers["X-Catalog-Version"] == versions["products"]
+
+    cached = client.get("/cashier/catalog/products", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304 and not cached.data
+    assert cached.headers["X-Catalog-Version"] == versions["products"]
+
+
+def test_unknown_catalog_part_is_not_found(api_app):
+    response = api_app.test_client().get("/cashier/catalog/prices")
+    assert response.status_code == 404
+    assert "products, supermarkets, users" in response.get_json()["error"]
+
+
+def test_batch_events_carry_running_counts_from_one_count_query(api_app):
+    from sqlalchemy import event
+
+    from api import event_broker
+
+    _add_products(api_app)
+    other = "bbbbbbbb-bbbb-4bbb-8bbb-bbbbbbbbbbbb"
+    client = api_app.test_client()
+    client.post("/cashier/create_purchases", json={"purchases": [
+        {"supermarket_id": "SMKT001", "user_id": CUSTOMER, "items_list": [1], "total_amount": 1.0},
+    ]})
+    subscriber = event_broker.fanout.subscribe()
+    statements = []
+    with api_app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    try:
+        client.post("/cashier/create_purchases", json={"purchases": [
+            {"supermarket_id": "SMKT001", "user_id": CUSTOMER, "items_list": [1, 2], "total_amount": 3.5},
+            {"supermarket_id": "SMKT002", "user_id": other, "items_list": [2], "total_amount": 2.5},
+            {"supermarket_id": "SMKT001", "user_id": CUSTOMER, "items_list": [2], "total_amount": 2.5},
+        ]})
+    finally:
+        event_broker.fanout.unsubscribe(subscriber)
+
+    deltas = []
+    while not subscriber.queue.empty():
+        name, data = subscriber.queue.get_nowait()
+        assert name == "purchase"
+        deltas.append(json.loads(data))
+    assert [(d["user_id"], d["user_purchase_count"], d["new_buyer"]) for d in deltas] == [
+        (CUSTOMER, 2, False), (other, 1, True), (CUSTOMER, 3, False),
+    ]
+    assert deltas[0]["products"] == ["Apples", "Milk"] and deltas[1]["supermarket_id"] == "SMKT002"
+    assert len([sql for sql in statements if "purchase_archive_summary" in sql]) == 1
+
+
+def test_no_events_are_built_without_listeners(api_app, monkeypatch):
+    from api.routes import cashier_routes
+
+    calls = []
+    monkeypatch.setattr(cashier_routes, "get_purchase_deltas", lambda *args: calls.append(args) or [])
+    _add_products(api_app)
+    response = api_app.test_client().post("/cashier/create_purchases", json={"purchases": [
+        {"supermarket_id": "SMKT001", "user_id": CUSTOMER, "items_list": [1], "total_amount": 1.0},
+    ]})
+    assert response.status_code == 201 and _purchase_count(api_app) == 1
+    assert calls == []
+
+
+def test_catalog_keeps_customers_and_branches_only_seen_in_archived_months(api_app):
+    from datetime import date
+
+    from database.partitioning import archive_month
+
+    _add_products(api_app)
+    client = api_app.test_client()
+    client.post("/cashier/create_purchases", json={"purchases": [
+        {"supermarket_id": "SMKT009", "user_id": CUSTOMER, "items_list": [1], "total_amount": 1.0,
+         "created_at": "2024-01-15T09:30:00+00:00"},
+        {"supermarket_id": "SMKT001", "user_id": "bbbbbbbb-bbbb-4bbb-8bbb-bbbbbbbbbbbb", "items_list": [1],
+         "total_amount": 1.0, "created_at": "2024-03-01T09:30:00+00:00"},
+    ]})
+    with api_app.app_context():
+        assert archive_month(db.engine, date(2024, 1, 1)) == 1
+
+    assert client.get("/cashier/catalog/supermarkets").get_json() == ["SMKT001", "SMKT009"]
+    assert client.get("/cashier/catalog/users").get_json() == [CUSTOMER, "bbbbbbbb-bbbb-4bbb-8bbb-bbbbbbbbbbbb"]
@@ -0,0 +1,85 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+from flask import Flask
+
+SERVICES_PATH = Path(__file__).resolve().parents[2] / "cashier-service" / "app" / "services.py"
+URL = "http://api/cashier/catalog"
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code, self.body, self.headers = status_code, body, headers or {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeApi:
+    """Serves /versions and the catalog parts, honouring If-None-Match; records every request."""
+
+    def __init__(self):
+        self.parts = {
+            "products": ("p1", [{"id": 1, "name": "Apples", "unit_price": 1.0}]),
+            "supermarkets": ("t1", ["SMKT001"]),
+            "users": ("1", ["aaaaaaaa-aaaa-4aaa-8aaa-aaaaaaaaaaaa"]),
+        }
+        self.requests = []
+
+    def __call__(self, method, url, headers=None, timeout=None):
+        part = url.rsplit("/", 1)[1]
+        self.requests.append((part, (headers or {}).get("If-None-Match")))
+        if part == "versions":
+            return FakeResponse(body={name: version for name, (version, _) in self.parts.items()})
+        version, data = self.parts[part]
+        etag = f'"{part}-{len(data)}"'
+        headers = {"ETag": etag, "X-Catalog-Version": version}
+        if self.requests[-1][1] == etag:
+            return FakeResponse(304, headers=headers)
+        return FakeResponse(body=data, headers=headers)
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    spec = importlib.util.spec_from_file_location("cashier_services", SERVICES_PATH)
+    services = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(services)
+    api = FakeApi()
+    monkeypatch.setattr(services, "traced_request", api)
+    app = Flask(__name__)
+    app.config["CATALOG_URL"] = URL
+    with app.app_context():
+        yield services, api
+
+
+def test_fetch_catalog_refetches_only_parts_whose_version_moved(client):
+    services, api = client
+    catalog = services.fetch_catalog()
+    assert catalog["supermarkets"] == ["SMKT001"]
+    assert [part for part, _ in api.requests] == ["versions", "products", "supermarkets", "users"]
+
+    api.requests.clear()
+    services.fetch_catalog()
+    assert api.requests == [("versions", None)]
+
+    # A repeat customer moves the users version without changing the list: revalidated, not refetched.
+    api.parts["users"] = ("2", api.parts["users"][1])
+    api.requests.clear()
+    catalog = services.fetch_catalog()
+    assert api.requests == [("versions", None), ("users", '"users-1"')]
+    assert catalog["users"] == ["aaaaaaaa-aaaa-4aaa-8aaa-aaaaaaaaaaaa"]
+    assert services._catalog_parts["users"]["version"] == "2"
+
+    # A repriced product changes the products version and its content.
+    api.parts["products"] = ("p2", [
+        {"id": 1, "name": "Apples", "unit_price": 1.2},
+        {"id": 2, "name": "Milk", "unit_price": 2.5},
+    ])
+    api.requests.clear()
+    catalog = services.fetch_catalog()
+    assert api.requests == [("versions", None), ("products", '"products-1"')]
+    assert [product["unit_price"] for product in catalog["products"]] == [1.2, 2.5]
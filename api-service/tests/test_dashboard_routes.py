@@ -0,0 +1,78 @@
+import base64
+
+import pytest
+
+from database import db
+from database.models import Product
+from database.rollups import create_views
+
+CUSTOMERS = ["aaaaaaaa-aaaa-4aaa-8aaa-aaaaaaaaaaaa", "bbbbbbbb-bbbb-4bbb-8bbb-bbbbbbbbbbbb"]
+
+
+def _cursor(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+@pytest.fixture()
+def client(api_app):
+    with api_app.app_context():
+        db.session.add(Product(name="Apples", unit_price=1.0))
+        db.session.commit()
+    client = api_app.test_client()
+    sales = [
+        {"supermarket_id": "SMKT001", "user_id": customer, "items_list": [1], "total_amount": 1.0}
+        for customer in CUSTOMERS for _ in range(3)
+    ]
+    assert client.post("/cashier/create_purchases", json={"purchases": sales}).status_code == 201
+    return client
+
+
+@pytest.mark.parametrize("fmt", ["json", "ndjson"])
+@pytest.mark.parametrize("raw", ["5:notauuid", "five:" + CUSTOMERS[0], "no separator"])
+def test_loyal_buyers_rejects_a_malformed_cursor(client, fmt, raw):
+    response = client.get(f"/dashboard/loyal_buyers?format={fmt}&cursor={_cursor(raw)}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid cursor"}
+
+
+def test_loyal_buyers_pages_and_streams_after_a_cursor(client):
+    first = client.get("/dashboard/loyal_buyers?limit=1").get_json()
+    assert [buyer["user_id"] for buyer in first["loyal_buyers"]] == CUSTOMERS[:1]
+
+    page = client.get(f"/dashboard/loyal_buyers?limit=1&cursor={first['next_cursor']}").get_json()
+    assert [buyer["user_id"] for buyer in page["loyal_buyers"]] == CUSTOMERS[1:]
+    assert page["next_cursor"] is None
+
+    stream = client.get(f"/dashboard/loyal_buyers?format=ndjson&cursor={first['next_cursor']}")
+    assert stream.status_code == 200
+    assert stream.get_data(as_text=True) == f'{{"user_id":"{CUSTOMERS[1]}","purchase_count":3}}\n'
+
+
+def test_view_backed_analytics_serialize(client, api_app):
+    api_app.config["ANALYTICS_SOURCE"] = "views"
+    with api_app.app_context():
+        create_views(db.engine)
+
+    response = client.get("/dashboard/analytics?min_purchases=3")
+
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload["top_products"] == [{"name": "Apples", "times_sold": 6}]
+    assert payload["unique_buyers"] == 2 and payload["loyal_buyers_count"] == 2
+
+
+def test_data_version_moves_when_a_product_is_repriced_or_renamed(client, api_app):
+    from api.services.version_service import get_data_version
+
+    with api_app.app_context():
+        before = get_data_version(db.session)
+        assert before.startswith("6-")
+        product = db.session.get(Product, 1)
+        product.unit_price = 1.25
+        db.session.commit()
+        repriced = get_data_version(db.session)
+        product.name = "Green apples"
+        db.session.commit()
+        renamed = get_data_version(db.session)
+
+    assert len({before, repriced, renamed}) == 3
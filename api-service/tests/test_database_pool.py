@@ -0,0 +1,75 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from database.database_config import build_engine_options
+from database.pool import CheckoutHistogram, InstrumentedQueuePool, install_fork_safety, pool_stats
+
+
+def test_engine_options_follow_thread_count(monkeypatch):
+    for name in ("DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_MAX_CONNECTIONS"):
+        monkeypatch.delenv(name, raising=False)
+
+    options = build_engine_options(workers=4, threads=8)
+
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == 8
+    assert options["max_overflow"] == 4
+
+
+def test_engine_options_clamped_to_connection_budget(monkeypatch):
+    monkeypatch.setenv("DB_MAX_CONNECTIONS", "20")
+    monkeypatch.setenv("DB_POOL_SIZE", "10")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "10")
+
+    options = build_engine_options(workers=4, threads=8)
+
+    assert options["pool_size"] + options["max_overflow"] <= 20 // 4
+
+
+def test_checkout_histogram_buckets():
+    histogram = CheckoutHistogram(buckets_ms=(1, 10))
+    for wait_ms in (0.5, 5, 50):
+        histogram.observe(wait_ms)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 3
+    assert snapshot["max_ms"] == 50
+    assert [b["count"] for b in snapshot["buckets"]] == [1, 1, 1]
+
+
+@pytest.fixture()
+def pooled_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite+pysqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    install_fork_safety(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_pool_stats_track_checkouts_and_timeouts(pooled_engine):
+    with pooled_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert pool_stats(pooled_engine)["checked_out"] == 1
+        with pytest.raises(exc.TimeoutError):
+            pooled_engine.connect()
+
+    stats = pool_stats(pooled_engine)
+    assert stats["checked_out"] == 0
+    assert stats["checkout_timeouts"] == 1
+    assert stats["checkout_wait"]["count"] == 2
+
+
+def test_connection_from_other_process_is_replaced(pooled_engine):
+    with pooled_engine.connect() as conn:
+        first = conn.connection.dbapi_connection
+        conn.connection._connection_record.info["pid"] = os.getpid() + 1
+
+    with pooled_engine.connect() as conn:
+        assert conn.connection.dbapi_connection is not first
@@ -0,0 +1,33 @@
+from icash_common.events import EventFanout, parse_sse, sse_stream
+
+
+def test_sse_stream_round_trips_through_parser():
+    fanout = EventFanout()
+    subscriber = fanout.subscribe()
+    fanout.publish("purchase", '{"new_buyer":true}')
+    fanout.publish("purchase", "line one\nline two")
+
+    stream = sse_stream(fanout, subscriber, heartbeat=0.01)
+    chunks = [next(stream) for _ in range(4)]
+    stream.close()
+
+    assert chunks[3] == b": heartbeat\n\n"
+    lines = b"".join(chunks).decode().split("\n")
+    assert list(parse_sse(lines)) == [
+        ("purchase", '{"new_buyer":true}'),
+        ("purchase", "line one\nline two"),
+    ]
+    assert fanout.subscriber_count == 0
+
+
+def test_lagging_subscriber_is_resynced_without_blocking_others():
+    fanout = EventFanout(max_queue=2)
+    slow, fast = fanout.subscribe(), fanout.subscribe()
+    for n in range(3):
+        fanout.publish("purchase", str(n))
+        fast.queue.get_nowait()
+
+    assert slow.lagged and not fast.lagged
+    assert fanout.dropped == 1
+    chunks = list(sse_stream(fanout, slow))
+    assert chunks[-1] == b"event: resync\ndata: {}\n\n"
@@ -0,0 +1,59 @@
+import gzip
+
+from flask import Flask, render_template_string
+
+from icash_common.frontend import IMMUTABLE_CACHE_CONTROL, register_frontend
+
+
+def _app(tmp_path):
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "app.js").write_text("console.log('till');\n" * 100)
+    app = Flask(__name__, static_folder=str(static))
+    register_frontend(app)
+    return app
+
+
+def test_asset_url_is_fingerprinted_and_served_immutable(tmp_path):
+    app = _app(tmp_path)
+    client = app.test_client()
+    with app.test_request_context():
+        styles = render_template_string("{{ asset_url('icash_common.static', 'styles.css') }}")
+        script = render_template_string("{{ asset_url('static', 'app.js') }}")
+
+    assert styles.startswith("/common-static/styles.") and styles.endswith(".css") and styles != "/common-static/styles.css"
+    assert script.startswith("/static/app.") and script.endswith(".js")
+
+    plain = client.get(script)
+    zipped = client.get(script, headers={"Accept-Encoding": "gzip, br"})
+    assert plain.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert "Content-Encoding" not in plain.headers
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in zipped.headers["Vary"]
+    assert gzip.decompress(zipped.data) == plain.data
+    assert len(zipped.data) < len(plain.data)
+
+    revalidated = client.get(script, headers={"If-None-Match": plain.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+
+def test_gzip_refused_with_q_zero_is_not_sent(tmp_path):
+    app = _app(tmp_path)
+    with app.test_request_context():
+        script = render_template_string("{{ asset_url('static', 'app.js') }}")
+    client = app.test_client()
+
+    for accept in ("gzip;q=0", "br, gzip;q=0", "identity"):
+        response = client.get(script, headers={"Accept-Encoding": accept})
+        assert "Content-Encoding" not in response.headers, accept
+    assert client.get(script, headers={"Accept-Encoding": "*"}).headers["Content-Encoding"] == "gzip"
+
+
+def test_unfingerprinted_names_fall_back_to_regular_static(tmp_path):
+    client = _app(tmp_path).test_client()
+
+    response = client.get("/static/app.js")
+    assert response.status_code == 200
+    assert "immutable" not in response.headers.get("Cache-Control", "")
+    response.close()
+    assert client.get("/static/app.0123456789ab.js").status_code == 404
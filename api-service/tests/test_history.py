@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from api.services import cashier_service
+from database.history import user_purchases_page
+
+CUSTOMER = "aaaaaaaa-aaaa-4aaa-8aaa-aaaaaaaaaaaa"
+OTHER = "bbbbbbbb-bbbb-4bbb-8bbb-bbbbbbbbbbbb"
+
+
+def test_user_purchases_pages_newest_first(session, products):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for day in range(5):
+        cashier_service.create_purchase(session, start + timedelta(days=day), "S1", CUSTOMER, [str(products[day].id)], 1)
+    # Same timestamp as the newest purchase: ties are broken by id.
+    cashier_service.create_purchase(session, start + timedelta(days=4), "S1", CUSTOMER, [str(products[0].id)], 1)
+    cashier_service.create_purchase(session, start, "S2", OTHER, [str(products[0].id)], 1)
+
+    seen, before = [], None
+    while page := user_purchases_page(session, CUSTOMER, limit=2, before=before):
+        seen.extend(page)
+        before = (page[-1].created_at, page[-1].id)
+
+    assert len(seen) == 6
+    keys = [(p.created_at, p.id) for p in seen]
+    assert keys == sorted(keys, reverse=True)
+    assert {str(p.user_id) for p in seen} == {CUSTOMER}
+
+
+def test_user_purchases_loads_baskets_in_one_query(session, products):
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for product in products:
+        cashier_service.create_purchase(session, now, "S1", CUSTOMER, [str(product.id), str(products[0].id)], 1)
+    session.expunge_all()
+
+    statements = []
+    event.listen(session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    page = user_purchases_page(session, CUSTOMER, limit=10)
+    baskets = [len(purchase.products) for purchase in page]
+
+    assert len(statements) == 2
+    assert sorted(baskets) == [1, 2, 2, 2, 2]
@@ -0,0 +1,155 @@
+import hashlib
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import create_engine, func, insert, select
+
+from database import importer
+from database.database_config import Base
+from database.importer import ImportReport, find_files, parse_file, parse_purchases, run_import
+from database.models import Product, Purchase, imported_file, purchase_product
+
+PRODUCTS = {"milk": 1, "bread": 2, "eggs": 3}
+HEADER = "supermarket_id,timestamp,user_id,items_list,total_amount\n"
+CUSTOMER = "aaaaaaaa-aaaa-4aaa-8aaa-aaaaaaaaaaaa"
+
+
+def test_parse_purchases_keeps_good_rows_and_reports_bad_ones():
+    text = (
+        HEADER
+        + f'SMKT001,2024-03-01T09:30:00,{CUSTOMER},"milk, bread,milk",3.5\n'
+        + 'SMKT001,2024-03-01T09:31:00,not-a-uuid,"milk",1.5\n'
+        + f'SMKT001,2024-03-01T09:32:00,{CUSTOMER},"milk,caviar",9\n'
+        + f'SMKT001,yesterday,{CUSTOMER},"eggs",2\n'
+        + f'SMKT001,2024-03-01T09:33:00+02:00,{CUSTOMER},"eggs",0\n'
+    )
+
+    purchases, errors = parse_purchases(text, PRODUCTS)
+
+    assert purchases == [{
+        "supermarket_id": "SMKT001",
+        "created_at": datetime(2024, 3, 1, 9, 30, tzinfo=timezone.utc),
+        "user_id": UUID(CUSTOMER),
+        "total_amount": 3.5,
+        "product_ids": [1, 2],
+        "line": 2,
+    }]
+    assert [line for line, _ in errors] == [3, 4, 5, 6]
+    assert "invalid user_id" in errors[0][1]
+    assert errors[1][1] == "unknown product(s): caviar"
+    assert "invalid timestamp" in errors[2][1]
+    assert errors[3][1] == "total_amount must be positive"
+
+
+def test_parse_purchases_rejects_a_file_with_missing_columns():
+    purchases, errors = parse_purchases("supermarket_id,timestamp\nSMKT001,2024-03-01\n", PRODUCTS)
+    assert purchases == []
+    assert errors == [(1, "missing columns: user_id, items_list, total_amount")]
+
+
+def test_parse_file_skips_known_checksums(tmp_path, monkeypatch):
+    path = tmp_path / "SMKT002_2024-03-01.csv"
+    path.write_text(HEADER + f"SMKT002,2024-03-01T10:00:00,{CUSTOMER},bread,2\n", encoding="utf-8")
+    checksum = hashlib.sha256(path.read_bytes()).hexdigest()
+
+    monkeypatch.setattr(importer, "_product_ids", PRODUCTS)
+    parsed = parse_file(str(path))
+    assert parsed.checksum == checksum and parsed.branch == "SMKT002" and not parsed.skipped
+    assert len(parsed.purchases) == 1
+
+    monkeypatch.setattr(importer, "_known_checksums", frozenset({checksum}))
+    parsed = parse_file(str(path))
+    assert parsed.skipped and parsed.purchases == []
+
+
+def test_find_files_accepts_a_directory_or_a_glob(tmp_path):
+    for name in ("SMKT001_2024-03-02.csv", "SMKT001_2024-03-01.csv", "SMKT002_2024-03-01.csv", "notes.txt"):
+        (tmp_path / name).write_text(HEADER)
+
+    assert [p.rsplit("/", 1)[1] for p in find_files(str(tmp_path))] == [
+        "SMKT001_2024-03-01.csv", "SMKT001_2024-03-02.csv", "SMKT002_2024-03-01.csv",
+    ]
+    assert len(find_files(str(tmp_path / "SMKT001_*.csv"))) == 2
+
+
+def test_report_lists_rejected_rows_per_file():
+    report = ImportReport(files_found=2, files_imported=1, files_skipped=1, purchases_imported=10,
+                          rows_rejected=22, elapsed_seconds=2.0)
+    report.errors["day.csv"] = [(line, "invalid user_id 'x'") for line in range(2, 24)]
+
+    text = report.render()
+
+    assert "1 imported, 1 already imported" in text
+    assert "5 purchases/s" in text
+    assert "day.csv: 22 rejected" in text
+    assert "  line 2: invalid user_id 'x'" in text
+    assert "... and 2 more" in text
+    assert "--retry-rejected" in text
+
+
+def test_run_import_loads_each_file_once_and_retries_rejected_rows(tmp_path):
+    # A file database: the writers are threads with their own connections.
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Product), [{"name": "milk", "unit_price": 1.0}, {"name": "bread", "unit_price": 2.0}])
+    first = tmp_path / "SMKT001_2024-03-01.csv"
+    first.write_text(HEADER + "".join(
+        f'SMKT001,2024-03-01T09:{minute:02d}:00,{CUSTOMER},"{items}",{amount}\n'
+        for minute, (items, amount) in enumerate([("milk", 1), ("milk,bread", 3), ("bread", 2)])
+    ))
+    second = tmp_path / "SMKT002_2024-03-01.csv"
+    second.write_text(HEADER + f'SMKT002,2024-03-01T10:00:00,{CUSTOMER},milk,1.5\n'
+                      + f'SMKT002,2024-03-01T10:05:00,{CUSTOMER},"milk,eggs",4\n')
+    paths = [str(first), str(second)]
+
+    def baskets():
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(Purchase.total_amount, purchase_product.c.product_id)
+                .join(purchase_product, purchase_product.c.purchase_id == Purchase.id)
+            ).all()
+        result = {}
+        for amount, product_id in rows:
+            result.setdefault(amount, set()).add(product_id)
+        return result
+
+    report = run_import(engine, paths, writers=2)
+    assert (report.files_imported, report.purchases_imported, report.rows_rejected) == (2, 4, 1)
+    # Bulk-inserted ids came back in row order, so every basket belongs to its own purchase.
+    assert baskets() == {1.0: {1}, 3.0: {1, 2}, 2.0: {2}, 1.5: {1}}
+
+    report = run_import(engine, paths, writers=2)
+    assert (report.files_imported, report.files_skipped, report.purchases_imported) == (0, 2, 0)
+
+    with engine.begin() as conn:
+        conn.execute(insert(Product).values(name="eggs", unit_price=0.5))
+    report = run_import(engine, paths, writers=2, retry_rejected=True)
+    assert (report.files_imported, report.files_skipped) == (1, 1)
+    assert (report.purchases_imported, report.rows_rejected) == (1, 0)
+    assert baskets() == {1.0: {1}, 3.0: {1, 2}, 2.0: {2}, 1.5: {1}, 4.0: {1, 3}}
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(Purchase)) == 5
+        recorded = conn.execute(
+            select(imported_file.c.purchases_imported, imported_file.c.rows_rejected)
+            .where(imported_file.c.filename == second.name)
+        ).one()
+    assert tuple(recorded) == (2, 0)
+    engine.dispose()
+
+
+def test_unreadable_file_fails_alone_in_the_parser_pool(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Product).values(name="milk", unit_price=1.0))
+    good = tmp_path / "SMKT001_2024-03-01.csv"
+    good.write_text(HEADER + f"SMKT001,2024-03-01T09:00:00,{CUSTOMER},milk,1\n")
+    gone = str(tmp_path / "SMKT001_2024-03-02.csv")  # listed, then deleted before it was parsed
+
+    report = run_import(engine, [str(good), gone], workers=2)
+
+    assert (report.files_imported, report.files_failed, report.purchases_imported) == (1, 1, 1)
+    assert report.failures[gone].startswith("unreadable: ")
+    assert f"{gone}: failed: unreadable" in report.render()
+    engine.dispose()
@@ -0,0 +1,96 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+from icash_common import logging_config
+
+
+def _record(name="api.services.cashier_service", level=logging.INFO, msg="created %s", args=("p1",), **extra):
+    record = logging.makeLogRecord({"name": name, "levelno": level, "levelname": logging.getLevelName(level),
+                                    "msg": msg, "args": args})
+    record.__dict__.update(extra)
+    return record
+
+
+def test_bounded_queue_handler_drops_when_full():
+    handler = logging_config.BoundedQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(_record())
+    handler.handle(_record())
+
+    assert (handler.enqueued, handler.dropped) == (1, 1)
+    queued = handler.queue.get_nowait()
+    assert (queued.msg, queued.args) == ("created p1", None)
+
+
+def test_listener_stops_with_a_full_queue():
+    release = threading.Event()
+
+    class SlowHandler(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.written = []
+
+        def emit(self, record):
+            release.wait(5)
+            self.written.append(record.msg)
+
+    target = SlowHandler()
+    handler = logging_config.BoundedQueueHandler(queue.Queue(maxsize=2))
+    listener = logging_config.BoundedQueueListener(handler.queue, target)
+    listener.sentinel_timeout = 0.05
+    listener.start()
+    handler.handle(_record(args=("p0",)))
+    while handler.queue.qsize():  # the listener took it and is stuck writing it
+        time.sleep(0.01)
+    for n in range(1, 4):  # two fill the queue, one is dropped
+        handler.handle(_record(args=(f"p{n}",)))
+    thread = listener._thread
+
+    # No room within the timeout: the oldest queued record makes way for the sentinel.
+    stopper = threading.Thread(target=listener.stop)
+    stopper.start()
+    time.sleep(0.2)
+    release.set()
+    stopper.join(5)
+
+    assert not stopper.is_alive() and not thread.is_alive()
+    assert handler.dropped == 1
+    assert target.written == ["created p0", "created p2"]
+
+
+def test_sampling_filter_keeps_warnings_and_other_loggers():
+    sampler = logging_config.SamplingFilter(logging_config._parse_sampling("api.services=0, api.routes=1"))
+
+    assert not sampler.filter(_record("api.services.cashier_service"))
+    assert sampler.filter(_record("api.services.cashier_service", level=logging.WARNING))
+    assert sampler.filter(_record("api.routes.cashier_routes"))
+    assert sampler.filter(_record("database.seed"))
+    assert sampler.sampled_out == 1
+
+
+def test_json_formatter_includes_extra_fields():
+    line = logging_config.JsonFormatter().format(_record(supermarket_id="S1"))
+    entry = json.loads(line)
+
+    assert entry["message"] == "created p1"
+    assert entry["supermarket_id"] == "S1"
+    assert entry["level"] == "INFO"
+
+
+def test_queue_mode_writes_from_listener(monkeypatch, capsys):
+    monkeypatch.setenv("LOG_MODE", "queue")
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    try:
+        logging_config.setup_logging()
+        logging.getLogger("icash.test").info("queued %d", 1)
+        logging_config._stop_listener()
+        stats = logging_config.logging_stats()
+    finally:
+        monkeypatch.setenv("LOG_MODE", "sync")
+        monkeypatch.setenv("LOG_FORMAT", "text")
+        logging_config.setup_logging()
+
+    assert stats["mode"] == "queue" and stats["enqueued"] >= 1 and stats["dropped"] == 0
+    assert '"message": "queued 1"' in capsys.readouterr().err
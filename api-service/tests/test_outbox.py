@@ -0,0 +1,28 @@
+from icash_common.outbox import Outbox
+
+
+def test_claimed_messages_are_leased_until_acked_or_retried(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    first, second = outbox.enqueue({"n": 1}), outbox.enqueue({"n": 2})
+
+    assert outbox.claim(10) == [(first, {"n": 1}), (second, {"n": 2})]
+    # A second worker sharing the file sees nothing while the lease holds.
+    assert Outbox(outbox.path).claim(10) == []
+
+    outbox.ack([first])
+    outbox.retry([second], delay=0, error="API down")
+    stats = outbox.stats()
+    assert (stats["depth"], stats["in_flight"], stats["max_attempts"]) == (1, 0, 1)
+    assert stats["delivered_in_window"] == 1
+    assert outbox.claim(10) == [(second, {"n": 2})]
+
+
+def test_dead_letters_leave_the_queue(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    bad = outbox.enqueue({"user_id": "nope"})
+    outbox.claim(10)
+
+    outbox.dead_letter({bad: "user_id must be a valid UUID"})
+
+    stats = outbox.stats()
+    assert (stats["depth"], stats["dead_letters"], stats["oldest_age_seconds"]) == (0, 1, None)
@@ -0,0 +1,83 @@
+from datetime import date, datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import func, select, text
+
+from api.services import cashier_service
+from database.models import Product, Purchase, purchase_archive_summary
+from database.partitioning import (
+    add_months,
+    archive_before,
+    archive_month,
+    create_partitioned_tables,
+    ensure_month_partitions,
+    partition_name,
+)
+from database.rollups import product_sales_query, user_purchase_counts_query
+
+BUYER_ONE = UUID("aaaaaaaa-1111-1111-1111-111111111111")
+BUYER_TWO = UUID("bbbbbbbb-2222-2222-2222-222222222222")
+
+
+def _buy(session, when, user_id, *products):
+    cashier_service.create_purchase(session, when, "S1", user_id, [str(p.id) for p in products], 1)
+
+
+def _analytics(session):
+    counts = {str(user): n for user, n in session.execute(user_purchase_counts_query()).all()}
+    sales = {row.name: row.times_sold for row in session.execute(product_sales_query())}
+    return counts, sales
+
+
+def test_month_helpers():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert partition_name(date(2024, 3, 1)) == "purchase_p2024_03"
+
+
+def test_archive_keeps_analytics_totals(session, products):
+    january = datetime(2024, 1, 15, tzinfo=timezone.utc)
+    march = datetime(2024, 3, 2, tzinfo=timezone.utc)
+    _buy(session, january, BUYER_ONE, products[0], products[1])
+    _buy(session, january, BUYER_TWO, products[0])
+    _buy(session, march, BUYER_ONE, products[2])
+    before = _analytics(session)
+
+    archived = archive_before(session.get_bind(), date(2024, 3, 1))
+    session.expire_all()
+
+    assert archived == 2
+    assert session.scalar(select(func.count(Purchase.id))) == 1
+    assert _analytics(session) == before
+
+
+def test_archiving_a_month_twice_adds_to_summary(session, products):
+    january = datetime(2024, 1, 15, tzinfo=timezone.utc)
+    engine = session.get_bind()
+    _buy(session, january, BUYER_ONE, products[0])
+    archive_month(engine, date(2024, 1, 1))
+    _buy(session, january, BUYER_ONE, products[0])
+    archive_month(engine, date(2024, 1, 1))
+
+    count = session.scalar(select(purchase_archive_summary.c.purchase_count))
+    assert count == 2
+    assert _analytics(session)[1] == {products[0].name: 2}
+
+
+def test_month_partition_takes_its_rows_from_the_default_partition_on_postgresql(pg_session):
+    engine = pg_session.get_bind()
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE purchase_product, purchase"))
+    create_partitioned_tables(engine)
+    product = Product(name="Apples", unit_price=1.0)
+    pg_session.add(product)
+    pg_session.commit()
+    _buy(pg_session, datetime(2024, 5, 10, tzinfo=timezone.utc), BUYER_ONE, product)
+    _buy(pg_session, datetime(2024, 6, 10, tzinfo=timezone.utc), BUYER_ONE, product)
+
+    assert ensure_month_partitions(engine, date(2024, 5, 1), date(2024, 5, 1)) == ["purchase_p2024_05"]
+
+    with engine.connect() as conn:
+        assert conn.scalar(text("SELECT count(*) FROM purchase_p2024_05")) == 1
+        assert conn.scalar(text("SELECT count(*) FROM purchase_default")) == 1
+    assert pg_session.scalar(select(func.count(Purchase.id))) == 2
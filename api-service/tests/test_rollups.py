@@ -0,0 +1,177 @@
+import re
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import event, inspect, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from api.services import cashier_service
+from database.models import Product, analytics_refresh
+from database.rollups import (
+    analytics_summary_statement,
+    create_views,
+    fold_analytics_summary,
+    loyal_buyers_page_statement,
+    product_sales_view,
+    refresh_views,
+    user_purchase_counts_query,
+    user_purchase_counts_view,
+    views_refreshed_at,
+)
+
+BUYER_ONE = UUID("11111111-1111-1111-1111-111111111111")
+BUYER_TWO = UUID("22222222-2222-2222-2222-222222222222")
+
+
+def _buy(session, user_id, *products):
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    cashier_service.create_purchase(session, now, "S1", user_id, [str(p.id) for p in products], 1)
+
+
+def test_create_views_populates_summaries(session, products):
+    _buy(session, BUYER_ONE, products[0], products[1])
+    _buy(session, BUYER_ONE, products[0])
+    _buy(session, BUYER_TWO, products[0])
+
+    create_views(session.get_bind())
+
+    counts = dict(session.execute(select(user_purchase_counts_view)).all())
+    assert counts == {BUYER_ONE: 2, BUYER_TWO: 1}
+    sales = {row.name: row.times_sold for row in session.execute(select(product_sales_view))}
+    assert sales == {products[0].name: 3, products[1].name: 1}
+    assert views_refreshed_at(session) is not None
+
+
+def test_refresh_views_picks_up_new_purchases(session, products):
+    engine = session.get_bind()
+    create_views(engine)
+    first_refresh = views_refreshed_at(session)
+    assert session.execute(select(user_purchase_counts_view)).all() == []
+
+    _buy(session, BUYER_TWO, products[2])
+    assert refresh_views(engine) is True
+
+    assert session.execute(select(user_purchase_counts_view)).all() == [(BUYER_TWO, 1)]
+    assert views_refreshed_at(session) >= first_refresh
+
+
+def _record_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_analytics_summary_single_statement(session, products):
+    _check_analytics_summary(session, products)
+
+
+def test_analytics_summary_groups_once_on_postgresql():
+    stmt = analytics_summary_statement("postgresql", min_purchases=2, top_limit=1, by_supermarket=True)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    # Both fact kinds come from one aggregation over a single scan of purchase.
+    assert len(re.findall(r"FROM purchase\b", sql)) == 1
+    assert sql.count("GROUP BY GROUPING SETS") == 1
+    assert (
+        "GROUPING SETS((purchase_lines.supermarket_id, purchase_lines.user_id), "
+        "(purchase_lines.supermarket_id, purchase_lines.product_id))"
+    ) in sql
+    assert "grouping(purchase_lines.user_id) AS kind" in sql
+    assert "GROUPING" not in str(analytics_summary_statement("sqlite", 2, 1, True).compile(dialect=sqlite.dialect()))
+
+
+def test_analytics_summary_grouping_sets_on_postgresql(pg_session):
+    products = [Product(name=name, unit_price=1.0) for name in ("Apples", "Bananas", "Carrots")]
+    pg_session.add_all(products)
+    pg_session.commit()
+    statements = _check_analytics_summary(pg_session, products)
+    assert "GROUPING SETS" in statements[0]
+
+
+def test_pg_session_keeps_the_native_uuid_user_id(pg_session):
+    columns = {column["name"]: column["type"] for column in inspect(pg_session.get_bind()).get_columns("purchase")}
+    assert isinstance(columns["user_id"], postgresql.UUID)
+
+
+def test_create_views_keeps_refresh_time_of_existing_views_on_postgresql(pg_session):
+    engine = pg_session.get_bind()
+    hours_ago = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    try:
+        create_views(engine)
+        with engine.begin() as conn:
+            conn.execute(update(analytics_refresh).values(refreshed_at=hours_ago))
+
+        create_views(engine)  # a restart: the views already exist
+
+        with engine.connect() as conn:
+            assert views_refreshed_at(conn) == hours_ago
+    finally:
+        with engine.begin() as conn:
+            for view in (user_purchase_counts_view, product_sales_view):
+                conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {view.name}"))
+
+
+def _check_analytics_summary(session, products):
+    other = UUID("33333333-3333-3333-3333-333333333333")
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for store, user, items in [
+        ("S1", BUYER_ONE, products[:2]),
+        ("S1", BUYER_ONE, products[:1]),
+        ("S2", BUYER_ONE, products[1:2]),
+        ("S2", BUYER_TWO, products[1:3]),
+        ("S2", other, products[2:3]),
+    ]:
+        cashier_service.create_purchase(session, now, store, user, [str(p.id) for p in items], 1)
+
+    engine = session.get_bind()
+    statements = _record_statements(engine)
+    stmt = analytics_summary_statement(engine.dialect.name, min_purchases=2, top_limit=1, by_supermarket=True)
+    summary = fold_analytics_summary(session.execute(stmt))
+
+    assert len(statements) == 1
+    assert summary["unique_buyers"] == 3
+    assert summary["loyal_buyers"] == [{"user_id": str(BUYER_ONE), "purchase_count": 3}]
+    assert summary["top_products"] == [{"name": products[1].name, "times_sold": 3}]
+
+    store_one, store_two = summary["by_supermarket"]["S1"], summary["by_supermarket"]["S2"]
+    assert (store_one["unique_buyers"], store_two["unique_buyers"]) == (1, 3)
+    assert store_one["loyal_buyers"] == [{"user_id": str(BUYER_ONE), "purchase_count": 2}]
+    assert store_two["loyal_buyers"] == []
+    assert store_one["top_products"] == [{"name": products[0].name, "times_sold": 2}]
+    assert {p["name"] for p in store_two["top_products"]} == {products[1].name, products[2].name}
+    return statements
+
+
+def test_loyal_buyers_keyset_pages_match_full_order(session, products):
+    buyers = [UUID(f"{n:x}" * 32) for n in range(10, 16)]
+    for index, buyer in enumerate(buyers):
+        for _ in range(index % 3 + 1):
+            _buy(session, buyer, products[0])
+    create_views(session.get_bind())
+
+    for counts in (user_purchase_counts_query().subquery(), user_purchase_counts_view):
+        expected = [tuple(row) for row in session.execute(loyal_buyers_page_statement(counts, 2))]
+        pages, after = [], None
+        while True:
+            page = session.execute(loyal_buyers_page_statement(counts, 2, limit=2, after=after)).all()
+            if not page:
+                break
+            pages.extend(tuple(row) for row in page)
+            after = (page[-1].purchase_count, str(page[-1].user_id))
+
+        assert [count for _, count in expected] == [3, 3, 2, 2]
+        assert pages == expected
+
+
+def test_analytics_summary_caps_loyal_page(session, products):
+    for buyer in (BUYER_ONE, BUYER_TWO):
+        _buy(session, buyer, products[0])
+        _buy(session, buyer, products[1])
+
+    stmt = analytics_summary_statement(session.get_bind().dialect.name, 2, 3, by_supermarket=True, loyal_limit=1)
+    summary = fold_analytics_summary(session.execute(stmt))
+
+    assert summary["loyal_buyers_count"] == 2
+    assert summary["loyal_buyers"] == [{"user_id": str(BUYER_ONE), "purchase_count": 2}]
+    assert summary["by_supermarket"]["S1"]["loyal_buyers_count"] == 2
+    assert len(summary["by_supermarket"]["S1"]["loyal_buyers"]) == 1
@@ -0,0 +1,107 @@
+from datetime import date, datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import insert, select
+
+from api.services import cashier_service
+from database.models import customer_segment, purchase_archive_summary, segment_run
+from database.segments import (
+    quintile_scores,
+    run_segmentation,
+    segment_for,
+    shard_bounds,
+)
+
+AS_OF = datetime(2024, 6, 1, tzinfo=timezone.utc)
+CUSTOMERS = [f"{c * 8}-{c * 4}-4{c * 3}-8{c * 3}-{c * 12}" for c in "abcdef"]
+
+
+def _buy(session, products, customer, days_ago, count=1, product=0):
+    for _ in range(count):
+        cashier_service.create_purchase(
+            session, AS_OF - timedelta(days=days_ago), "S1", customer, [str(products[product].id)], 1
+        )
+
+
+def _segments(session):
+    rows = session.execute(select(customer_segment)).all()
+    return {str(row.user_id): row for row in rows}
+
+
+def test_quintile_scores_and_segment_rules():
+    scores = quintile_scores({f"u{v:02d}": v for v in range(1, 11)})
+    assert [scores[f"u{v:02d}"] for v in range(1, 11)] == [1, 1, 2, 2, 3, 3, 4, 4, 5, 5]
+    assert quintile_scores({}) == {}
+
+    assert segment_for(5, 5, 5) == "champions"
+    assert segment_for(3, 4, 1) == "loyal"
+    assert segment_for(5, 1, 1) == "new"
+    assert segment_for(3, 3, 3) == "promising"
+    assert segment_for(1, 4, 4) == "at_risk"
+    assert segment_for(1, 1, 5) == "hibernating"
+
+
+def test_quintile_scores_spread_a_skewed_tied_population():
+    counts = [1] * 70 + [2] * 15 + [3] * 10 + [8] * 5
+    scores = quintile_scores({f"u{i:03d}": count for i, count in enumerate(counts)})
+
+    by_score = {score: sorted(counts[int(user[1:])] for user, s in scores.items() if s == score) for score in range(1, 6)}
+    assert all(len(members) == 20 for members in by_score.values())
+    # Single purchasers fill the bottom three fifths; the heaviest buyers are all in the top one.
+    assert by_score[1] == by_score[2] == by_score[3] == [1] * 20
+    assert by_score[5] == [2] * 5 + [3] * 10 + [8] * 5
+    assert max(counts[int(user[1:])] for user, s in scores.items() if s < 5) == 2
+
+
+def test_shards_cover_the_uuid_space_without_overlap():
+    bounds = shard_bounds(4)
+    assert bounds[0][0] is None and bounds[-1][1] is None
+    assert all(upper == lower for (_, upper), (lower, _) in zip(bounds, bounds[1:]))
+
+
+def test_full_run_scores_every_customer(session, products):
+    recent_regular, lapsed_regular, newcomer = CUSTOMERS[:3]
+    _buy(session, products, recent_regular, 1, count=7, product=4)
+    _buy(session, products, lapsed_regular, 200, count=6, product=4)
+    _buy(session, products, newcomer, 2)
+    _buy(session, products, CUSTOMERS[3], 90, count=2)
+    _buy(session, products, CUSTOMERS[4], 150)
+    # Archived purchases count towards frequency and spend.
+    session.execute(insert(purchase_archive_summary).values(
+        month=date(2023, 1, 1), supermarket_id="S1", user_id=UUID(CUSTOMERS[5]), purchase_count=9, total_amount=90.0,
+    ))
+    session.commit()
+
+    summary = run_segmentation(session.get_bind(), as_of=AS_OF)
+
+    assert summary["mode"] == "full" and summary["customers_scored"] == 6
+    segments = _segments(session)
+    assert segments[recent_regular].segment == "champions"
+    assert segments[lapsed_regular].segment == "at_risk"
+    assert segments[newcomer].segment == "new"
+    archived = segments[CUSTOMERS[5]]
+    assert archived.frequency == 9 and archived.monetary == 90.0
+    assert archived.last_purchase_at.replace(tzinfo=timezone.utc) == datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+
+def test_incremental_run_rescores_only_customers_with_new_purchases(session, products):
+    for days_ago, customer in enumerate(CUSTOMERS):
+        _buy(session, products, customer, 100 + days_ago * 10)
+    run_segmentation(session.get_bind(), as_of=AS_OF)
+    before = _segments(session)
+
+    _buy(session, products, CUSTOMERS[0], 0, count=5, product=4)
+    summary = run_segmentation(session.get_bind(), incremental=True, as_of=AS_OF + timedelta(days=1))
+
+    assert summary["mode"] == "incremental" and summary["customers_scored"] == 1
+    after = _segments(session)
+    assert after[CUSTOMERS[0]].frequency == 6
+    assert after[CUSTOMERS[0]].segment == "champions"
+    assert all(after[c].scored_at == before[c].scored_at for c in CUSTOMERS[1:])
+
+    runs = session.execute(select(segment_run.c.mode, segment_run.c.max_purchase_id).order_by(segment_run.c.id)).all()
+    assert [mode for mode, _ in runs] == ["full", "incremental"]
+    assert runs[-1].max_purchase_id == len(CUSTOMERS) + 5
+
+    # Nothing new since the last run: nothing to rescore.
+    assert run_segmentation(session.get_bind(), incremental=True, as_of=AS_OF)["customers_scored"] == 0
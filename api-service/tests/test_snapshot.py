@@ -0,0 +1,43 @@
+from icash_common.snapshot import SnapshotEntry, SnapshotFile
+
+
+def test_round_trip_and_merge_across_writers(tmp_path):
+    path = str(tmp_path / "warm.snapshot")
+    first, second = SnapshotFile(path), SnapshotFile(path)
+
+    first.update({"catalog": SnapshotEntry("v1", {"identity": b'{"a":1}', "gzip": b"\x1f\x8b"}, {"etag": "e1"})})
+    second.update({"analytics": SnapshotEntry("v7", {"identity": b"[]"}, {"etag": "e2"})})
+
+    reader = SnapshotFile(path)
+    assert reader.reload() == 2
+    catalog = reader.get("catalog")
+    assert catalog.version == "v1"
+    assert catalog.blobs == {"identity": b'{"a":1}', "gzip": b"\x1f\x8b"}
+    assert catalog.meta == {"etag": "e1"}
+    assert catalog.written_at > 0
+    assert reader.get("analytics").blobs == {"identity": b"[]"}
+    assert reader.get("missing") is None
+
+
+def test_reader_picks_up_a_replaced_file(tmp_path):
+    path = str(tmp_path / "warm.snapshot")
+    writer = SnapshotFile(path)
+    reader = SnapshotFile(path, check_interval=0)
+    writer.update({"catalog": SnapshotEntry("v1", {"identity": b"old"})})
+    assert reader.get("catalog").blobs["identity"] == b"old"
+
+    writer.update({"catalog": SnapshotEntry("v2", {"identity": b"new body"})})
+
+    assert reader.get("catalog").version == "v2"
+    assert reader.get("catalog").blobs["identity"] == b"new body"
+
+
+def test_missing_or_foreign_file_is_empty(tmp_path):
+    path = tmp_path / "warm.snapshot"
+    assert SnapshotFile(str(path)).reload() == 0
+
+    path.write_bytes(b"not a snapshot")
+    snapshot = SnapshotFile(str(path))
+    assert snapshot.reload() == 0
+    snapshot.update({"catalog": SnapshotEntry("v1", {"identity": b"x"})})
+    assert snapshot.get("catalog").version == "v1"
@@ -0,0 +1,60 @@
+import json
+
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+from icash_common import trace_report
+from icash_common.tracing import init_tracing, instrument_engine, record_upstream, span
+
+
+def _app(tmp_path):
+    app = Flask(__name__)
+    app.config["TRACE_LOG"] = str(tmp_path / "traces.jsonl")
+    init_tracing(app, "test")
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+
+    @app.route("/work")
+    def work():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        with span("render"):
+            record_upstream('sql;dur=2.5;desc="x1", total;dur=4.0')
+        return "ok"
+
+    return app
+
+
+def test_server_timing_and_request_id_propagation(tmp_path):
+    client = _app(tmp_path).test_client()
+
+    response = client.get("/work", headers={"X-Request-ID": "till-42"})
+    generated = client.get("/work", headers={"X-Request-ID": "bad id\twith spaces"})
+
+    assert response.headers["X-Request-ID"] == "till-42"
+    assert generated.headers["X-Request-ID"] != "bad id\twith spaces"
+    timing = response.headers["Server-Timing"]
+    assert 'sql;dur=' in timing and 'desc="x2"' in timing
+    assert "upstream-sql;dur=2.50" in timing and "upstream-total;dur=4.00" in timing
+    assert timing.split(", ")[-1].startswith("total;dur=")
+
+    records = [json.loads(line) for line in (tmp_path / "traces.jsonl").read_text().splitlines()]
+    assert [r["request_id"] for r in records][0] == "till-42"
+    assert records[0]["endpoint"] == "/work" and records[0]["spans"]["sql"]["count"] == 2
+
+
+def test_trace_report_percentiles_fill_missing_stages():
+    records = [
+        {"service": "api", "endpoint": "/a", "total_ms": float(n), "spans": {"sql": {"ms": float(n), "count": 1}}}
+        for n in range(1, 101)
+    ]
+    records.append({"service": "api", "endpoint": "/a", "total_ms": 0.5, "spans": {}})
+
+    summary = trace_report.summarize(records, endpoint="/a")
+
+    assert summary[("api", "total")]["count"] == 101
+    assert summary[("api", "sql")]["p50"] == 50.0
+    assert summary[("api", "sql")]["p99"] == 99.0
+    assert summary[("api", "sql")]["max"] == 100.0
+    assert trace_report.summarize(records, endpoint="/b") == {}
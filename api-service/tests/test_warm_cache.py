@@ -0,0 +1,94 @@
+import os
+import threading
+
+import pytest
+
+from icash_common.snapshot import SnapshotEntry, SnapshotFile
+
+
+@pytest.fixture()
+def warm(api_app, tmp_path):
+    """The app's warm cache on a snapshot file that a previous worker generation wrote `catalog` v1 to."""
+    from api.extensions import warm_cache
+
+    path = str(tmp_path / "warm.snapshot")
+    SnapshotFile(path).update({"catalog": SnapshotEntry("v1", {"identity": b'{"from":"snapshot"}'}, {"etag": "e1"})})
+    api_app.config.update(WARM_CACHE_PATH=path, WARM_CACHE_FLUSH_INTERVAL=0)
+    warm_cache.init_app(api_app)
+    with api_app.app_context():
+        yield warm_cache
+
+
+def _build(data, calls, release=None):
+    def build():
+        calls.append(data)
+        if release is not None:
+            release.wait(5)
+        return data
+    return build
+
+
+def _wait_for_refresh(warm, count=1):
+    for _ in range(500):
+        if warm.background_refreshes >= count and not warm._refreshing:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("background refresh did not finish")
+
+
+def test_fresh_snapshot_entry_is_served_without_building(warm):
+    from api.payloads import cached_payload
+
+    calls = []
+    payload = cached_payload("catalog", "v1", _build({"built": True}, calls))
+
+    assert payload.body == b'{"from":"snapshot"}' and payload.etag == "e1"
+    assert calls == [] and warm.snapshot_hits == 1
+    # Now in the worker's own cache: no second snapshot read.
+    assert cached_payload("catalog", "v1", _build({"built": True}, calls)) == payload
+    assert warm.snapshot_hits == 1
+
+
+def test_stale_entry_is_served_while_one_background_refresh_builds(warm):
+    from api.payloads import cached_payload
+
+    calls, release = [], threading.Event()
+    build = _build({"version": 2}, calls, release)
+
+    first = cached_payload("catalog", "v2", build)
+    second = cached_payload("catalog", "v2", build)
+    release.set()
+    _wait_for_refresh(warm)
+
+    assert first.body == second.body == b'{"from":"snapshot"}'
+    assert warm.stale_served == 2
+    assert calls == [{"version": 2}]
+    assert cached_payload("catalog", "v2", build).body == b'{"version":2}'
+    assert calls == [{"version": 2}]
+
+
+def test_entry_older_than_the_stale_limit_is_rebuilt_inline(warm):
+    from api.payloads import cached_payload
+
+    warm.max_stale = 0.0
+    calls = []
+
+    payload = cached_payload("catalog", "v2", _build({"version": 2}, calls))
+
+    assert payload.body == b'{"version":2}'
+    assert calls == [{"version": 2}] and warm.stale_served == 0
+
+
+def test_forked_worker_starts_without_warm_keys(warm):
+    from api.payloads import cached_payload
+
+    cached_payload("other", "v1", _build([], []))
+    assert warm.lookup("catalog", "v1")[1] is True
+    warm._warm.add("catalog")  # as if this process had built it itself
+    assert warm.lookup("catalog", "v1") == (None, False)
+
+    # A child forked from this process inherits the set, but has built nothing.
+    warm._warm_pid = os.getpid() + 1
+    entry, fresh = warm.lookup("catalog", "v1")
+    assert fresh and entry.version == "v1"
+    assert warm.stats()["warm_keys"] == []
@@ -1,6 +1,9 @@
 from flask import Flask
 
 from icash_common import setup_logging, register_frontend
+from icash_common.tracing import init_tracing
+
+from app.forwarder import forwarder
 
 
 def create_app():
@@ -15,4 +18,7 @@ def create_app():
     # Load base config
     app.config.from_object("app.config.Config")
     register_frontend(app)
+    init_tracing(app, "cashier")
+    if app.config["OUTBOX_ENABLED"]:
+        forwarder.init_app(app)
     return app
@@ -10,6 +10,14 @@ class Config:
     CREATE_PURCHASE_URL = os.getenv(
         "CREATE_PURCHASE_URL", "http://127.0.0.1:8001/cashier/create_purchase"
     )
+    # Store-and-forward: sales are queued on disk and sent in batches.
+    OUTBOX_ENABLED = os.getenv("OUTBOX_ENABLED", "true").lower() == "true"
+    OUTBOX_PATH = os.getenv("OUTBOX_PATH", "data/outbox.sqlite3")
+    CREATE_PURCHASES_URL = os.getenv(
+        "CREATE_PURCHASES_URL", "http://127.0.0.1:8001/cashier/create_purchases"
+    )
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 50))
+    OUTBOX_MAX_BACKOFF = float(os.getenv("OUTBOX_MAX_BACKOFF", 60))  # seconds
     MESSAGES = {
         STATUS_SUCCESS: "Purchase created successfully!",
         STATUS_ERROR: "Failed to create purchase",
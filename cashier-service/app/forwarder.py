@@ -0,0 +1,124 @@
+"""Store-and-forward of sales to the API.
+
+make_purchase only appends the sale to the on-disk outbox, so the clerk gets
+an answer even while the API is slow or down. A daemon thread per worker
+drains the outbox to the API's batch endpoint, backing off exponentially
+while deliveries fail. A batch whose response is lost in transit (e.g. one
+committed after our timeout) is sent again; every sale carries an
+idempotency key fixed when it was queued, so the API stores it only once.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import requests
+from requests import RequestException
+
+from icash_common.outbox import Outbox
+
+log = logging.getLogger(__name__)
+
+
+class PurchaseForwarder:
+    def __init__(self):
+        self.outbox = None
+        self.url = None
+        self.batch_size = 50
+        self.max_backoff = 60.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_delivery_at = None
+
+    def init_app(self, app) -> None:
+        self.outbox = Outbox(app.config["OUTBOX_PATH"])
+        self.url = app.config["CREATE_PURCHASES_URL"]
+        self.batch_size = int(app.config["OUTBOX_BATCH_SIZE"])
+        self.max_backoff = float(app.config["OUTBOX_MAX_BACKOFF"])
+        # Start now so a backlog left by a restart drains without waiting for
+        # traffic; the request hook restarts it in a process forked afterwards.
+        self.ensure_running()
+        app.before_request(self.ensure_running)
+
+    def ensure_running(self) -> None:
+        # pid-aware so each forked gunicorn worker runs its own thread.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="purchase-forwarder", daemon=True)
+            self._thread.start()
+
+    def submit(self, purchase: dict) -> int:
+        """Persist one sale for delivery, stamped with the time of sale and its key; returns its outbox id."""
+        row_id = self.outbox.enqueue({
+            **purchase,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "idempotency_key": uuid.uuid4().hex,
+        })
+        self._wakeup.set()
+        return row_id
+
+    def status(self) -> dict:
+        return {
+            **self.outbox.stats(),
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "last_delivery_at": self.last_delivery_at,
+        }
+
+    def _run(self) -> None:
+        while True:
+            try:
+                delivered = self.forward_once()
+            except Exception:
+                log.exception("Purchase forwarder crashed; continuing")
+                delivered = 0
+            if self.consecutive_failures:
+                delay = min(2 ** self.consecutive_failures * 0.5, self.max_backoff)
+                time.sleep(delay)
+            elif not delivered:
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+
+    def forward_once(self) -> int:
+        """Send one batch; returns how many sales the API accepted."""
+        batch = self.outbox.claim(self.batch_size)
+        if not batch:
+            return 0
+        ids = [row_id for row_id, _ in batch]
+        try:
+            response = requests.post(
+                self.url, json={"purchases": [purchase for _, purchase in batch]}, timeout=10
+            )
+            response.raise_for_status()
+        except RequestException as exc:
+            self.consecutive_failures += 1
+            self.last_error = str(exc)
+            delay = min(2 ** self.consecutive_failures * 0.5, self.max_backoff)
+            self.outbox.retry(ids, delay, self.last_error)
+            log.warning("Forwarding %d purchases failed (%s); retrying in %.1fs", len(ids), exc, delay)
+            return 0
+
+        rejected = {ids[item["index"]]: item["error"] for item in response.json().get("rejected", [])}
+        self.outbox.dead_letter(rejected)
+        self.outbox.ack([row_id for row_id in ids if row_id not in rejected])
+        for row_id, error in rejected.items():
+            log.error("Purchase %s rejected by the API: %s", row_id, error)
+        self.consecutive_failures = 0
+        self.last_delivery_at = time.time()
+        return len(ids) - len(rejected)
+
+
+forwarder = PurchaseForwarder()
+
+__all__ = ["PurchaseForwarder", "forwarder"]
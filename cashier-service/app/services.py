@@ -2,46 +2,72 @@ import logging
 from typing import Dict, List
 from uuid import uuid4
 
-import requests
 from flask import current_app
 from requests import RequestException
 
+from icash_common.tracing import traced_request
+
 log = logging.getLogger(__name__)
 
+CATALOG_PARTS = ("products", "supermarkets", "users")
+
+# Last fetched {version, etag, data} of each catalog part, shared by this process's threads.
+_catalog_parts: Dict[str, dict] = {}
+
+
 def fetch_catalog() -> Dict[str, List]:
+    """The catalog, refetching only the parts whose version moved since the last call."""
     url = current_app.config.get("CATALOG_URL")
-    log.info("Fetching catalog from %s", url)
     try:
-        response = requests.get(url, timeout=60)
+        response = traced_request("GET", f"{url}/versions", timeout=60)
         response.raise_for_status()
-        payload = response.json()
-        log.info("Catalog fetched successfully with %d products", len(payload.get("products", [])))
-        return {
-            "products": payload["products"],
-            "supermarkets": payload["supermarkets"],
-            "users": payload["users"],
-        }
+        versions = response.json()
+        for part in CATALOG_PARTS:
+            cached = _catalog_parts.get(part)
+            if cached is None or cached["version"] != versions[part]:
+                _catalog_parts[part] = _fetch_catalog_part(url, part, cached)
     except RequestException as e:
         log.exception("Catalog service failed in use: %s", e)
         raise e
+    return {part: _catalog_parts[part]["data"] for part in CATALOG_PARTS}
 
-def create_purchase(
+
+def _fetch_catalog_part(url: str, part: str, cached: dict | None) -> dict:
+    # A new version does not always mean new content (a repeat customer moves
+    # the users version), so revalidate with the ETag we hold.
+    headers = {"If-None-Match": cached["etag"]} if cached else {}
+    log.info("Fetching catalog %s from %s", part, url)
+    response = traced_request("GET", f"{url}/{part}", headers=headers, timeout=60)
+    response.raise_for_status()
+    version = response.headers.get("X-Catalog-Version")
+    if response.status_code == 304:
+        return {**cached, "version": version}
+    data = response.json()
+    log.info("Catalog %s fetched: %d entries", part, len(data))
+    return {"version": version, "etag": response.headers.get("ETag"), "data": data}
+
+def build_purchase(
         is_new_user: bool,
         user_id: str|None,
         supermarket_id: str,
         item_list: list,
         total_amount: float
 ) -> dict:
+    """The API's create_purchase body."""
+    return {
+        "supermarket_id": supermarket_id,
+        "user_id": user_id if not is_new_user and user_id else str(uuid4()),
+        "items_list": item_list,
+        "total_amount": total_amount,
+    }
+
+def create_purchase(payload: dict) -> None:
+    """Send one purchase to the API synchronously (OUTBOX_ENABLED=false)."""
+    user_id = payload["user_id"]
     try:
-        payload = {
-            "supermarket_id": supermarket_id,
-            "user_id": user_id if not is_new_user and user_id else str(uuid4()),
-            "items_list": item_list,
-            "total_amount": total_amount,
-        }
         url = current_app.config.get("CREATE_PURCHASE_URL")
         log.info("Creating purchase to %s", url)
-        response = requests.post(url, json=payload, timeout=60)
+        response = traced_request("POST", url, json=payload, timeout=60)
         response.raise_for_status()
         log.info("purchase created successfully, user_id: %s", user_id)
     except RequestException as e:
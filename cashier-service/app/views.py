@@ -1,9 +1,11 @@
-from flask import render_template, request, redirect, url_for
+from flask import current_app, jsonify, render_template, request, redirect, url_for
 from requests import RequestException
 from werkzeug.exceptions import BadRequestKeyError
 
 from app.config import STATUS_SUCCESS, STATUS_ERROR, Config
-from app.services import create_purchase, fetch_catalog
+from app.forwarder import forwarder
+from app.services import build_purchase, create_purchase, fetch_catalog
+from icash_common.tracing import span
 
 
 def render_index(error=None, success=None, catalog=None):
@@ -30,7 +32,8 @@ def render_index(error=None, success=None, catalog=None):
     if error:
         context["error"] = error
 
-    return render_template("index.html", **context)
+    with span("render"):
+        return render_template("index.html", **context)
 
 
 def register_routes(app):
@@ -57,10 +60,21 @@ def register_routes(app):
             user_id = request.form["user_id"]
             item_list = list(request.form["item_list"])
             total_amount = float(request.form["total_amount"])
-            create_purchase(is_new_user, user_id, supermarket_id, item_list, total_amount)
+            purchase = build_purchase(is_new_user, user_id, supermarket_id, item_list, total_amount)
+            if current_app.config["OUTBOX_ENABLED"]:
+                forwarder.submit(purchase)
+            else:
+                create_purchase(purchase)
             status_key = STATUS_SUCCESS
         except (ValueError, TypeError, BadRequestKeyError):
             status_key = STATUS_ERROR
         except RequestException:
             status_key = STATUS_ERROR
         return redirect(url_for("index", status=status_key))
+
+    @app.route("/outbox/status", methods=["GET"])
+    def outbox_status():
+        """Pending sales, age of the oldest one and forward throughput."""
+        if not current_app.config["OUTBOX_ENABLED"]:
+            return jsonify({"enabled": False})
+        return jsonify({"enabled": True, **forwarder.status()})
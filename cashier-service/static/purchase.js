@@ -0,0 +1,17 @@
+(() => {
+  const checks = document.querySelectorAll('.item-check');
+  const totalEl = document.getElementById('live-total-value');
+  const totalInput = document.getElementById('total_amount');
+
+  const update = () => {
+    let total = 0;
+    checks.forEach(cb => {
+      if (cb.checked) total += parseFloat(cb.dataset.price);
+    });
+    const formatted = total.toFixed(2);
+    totalEl.textContent = formatted;
+    totalInput.value = formatted;
+  };
+  checks.forEach(cb => cb.addEventListener('change', update));
+  update();
+})();
@@ -1,4 +1,4 @@
-from .logging_config import setup_logging
+from .logging_config import logging_stats, setup_logging
 from .frontend import register_frontend, frontend_bp
 
-__all__ = ["setup_logging", "register_frontend", "frontend_bp"]
+__all__ = ["setup_logging", "logging_stats", "register_frontend", "frontend_bp"]
@@ -0,0 +1,177 @@
+"""Per-worker admission control: bounded concurrency per request class.
+
+Each class ("write", "analytics", ...) has its own budget: how many of its
+requests may run at once, how many may wait for a slot, and for how long.
+All classes also share one overall capacity, normally the worker's
+database connections. When a slot frees up, waiting requests of a
+higher-priority class (lower number) get it first. A request that finds its
+class's queue full, or waits longer than allowed, is rejected at once with
+503 and Retry-After, instead of tying up a thread behind the backlog.
+
+    admission.configure(capacity=6, budgets={
+        "write": {"limit": 6, "max_queue": 4, "max_wait": 5.0, "priority": 0},
+        "analytics": {"limit": 2, "max_queue": 1, "max_wait": 1.0, "priority": 1},
+    })
+
+    @admission.limit("write")
+    def create_purchase_route(): ...
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import jsonify
+
+from .tracing import span
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, budget: str, reason: str, retry_after: int):
+        super().__init__(f"{budget} requests over capacity ({reason})")
+        self.budget = budget
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Budget:
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float, priority: int):
+        self.name = name
+        self.limit = max(int(limit), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self.max_wait = float(max_wait)
+        self.priority = int(priority)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.wait_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "max_wait": self.max_wait,
+            "priority": self.priority,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_seconds_total": round(self.wait_seconds, 6),
+        }
+
+
+class AdmissionController:
+    def __init__(self):
+        self.enabled = False
+        self.capacity = 1
+        self.retry_after = 1
+        self.active = 0
+        self._budgets: dict[str, _Budget] = {}
+        self._cond = threading.Condition()
+
+    def init_app(self, app) -> None:
+        """Configure from the ADMISSION_* settings and answer rejections with 503."""
+        self.configure(
+            capacity=app.config["ADMISSION_CAPACITY"],
+            budgets=app.config["ADMISSION_BUDGETS"],
+            retry_after=app.config["ADMISSION_RETRY_AFTER"],
+            enabled=app.config["ADMISSION_ENABLED"],
+        )
+        app.register_error_handler(AdmissionRejected, rejected_response)
+
+    def configure(self, capacity: int, budgets: dict[str, dict], retry_after: int = 1, enabled: bool = True) -> None:
+        with self._cond:
+            self.enabled = enabled
+            self.capacity = max(int(capacity), 1)
+            self.retry_after = max(int(retry_after), 1)
+            self._budgets = {name: _Budget(name, **settings) for name, settings in budgets.items()}
+
+    def _admissible(self, budget: _Budget) -> bool:
+        if budget.active >= budget.limit or self.active >= self.capacity:
+            return False
+        # A free slot goes to a waiting higher-priority class that could use it.
+        return not any(
+            other.priority < budget.priority and other.waiting and other.active < other.limit
+            for other in self._budgets.values()
+        )
+
+    def acquire(self, name: str) -> None:
+        """Take a slot of budget `name`, waiting if allowed; raises AdmissionRejected."""
+        if not self.enabled:
+            return
+        with self._cond:
+            budget = self._budgets[name]
+            if not self._admissible(budget):
+                if budget.waiting >= budget.max_queue:
+                    budget.rejected_queue_full += 1
+                    raise AdmissionRejected(name, "queue full", self.retry_after)
+                budget.waiting += 1
+                budget.queued += 1
+                started = time.monotonic()
+                deadline = started + budget.max_wait
+                try:
+                    while not self._admissible(budget):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            budget.rejected_timeout += 1
+                            raise AdmissionRejected(name, "wait timeout", self.retry_after)
+                        self._cond.wait(remaining)
+                finally:
+                    budget.waiting -= 1
+                    budget.wait_seconds += time.monotonic() - started
+                    # Lower-priority waiters may have been holding back for us.
+                    self._cond.notify_all()
+            budget.active += 1
+            budget.admitted += 1
+            self.active += 1
+
+    def release(self, name: str) -> None:
+        if not self.enabled:
+            return
+        with self._cond:
+            self._budgets[name].active -= 1
+            self.active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, name: str):
+        with span("admission"):  # time spent queued shows up in Server-Timing
+            self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def limit(self, name: str):
+        """Decorator running a view inside a slot of budget `name`."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                with self.slot(name):
+                    return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "capacity": self.capacity,
+                "active": self.active,
+                "budgets": {name: budget.stats() for name, budget in self._budgets.items()},
+            }
+
+
+def rejected_response(exc: AdmissionRejected):
+    response = jsonify({"error": str(exc), "budget": exc.budget, "reason": exc.reason})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(exc.retry_after)
+    return response
+
+
+__all__ = ["AdmissionController", "AdmissionRejected", "rejected_response"]
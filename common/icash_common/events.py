@@ -0,0 +1,98 @@
+"""In-process fan-out of server-sent events (SSE) to many slow readers.
+
+Used by the API to publish analytics deltas and by the dashboard to relay
+them to browsers. Each subscriber gets a bounded queue; a subscriber that
+falls behind is marked lagged instead of blocking the publisher, and its
+stream ends with a `resync` event so the client reloads a full snapshot.
+"""
+import queue
+import threading
+from typing import Iterable, Iterator
+
+
+class Subscriber:
+    def __init__(self, maxsize: int):
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.lagged = False
+
+
+class EventFanout:
+    """Thread-safe publish/subscribe of already-encoded (event, data) pairs."""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers: set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: str) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait((event, data))
+            except queue.Full:
+                subscriber.lagged = True
+                self.dropped += 1
+
+
+def format_sse(event: str, data: str) -> bytes:
+    lines = [f"event: {event}", *(f"data: {line}" for line in data.splitlines() or [""])]
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+def sse_stream(fanout: EventFanout, subscriber: Subscriber, heartbeat: float = 15.0) -> Iterator[bytes]:
+    """Encode `subscriber`'s events as SSE, with comment heartbeats while idle.
+
+    Unsubscribes when the client disconnects (the generator is closed).
+    """
+    try:
+        yield b"retry: 3000\n\n"
+        while not subscriber.lagged:
+            try:
+                event, data = subscriber.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield b": heartbeat\n\n"
+                continue
+            yield format_sse(event, data)
+        yield format_sse("resync", "{}")
+    finally:
+        fanout.unsubscribe(subscriber)
+
+
+def parse_sse(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """Decode an SSE line stream into (event, data) pairs; comments are skipped."""
+    event, data = "message", []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue
+        else:
+            name, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if name == "event":
+                event = value
+            elif name == "data":
+                data.append(value)
+
+
+__all__ = ["EventFanout", "Subscriber", "format_sse", "sse_stream", "parse_sse"]
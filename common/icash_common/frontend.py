@@ -1,5 +1,18 @@
-"""Shared frontend assets (templates + static) for iCash services."""
-from flask import Blueprint
+"""Shared frontend assets (templates + static) for iCash services.
+
+Static files are fingerprinted at startup: `asset_url("icash_common.static",
+"styles.css")` renders `/common-static/styles.<hash>.css`. Fingerprinted
+URLs change whenever the content does, so they are served from memory with
+a year-long immutable Cache-Control, plus a gzip variant when the client
+accepts it. A request for the plain file name still works and revalidates
+as usual.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Blueprint, Response, current_app, request, url_for
 
 frontend_bp = Blueprint(
     "icash_common",
@@ -9,10 +22,90 @@ frontend_bp = Blueprint(
     static_url_path="/common-static",
 )
 
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Types worth compressing, and the size below which gzip rarely pays off.
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+_MIN_GZIP_BYTES = 512
+
+
+class _Asset:
+    __slots__ = ("body", "gzipped", "mimetype", "etag")
+
+    def __init__(self, body: bytes, mimetype: str, etag: str):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.gzipped = None
+        if mimetype.startswith(_COMPRESSIBLE) and len(body) >= _MIN_GZIP_BYTES:
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.gzipped = compressed
+
+
+class StaticManifest:
+    """Content hashes of every file under one static folder, read once."""
+
+    def __init__(self, folder: str | None):
+        self.names: dict[str, str] = {}        # "styles.css" -> "styles.1a2b3c4d5e6f.css"
+        self.assets: dict[str, _Asset] = {}    # fingerprinted name -> contents
+        if not folder or not os.path.isdir(folder):
+            return
+        for directory, _, files in os.walk(folder):
+            for file in files:
+                path = os.path.join(directory, file)
+                name = os.path.relpath(path, folder).replace(os.sep, "/")
+                with open(path, "rb") as handle:
+                    body = handle.read()
+                digest = hashlib.sha256(body).hexdigest()[:12]
+                stem, ext = os.path.splitext(name)
+                fingerprinted = f"{stem}.{digest}{ext}"
+                mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                self.names[name] = fingerprinted
+                self.assets[fingerprinted] = _Asset(body, mimetype, digest)
+
+    def fingerprinted(self, filename: str) -> str:
+        return self.names.get(filename, filename)
+
+    def response(self, filename: str) -> Response | None:
+        """The immutable response for a fingerprinted name, None for anything else."""
+        asset = self.assets.get(filename)
+        if asset is None:
+            return None
+        use_gzip = asset.gzipped is not None and bool(request.accept_encodings["gzip"])
+        response = Response(asset.gzipped if use_gzip else asset.body, mimetype=asset.mimetype)
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+        if asset.gzipped is not None:
+            response.vary.add("Accept-Encoding")
+        response.set_etag(f"{asset.etag}-gz" if use_gzip else asset.etag)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response.make_conditional(request)
+
+
+def _serve_fingerprinted(manifest: StaticManifest, fallback):
+    def static_view(filename):
+        return manifest.response(filename) or fallback(filename=filename)
+    return static_view
+
+
+def asset_url(endpoint: str, filename: str) -> str:
+    """`url_for(endpoint, filename=...)` pointing at the fingerprinted file."""
+    manifest = current_app.extensions.get("icash_assets", {}).get(endpoint)
+    return url_for(endpoint, filename=manifest.fingerprinted(filename) if manifest else filename)
+
 
 def register_frontend(app):
-    """Register the shared frontend blueprint on a Flask app."""
+    """Register the shared frontend blueprint and fingerprint its and the app's static files."""
     app.register_blueprint(frontend_bp)
+    folders = {f"{frontend_bp.name}.static": frontend_bp.static_folder}
+    if app.has_static_folder:
+        folders["static"] = app.static_folder
+    manifests = {}
+    for endpoint, folder in folders.items():
+        manifests[endpoint] = manifest = StaticManifest(folder)
+        app.view_functions[endpoint] = _serve_fingerprinted(manifest, app.view_functions[endpoint])
+    app.extensions["icash_assets"] = manifests
+    app.add_template_global(asset_url)
 
 
-__all__ = ["frontend_bp", "register_frontend"]
+__all__ = ["frontend_bp", "register_frontend", "asset_url", "StaticManifest"]
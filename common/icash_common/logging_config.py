@@ -1,27 +1,220 @@
 # api/logging_config.py
 from logging.config import dictConfig
+import atexit
+import json
+import logging
 import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else came in through `extra=`.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields are kept as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of INFO-and-below records from selected loggers.
+
+    `rates` maps logger names to the fraction to keep; the longest matching
+    name prefix wins. WARNING and above always pass.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> float:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        if random.random() < self._rate(record.name):
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Enqueue without blocking; records that do not fit are counted and dropped.
+
+    Only the message is interpolated on the calling thread; formatting and the
+    actual write happen on the listener thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class BoundedQueueListener(QueueListener):
+    """QueueListener whose stop() still works when the queue is full.
+
+    The stdlib enqueues its stop sentinel with put_nowait, which raises
+    queue.Full on a full bounded queue and leaves the thread running.
+    """
+
+    sentinel_timeout = 1.0
+
+    def enqueue_sentinel(self) -> None:
+        try:
+            # The listener is draining the queue, so room usually frees up quickly.
+            self.queue.put(self._sentinel, timeout=self.sentinel_timeout)
+        except queue.Full:
+            # Still full (the writes are stuck): drop the oldest records to make room.
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    self.queue.put_nowait(self._sentinel)
+                    return
+                except queue.Full:
+                    continue
+
+
+_lock = threading.Lock()
+_state: dict = {"mode": "sync", "handler": None, "listener": None, "sampler": None}
+
+
+def _parse_sampling(spec: str) -> dict[str, float]:
+    """"api.services.cashier_service=0.1,api.routes=0.5" -> {name: rate}."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+def _stop_listener() -> None:
+    listener = _state["listener"]
+    if listener is not None:
+        _state["listener"] = None
+        listener.stop()
+
+
+def _start_listener(target: logging.Handler, capacity: int) -> None:
+    handler = BoundedQueueHandler(queue.Queue(maxsize=capacity))
+    handler.addFilter(_state["sampler"])
+    listener = BoundedQueueListener(handler.queue, target, respect_handler_level=True)
+    listener.start()
+    root = logging.getLogger()
+    if _state["handler"] is not None:
+        root.removeHandler(_state["handler"])
+    root.addHandler(handler)
+    _state.update(handler=handler, listener=listener, target=target)
+
+
+def _restart_after_fork() -> None:
+    # The listener thread does not survive fork and the queue may hold a lock
+    # taken by it; give the child a fresh queue and thread.
+    global _lock
+    _lock = threading.Lock()
+    if _state["listener"] is None:
+        return
+    _state["listener"] = None
+    _start_listener(_state["target"], _state["handler"].queue.maxsize)
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(_stop_listener)
+
 
 def setup_logging() -> None:
-    """Configure application-wide logging to stdout"""
+    """Configure application-wide logging to stdout.
+
+    LOG_MODE=queue hands records to a background thread through a bounded
+    queue (LOG_QUEUE_SIZE) instead of writing on the calling thread.
+    LOG_FORMAT=json emits one JSON object per line. LOG_SAMPLING keeps only a
+    fraction of INFO records from hot-path loggers, e.g.
+    "api.services.cashier_service=0.1".
+    """
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
-    dictConfig({
-        'version': 1,
-        'disable_existing_loggers': False,  # <--- important
-        'formatters': {
-            'default': {
-                'format': '[%(asctime)s] %(levelname)s in %(module)s: %(message)s',
+    mode = os.getenv("LOG_MODE", "sync").lower()
+    log_format = os.getenv("LOG_FORMAT", "text").lower()
+    with _lock:
+        _stop_listener()
+        dictConfig({
+            'version': 1,
+            'disable_existing_loggers': False,  # <--- important
+            'formatters': {
+                'default': {
+                    'format': '[%(asctime)s] %(levelname)s in %(module)s: %(message)s',
+                },
+                'json': {
+                    '()': JsonFormatter,
+                },
+            },
+            'handlers': {
+                'wsgi': {
+                    'class': 'logging.StreamHandler',
+                    'stream': 'ext://flask.logging.wsgi_errors_stream',
+                    'formatter': 'json' if log_format == 'json' else 'default',
+                },
             },
-        },
-        'handlers': {
-            'wsgi': {
-                'class': 'logging.StreamHandler',
-                'stream': 'ext://flask.logging.wsgi_errors_stream',
-                'formatter': 'default',
+            'root': {
+                'level': log_level,
+                'handlers': ['wsgi'],
             },
-        },
-        'root': {
-            'level': log_level,
-            'handlers': ['wsgi'],
-        },
-    })
\ No newline at end of file
+        })
+        root = logging.getLogger()
+        stream_handler = root.handlers[0]
+        _state.update(mode=mode, handler=None, sampler=SamplingFilter(_parse_sampling(os.getenv("LOG_SAMPLING", ""))))
+        if mode == "queue":
+            root.removeHandler(stream_handler)
+            _start_listener(stream_handler, int(os.getenv("LOG_QUEUE_SIZE", 10000)))
+        else:
+            stream_handler.addFilter(_state["sampler"])
+
+
+def logging_stats() -> dict:
+    """Counters of the logging pipeline in this process."""
+    handler = _state["handler"]
+    stats = {"mode": _state["mode"], "sampled_out": _state["sampler"].sampled_out if _state["sampler"] else 0}
+    if handler is not None:
+        stats.update(
+            queued=handler.queue.qsize(),
+            capacity=handler.queue.maxsize,
+            enqueued=handler.enqueued,
+            dropped=handler.dropped,
+        )
+    return stats
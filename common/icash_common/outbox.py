@@ -0,0 +1,152 @@
+"""Durable on-disk queue of JSON messages, shared by the processes of one service.
+
+Backed by a SQLite file in WAL mode, so every gunicorn worker can enqueue
+and drain it. Consumers claim batches under a lease: a worker that dies
+mid-delivery leaves its batch to be claimed again once the lease expires.
+Delivery is therefore at-least-once.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    claimed_by TEXT,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_outbox_available_at ON outbox (available_at, id);
+CREATE TABLE IF NOT EXISTS outbox_dead (
+    id INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS outbox_delivery (
+    ts REAL NOT NULL,
+    delivered INTEGER NOT NULL
+);
+"""
+
+
+class Outbox:
+    def __init__(self, path: str, lease_seconds: float = 60.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.consumer_id = uuid.uuid4().hex
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and process; sqlite3 objects must not cross either.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front so concurrent claimers serialize.
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def enqueue(self, message: dict) -> int:
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO outbox (payload, created_at, available_at) VALUES (?, ?, ?)",
+            (json.dumps(message), now, now),
+        )
+        return cursor.lastrowid
+
+    def claim(self, limit: int) -> list[tuple[int, dict]]:
+        """Lease up to `limit` due messages, oldest first."""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, payload FROM outbox WHERE available_at <= ? ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET claimed_by = ?, available_at = ? WHERE id = ?",
+                [(self.consumer_id, now + self.lease_seconds, row_id) for row_id, _ in rows],
+            )
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def ack(self, ids: list[int]) -> None:
+        """Delivered: drop the messages and count them for throughput."""
+        if not ids:
+            return
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in ids])
+            conn.execute("INSERT INTO outbox_delivery (ts, delivered) VALUES (?, ?)", (now, len(ids)))
+            conn.execute("DELETE FROM outbox_delivery WHERE ts < ?", (now - 3600,))
+
+    def retry(self, ids: list[int], delay: float, error: str) -> None:
+        """Not delivered: make the messages due again after `delay` seconds."""
+        self._connect().executemany(
+            "UPDATE outbox SET attempts = attempts + 1, available_at = ?, claimed_by = NULL, last_error = ? "
+            "WHERE id = ?",
+            [(time.time() + delay, error, row_id) for row_id in ids],
+        )
+
+    def dead_letter(self, failures: dict[int, str]) -> None:
+        """Permanently rejected messages move aside so they stop blocking the queue."""
+        if not failures:
+            return
+        now = time.time()
+        with self._transaction() as conn:
+            for row_id, error in failures.items():
+                conn.execute(
+                    "INSERT OR REPLACE INTO outbox_dead (id, payload, created_at, failed_at, error) "
+                    "SELECT id, payload, created_at, ?, ? FROM outbox WHERE id = ?",
+                    (now, error, row_id),
+                )
+                conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+
+    def stats(self, window: float = 60.0) -> dict:
+        now = time.time()
+        conn = self._connect()
+        depth, oldest, in_flight, max_attempts = conn.execute(
+            "SELECT count(*), min(created_at), "
+            "coalesce(sum(claimed_by IS NOT NULL AND available_at > ?), 0), coalesce(max(attempts), 0) "
+            "FROM outbox",
+            (now,),
+        ).fetchone()
+        delivered = conn.execute(
+            "SELECT coalesce(sum(delivered), 0) FROM outbox_delivery WHERE ts >= ?", (now - window,)
+        ).fetchone()[0]
+        dead = conn.execute("SELECT count(*) FROM outbox_dead").fetchone()[0]
+        return {
+            "depth": depth,
+            "in_flight": in_flight,
+            "oldest_age_seconds": round(now - oldest, 3) if oldest is not None else None,
+            "max_attempts": max_attempts,
+            "dead_letters": dead,
+            "window_seconds": window,
+            "delivered_in_window": delivered,
+            "delivered_per_second": round(delivered / window, 3),
+        }
+
+
+__all__ = ["Outbox"]
@@ -0,0 +1,163 @@
+"""File of versioned binary blobs, shared by the processes of one service.
+
+Layout: MAGIC, an 8-byte big-endian index length, a JSON index, then the
+blobs back to back. The index maps each key to its version, a small `meta`
+dict and the (offset, length) of each named blob. Readers memory-map the
+file (falling back to a plain read where mmap is unavailable) and copy a
+blob out only when it is asked for. Writers build a complete new file and
+os.replace it in place, so a reader never sees a half-written file; it
+keeps the old mapping until it notices the new file and reopens.
+"""
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: writers are not serialized
+    fcntl = None
+
+MAGIC = b"ICASHSNAP1\n"
+_LENGTH_BYTES = 8
+
+
+@dataclass(frozen=True)
+class SnapshotEntry:
+    version: str
+    blobs: dict[str, bytes]
+    meta: dict = field(default_factory=dict)
+    written_at: float = 0.0
+
+
+class SnapshotFile:
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._data = None          # mmap or bytes of the current file
+        self._index: dict = {}
+        self._identity = None      # (inode, mtime_ns, size) of the mapped file
+        self._checked_at = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def get(self, key: str) -> SnapshotEntry | None:
+        with self._lock:
+            self._reload_if_changed()
+            item = self._index.get(key)
+            return _entry(self._data, item) if item is not None else None
+
+    def reload(self) -> int:
+        """Map the file now instead of on first use; returns how many keys it holds."""
+        with self._lock:
+            self._checked_at = 0.0
+            self._reload_if_changed()
+            return len(self._index)
+
+    def update(self, entries: dict[str, SnapshotEntry]) -> None:
+        """Write `entries` over the matching keys, keeping every other key on disk."""
+        if not entries:
+            return
+        with self._exclusive():
+            # Re-read under the lock: another process may have written since.
+            current = self._read_all(self.path)
+            current.update(entries)
+            self._write(current)
+        with self._lock:
+            self._checked_at = 0.0  # pick our own write up on the next get
+
+    def _reload_if_changed(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity == self._identity:
+            return
+        try:
+            data, index = _open(self.path)
+        except (OSError, ValueError):
+            return  # unreadable or foreign file: keep what we have
+        self._data, self._index, self._identity = data, index, identity
+
+    @contextmanager
+    def _exclusive(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_all(path: str) -> dict[str, SnapshotEntry]:
+        try:
+            data, index = _open(path)
+        except (OSError, ValueError):
+            return {}
+        return {key: _entry(data, item) for key, item in index.items()}
+
+    def _write(self, entries: dict[str, SnapshotEntry]) -> None:
+        index, chunks, offset = {}, [], 0
+        for key, entry in entries.items():
+            locations = {}
+            for name, blob in entry.blobs.items():
+                locations[name] = [offset, len(blob)]
+                chunks.append(blob)
+                offset += len(blob)
+            index[key] = {
+                "version": entry.version,
+                "meta": entry.meta,
+                "written_at": entry.written_at or time.time(),
+                "blobs": locations,
+            }
+        header = json.dumps(index).encode()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(MAGIC)
+                handle.write(len(header).to_bytes(_LENGTH_BYTES, "big"))
+                handle.write(header)
+                for chunk in chunks:
+                    handle.write(chunk)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def _open(path: str):
+    """(data, index) of a snapshot file, with blob offsets made absolute."""
+    with open(path, "rb") as handle:
+        try:
+            data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError, AttributeError):
+            data = handle.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a snapshot file")
+    start = len(MAGIC) + _LENGTH_BYTES
+    base = start + int.from_bytes(data[len(MAGIC):start], "big")
+    index = json.loads(bytes(data[start:base]))
+    for item in index.values():
+        item["blobs"] = {name: (base + offset, length) for name, (offset, length) in item["blobs"].items()}
+    return data, index
+
+
+def _entry(data, item: dict) -> SnapshotEntry:
+    blobs = {name: bytes(data[offset:offset + length]) for name, (offset, length) in item["blobs"].items()}
+    return SnapshotEntry(item["version"], blobs, item.get("meta", {}), item.get("written_at", 0.0))
+
+
+__all__ = ["SnapshotFile", "SnapshotEntry"]
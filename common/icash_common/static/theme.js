@@ -0,0 +1,52 @@
+// Loaded synchronously from <head> so the stored theme applies before first paint.
+(() => {
+  const root = document.documentElement;
+  const system = window.matchMedia('(prefers-color-scheme: dark)');
+
+  function setThemeAttribute(value) {
+    const body = document.body;
+    if (value === 'light' || value === 'dark') {
+      root.setAttribute('data-theme', value);
+      root.setAttribute('data-bs-theme', value);
+      body?.setAttribute('data-theme', value);
+    } else {
+      root.removeAttribute('data-theme');
+      root.removeAttribute('data-bs-theme');
+      body?.removeAttribute('data-theme');
+    }
+  }
+
+  function storedTheme() {
+    try { return localStorage.getItem('theme'); } catch (err) { return null; }
+  }
+
+  function applyTheme(choice) {
+    setThemeAttribute(choice);
+    try {
+      if (choice === 'light' || choice === 'dark') {
+        localStorage.setItem('theme', choice);
+      } else {
+        localStorage.removeItem('theme');
+      }
+    } catch (err) {
+      /* storage might be blocked; ignore */
+    }
+  }
+
+  setThemeAttribute(storedTheme());
+
+  document.addEventListener('DOMContentLoaded', () => {
+    setThemeAttribute(storedTheme());
+    document.querySelectorAll('[data-set-theme]').forEach(item => {
+      item.addEventListener('click', (e) => {
+        applyTheme(e.currentTarget.dataset.setTheme);
+      });
+    });
+  });
+
+  system.addEventListener('change', () => {
+    if (!storedTheme()) {
+      setThemeAttribute(system.matches ? 'dark' : 'light');
+    }
+  });
+})();
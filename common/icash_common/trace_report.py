@@ -0,0 +1,73 @@
+"""Per-stage latency percentiles from TRACE_LOG files.
+
+    python -m icash_common.trace_report traces/*.jsonl
+    python -m icash_common.trace_report --endpoint /make_purchase cashier.jsonl api.jsonl
+"""
+import argparse
+import json
+import math
+from collections import defaultdict
+from typing import Iterable
+
+
+def load(paths: Iterable[str]) -> Iterable[dict]:
+    for path in paths:
+        with open(path) as handle:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(records: Iterable[dict], endpoint: str | None = None) -> dict[tuple[str, str], dict]:
+    """{(service, stage): {count, p50, p90, p99, max}} in milliseconds.
+
+    A stage absent from a request counts as 0 ms for it, so stages are
+    comparable with "total".
+    """
+    samples: dict[tuple[str, str], list[float]] = defaultdict(list)
+    requests_per_service: dict[str, int] = defaultdict(int)
+    for record in records:
+        if endpoint and record.get("endpoint") != endpoint:
+            continue
+        service = record["service"]
+        requests_per_service[service] += 1
+        samples[(service, "total")].append(record["total_ms"])
+        for stage, timing in record.get("spans", {}).items():
+            samples[(service, stage)].append(timing["ms"])
+
+    summary = {}
+    for (service, stage), values in sorted(samples.items()):
+        values += [0.0] * (requests_per_service[service] - len(values))
+        values.sort()
+        summary[(service, stage)] = {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+            "max": values[-1],
+        }
+    return summary
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Summarize trace logs into per-stage latency percentiles.")
+    parser.add_argument("paths", nargs="+", help="TRACE_LOG files (JSON lines)")
+    parser.add_argument("--endpoint", help="only requests to this route, e.g. /cashier/catalog")
+    args = parser.parse_args(argv)
+
+    summary = summarize(load(args.paths), args.endpoint)
+    print(f"{'service':<10} {'stage':<18} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for (service, stage), row in summary.items():
+        print(
+            f"{service:<10} {stage:<18} {row['count']:>7} "
+            f"{row['p50']:>9.2f} {row['p90']:>9.2f} {row['p99']:>9.2f} {row['max']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
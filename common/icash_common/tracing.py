@@ -0,0 +1,201 @@
+"""Request IDs and per-stage timings shared by every iCash service.
+
+`init_tracing` gives each request an id, taken from an incoming X-Request-ID
+header or newly generated, and a trace that collects span timings.
+Instrumented stages:
+
+    with span("cache"): ...      # any block of code
+    instrument_engine(engine)    # every SQL statement, as "sql"
+    traced_request("GET", url)   # outbound HTTP as "http"; forwards the id
+
+Outbound calls also pick up the callee's Server-Timing as "upstream-*"
+spans, so "http" minus "upstream-total" is the network hop. Each response
+carries X-Request-ID and a Server-Timing header. With TRACE_LOG set, each
+request is also appended as one JSON line to that file; summarize it with
+`python -m icash_common.trace_report`.
+"""
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_SERVER_TIMING_ENTRY = re.compile(r"^\s*([\w.-]+)(?:.*?;\s*dur=([\d.]+))?")
+
+
+class Trace:
+    __slots__ = ("request_id", "started", "spans")
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.spans: dict[str, list] = {}  # name -> [seconds, count]
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.spans.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def server_timing(self, total: float) -> str:
+        parts = [
+            f'{name};dur={seconds * 1000:.2f};desc="x{count}"'
+            for name, (seconds, count) in self.spans.items()
+        ]
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+def current_trace() -> Trace | None:
+    return g.get("_icash_trace") if has_app_context() else None
+
+
+def current_request_id() -> str | None:
+    trace = current_trace()
+    return trace.request_id if trace else None
+
+
+@contextmanager
+def span(name: str):
+    """Time the block as stage `name` of the current request (no-op outside one)."""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - started)
+
+
+def propagation_headers() -> dict[str, str]:
+    request_id = current_request_id()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+def record_upstream(server_timing: str | None) -> None:
+    """Fold a callee's Server-Timing header into the current trace as upstream-* spans."""
+    trace = current_trace()
+    if trace is None or not server_timing:
+        return
+    for entry in server_timing.split(","):
+        match = _SERVER_TIMING_ENTRY.match(entry)
+        if match and match.group(2):
+            trace.add(f"upstream-{match.group(1)}", float(match.group(2)) / 1000)
+
+
+def traced_request(method: str, url: str, **kwargs):
+    """`requests.request` that forwards the request id and is timed as "http"."""
+    import requests
+
+    kwargs["headers"] = {**propagation_headers(), **(kwargs.get("headers") or {})}
+    with span("http"):
+        response = requests.request(method, url, **kwargs)
+    record_upstream(response.headers.get("Server-Timing"))
+    return response
+
+
+def instrument_engine(engine) -> None:
+    """Time every SQL statement run on `engine` as an "sql" span."""
+    from sqlalchemy import event
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._icash_started = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_icash_started", None)
+        trace = current_trace()
+        if started is not None and trace is not None:
+            trace.add("sql", time.perf_counter() - started)
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+
+
+def _trace_logger(path: str | None) -> logging.Logger | None:
+    if not path:
+        return None
+    logger = logging.getLogger(f"icash.trace.{path}")
+    if not logger.handlers:
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+_record_factory_installed = False
+
+
+def _install_record_factory() -> None:
+    """Stamp log records made during a request with its id (shown by LOG_FORMAT=json)."""
+    global _record_factory_installed
+    if _record_factory_installed:
+        return
+    _record_factory_installed = True
+    factory = logging.getLogRecordFactory()
+
+    def record_with_request_id(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        request_id = current_request_id()
+        if request_id:
+            record.request_id = request_id
+        return record
+
+    logging.setLogRecordFactory(record_with_request_id)
+
+
+def init_tracing(app, service: str) -> None:
+    app.config.setdefault("TRACE_LOG", os.getenv("TRACE_LOG"))
+    trace_log = _trace_logger(app.config["TRACE_LOG"])
+    _install_record_factory()
+
+    @app.before_request
+    def start_trace():
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        g._icash_trace = Trace(incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex)
+
+    @app.after_request
+    def finish_trace(response):
+        trace = g.pop("_icash_trace", None)
+        if trace is None:
+            return response
+        total = time.perf_counter() - trace.started
+        response.headers[REQUEST_ID_HEADER] = trace.request_id
+        response.headers["Server-Timing"] = trace.server_timing(total)
+        if trace_log is not None:
+            trace_log.info(json.dumps({
+                "ts": time.time(),
+                "service": service,
+                "request_id": trace.request_id,
+                "method": request.method,
+                "endpoint": request.url_rule.rule if request.url_rule else request.path,
+                "status": response.status_code,
+                "total_ms": round(total * 1000, 3),
+                "spans": {
+                    name: {"ms": round(seconds * 1000, 3), "count": count}
+                    for name, (seconds, count) in trace.spans.items()
+                },
+            }))
+        return response
+
+
+__all__ = [
+    "REQUEST_ID_HEADER",
+    "init_tracing",
+    "span",
+    "instrument_engine",
+    "traced_request",
+    "propagation_headers",
+    "record_upstream",
+    "current_request_id",
+]
@@ -1,5 +1,8 @@
 from flask import Flask
 from icash_common import setup_logging, register_frontend
+from icash_common.tracing import init_tracing
+
+from app.relay import relay
 
 def create_app():
     setup_logging()
@@ -12,4 +15,6 @@ def create_app():
 
     app.config.from_object("app.config.Config")
     register_frontend(app)
+    relay.init_app(app)
+    init_tracing(app, "dashboard")
     return app
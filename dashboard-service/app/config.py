@@ -6,3 +6,8 @@ class Config:
         "ANALYTICS_URL", "http://127.0.0.1:8001/dashboard/analytics"
     )
     MIN_PURCHASES = int(os.getenv("MIN_PURCHASES", 3))
+    STREAM_URL = os.getenv(
+        "STREAM_URL", "http://127.0.0.1:8001/dashboard/stream"
+    )
+    SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+    SSE_MAX_QUEUE = int(os.getenv("SSE_MAX_QUEUE", 100))
@@ -0,0 +1,86 @@
+"""Relay of the API's analytics event stream to dashboard viewers.
+
+Each worker holds at most one upstream connection to the API's
+/dashboard/stream and fans its events out to every open browser stream. The
+upstream connection is opened with the first viewer and closed once the last
+one leaves.
+"""
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests import RequestException
+
+from icash_common.events import EventFanout, parse_sse
+
+log = logging.getLogger(__name__)
+
+
+class StreamRelay:
+    def __init__(self):
+        self.url = None
+        self.heartbeat = 15.0
+        self.fanout = EventFanout()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._streaming = False
+
+    def init_app(self, app) -> None:
+        self.url = app.config["STREAM_URL"]
+        self.heartbeat = float(app.config["SSE_HEARTBEAT_SECONDS"])
+        self.fanout.max_queue = int(app.config["SSE_MAX_QUEUE"])
+
+    def subscribe(self):
+        subscriber = self.fanout.subscribe()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="analytics-stream-relay", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def _run(self) -> None:
+        delay = 0.5
+        while True:
+            failed = False
+            try:
+                self._relay_once()
+            except RequestException as exc:
+                failed = True
+                log.warning("Analytics stream unavailable (%s); retrying in %.1fs", exc, delay)
+            with self._lock:
+                if not self.fanout.subscriber_count:
+                    self._thread = None
+                    return
+            if self._streaming:
+                # Upstream dropped mid-stream; deltas may be missed until it is back.
+                self.fanout.publish("resync", "{}")
+            if failed:
+                time.sleep(delay)
+                delay = min(delay * 2, 10.0)
+            else:
+                delay = 0.5
+
+    def _relay_once(self) -> None:
+        """Relay until upstream ends or the last viewer leaves."""
+        self._streaming = False
+        # Read timeout well above the upstream heartbeat detects a dead connection.
+        with requests.get(self.url, stream=True, timeout=(5, self.heartbeat * 3)) as response:
+            response.raise_for_status()
+            self._streaming = True
+            for event, data in parse_sse(self._lines(response)):
+                self.fanout.publish(event, data)
+
+    def _lines(self, response):
+        for line in response.iter_lines(decode_unicode=True):
+            if not self.fanout.subscriber_count:
+                return
+            yield line
+
+
+relay = StreamRelay()
+
+__all__ = ["StreamRelay", "relay"]
@@ -1,9 +1,10 @@
 import logging
 from typing import Any, Dict
 
-import requests
 from flask import current_app
 
+from icash_common.tracing import traced_request
+
 logger = logging.getLogger(__name__)
 
 
@@ -12,6 +13,6 @@ def fetch_analytics(min_purchases: int) -> Dict[str, Any]:
     url = current_app.config.get("ANALYTICS_URL")
     params = {"min_purchases": min_purchases}
 
-    response = requests.get(url, params=params, timeout=60)
+    response = traced_request("GET", url, params=params, timeout=60)
     response.raise_for_status()
     return response.json()
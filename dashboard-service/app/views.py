@@ -1,11 +1,14 @@
 import logging
 from datetime import datetime
 
-from flask import render_template
+from flask import Response, render_template
 from requests import RequestException
 
 from app.config import Config
+from app.relay import relay
 from app.services import fetch_analytics
+from icash_common.events import sse_stream
+from icash_common.tracing import span
 
 log = logging.getLogger(__name__)
 
@@ -29,10 +32,21 @@ def register_routes(app):
             else None
         )
 
-        return render_template(
-            "dashboard.html",
-            generated_at=generated_at,
-            analytics=analytics,
-            error=error,
-            min_purchases=Config.MIN_PURCHASES,
+        with span("render"):
+            return render_template(
+                "dashboard.html",
+                generated_at=generated_at,
+                analytics=analytics,
+                error=error,
+                min_purchases=Config.MIN_PURCHASES,
+            )
+
+    @app.route("/stream", methods=["GET"])
+    def stream():
+        """Live analytics deltas for an open dashboard page."""
+        subscriber = relay.subscribe()
+        return Response(
+            sse_stream(relay.fanout, subscriber, Config.SSE_HEARTBEAT_SECONDS),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
         )
@@ -0,0 +1,35 @@
+// Applies /stream purchase deltas to the rendered snapshot.
+// Settings come from the script tag: data-stream-url and data-min-purchases.
+(() => {
+  if (!window.EventSource) return;
+  const settings = document.currentScript.dataset;
+  const minPurchases = Number(settings.minPurchases);
+  const status = document.getElementById('live-status');
+  const updatedAt = document.getElementById('updated-at');
+  const source = new EventSource(settings.streamUrl);
+  let dropped = false;
+
+  function bump(element) {
+    if (element) element.textContent = Number(element.textContent) + 1;
+  }
+
+  source.addEventListener('open', () => {
+    // Deltas sent while disconnected are lost; start again from a fresh snapshot.
+    if (dropped) window.location.reload();
+    status.classList.remove('d-none');
+  });
+  source.addEventListener('error', () => {
+    dropped = true;
+    status.classList.add('d-none');
+  });
+  source.addEventListener('resync', () => window.location.reload());
+  source.addEventListener('purchase', (event) => {
+    const delta = JSON.parse(event.data);
+    if (delta.new_buyer) bump(document.getElementById('unique-buyers'));
+    if (delta.user_purchase_count === minPurchases) bump(document.getElementById('loyal-count'));
+    delta.products.forEach((name) => {
+      bump(document.querySelector(`[data-product-sold="${CSS.escape(name)}"]`));
+    });
+    if (updatedAt) updatedAt.textContent = new Date(delta.created_at).toLocaleString();
+  });
+})();